@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+""" Benchmarks random subsequence fetches from a gzip compressed FASTA file, against the same file recompressed into BGZF
+
+The plain gzip file has to be decompressed (and loaded into memory) as a whole, while the BGZF one is accessed through .fai/.gzi indexes,
+decompressing only blocks, that overlap fetched subsequences. Fetched subsequences are checked to be identical.
+
+Usage: python benchmarks/bgzf_fasta.py [--fasta camsa/examples/gage/exp1/contigs.fasta.gz] [--fetches 1000] [--fetch-length 10000] [--threads 1,4]
+"""
+from __future__ import print_function, division
+
+import argparse
+import gzip
+import os
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from camsa.utils.fasta import bgzf
+from camsa.utils.fasta.io import open_fasta
+
+
+def get_queries(fasta, fetches_cnt, fetch_length, seed=1):
+    rnd = random.Random(seed)
+    names = fasta.names()
+    queries = []
+    for _ in range(fetches_cnt):
+        name = rnd.choice(names)
+        length = fasta.get_length(name)
+        start = rnd.randint(0, max(length - fetch_length, 0))
+        queries.append((name, start, start + fetch_length, rnd.choice("+-")))
+    return queries
+
+
+def run(file_name, queries, threads=1):
+    start_time = timeit.default_timer()
+    fasta = open_fasta(source=file_name, threads=threads)
+    open_time = timeit.default_timer() - start_time
+    result = [fasta.fetch(name=name, start=start, end=end, strand=strand) for name, start, end, strand in queries]
+    fasta.close()
+    return result, open_time, timeit.default_timer() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Random access to gzip vs BGZF compressed FASTA benchmark")
+    parser.add_argument("--fasta", default=os.path.join(ROOT_DIR, "camsa", "examples", "gage", "exp1", "contigs.fasta.gz"),
+                        help="A gzip compressed FASTA file")
+    parser.add_argument("--fetches", type=int, default=1000)
+    parser.add_argument("--fetch-length", type=int, default=10000)
+    parser.add_argument("--threads", default="1,4", help="A coma separated list of BGZF decompression thread counts")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        gzip_file_name = os.path.join(temp_dir, "contigs.fasta.gz")
+        bgzf_file_name = os.path.join(temp_dir, "contigs.bgzf.fasta.gz")
+        shutil.copy(args.fasta, gzip_file_name)
+        with gzip.open(args.fasta, "rb") as source:
+            with bgzf.BgzfWriter(bgzf_file_name) as destination:
+                shutil.copyfileobj(source, destination)
+        print("gzip: {gzip_size} bytes, BGZF: {bgzf_size} bytes".format(gzip_size=os.path.getsize(gzip_file_name), bgzf_size=os.path.getsize(bgzf_file_name)))
+
+        fasta = open_fasta(source=gzip_file_name)
+        queries = get_queries(fasta=fasta, fetches_cnt=args.fetches, fetch_length=args.fetch_length)
+        fasta.close()
+
+        reference, open_time, total_time = run(file_name=gzip_file_name, queries=queries)
+        print("{name:<28} open: {open_time:.3f} s, total: {total_time:.3f} s".format(name="gzip (in memory)", open_time=open_time, total_time=total_time))
+        for cnt, threads in enumerate(int(value) for value in args.threads.split(",")):
+            for cached in [False, True] if cnt == 0 else [True]:
+                result, open_time, total_time = run(file_name=bgzf_file_name, queries=queries, threads=threads)
+                if result != reference:
+                    print("MISMATCH between gzip and BGZF fetches")
+                    exit(1)
+                name = "BGZF, {threads} thread(s){indexes}".format(threads=threads, indexes="" if cached else ", indexing")
+                print("{name:<28} open: {open_time:.3f} s, total: {total_time:.3f} s".format(name=name, open_time=open_time, total_time=total_time))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+""" Benchmarks the banded `camsa.utils.fasta.algo.bounded_alignment` kernel on flanks of scaffolds
+
+Two cases are timed for every flank length: overlapping flanks (a few substitutions/indels apart, so the alignment is performed),
+and unrelated flanks (rejected by the bit-parallel distance check).
+The full-matrix implementation, that the kernel has replaced, is timed (and its results are compared with) on flanks,
+that are short enough for its quadratic memory.
+
+Usage: python benchmarks/bounded_alignment.py [--lengths 1000,10000] [--band 100] [--reference-max-length 1000] [--repeats 3]
+"""
+from __future__ import print_function, division
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from camsa.utils.fasta import algo
+
+
+def full_matrix_bounded_alignment(seq1, seq2, max_edit_distance=-1):
+    """ The quadratic time and memory implementation, that `bounded_alignment` used to have """
+    if max_edit_distance == -1:
+        max_edit_distance = max(len(seq1), len(seq2))
+    i_range = len(seq1) + 1
+    j_range = len(seq2) + 1
+    M = [[0] * j_range for _ in range(i_range)]
+    Mbt = [["s" for _ in range(j_range)] for _ in range(i_range)]
+    for j in range(1, j_range):
+        M[0][j] = j
+        Mbt[0][j] = "l"
+    for i in range(1, i_range):
+        M[i][0] = i
+        Mbt[i][0] = "u"
+    for i in range(1, i_range):
+        for j in range(1, j_range):
+            if abs(i - j) > max_edit_distance:
+                continue
+            options = [(M[i - 1][j - 1] + algo.substitute_score(seq1[i - 1], seq2[j - 1]), "d")]
+            if abs(i - j) < max_edit_distance:
+                options.append((M[i - 1][j] + 1, "u"))
+                options.append((M[i][j - 1] + 1, "l"))
+            elif i > j:
+                options.append((M[i - 1][j] + 1, "u"))
+            else:
+                options.append((M[i][j - 1] + 1, "l"))
+            M[i][j], Mbt[i][j] = min(options, key=lambda entry: entry[0])
+    if M[-1][-1] > max_edit_distance:
+        return None
+    return algo.get_consensus_sequences(aligned_seqs=algo.get_alignments(iseq=seq1, jseq=seq2, backtracking=Mbt, end_cell=(i_range - 1, j_range - 1)))
+
+
+def get_flanks(length, edits_cnt, rnd):
+    seq1 = "".join(rnd.choice("ACGT") for _ in range(length))
+    seq2 = list(seq1)
+    for _ in range(edits_cnt):
+        position = rnd.randrange(len(seq2))
+        operation = rnd.choice(["substitution", "deletion", "insertion", "N"])
+        if operation == "substitution":
+            seq2[position] = rnd.choice("ACGT")
+        elif operation == "deletion":
+            del seq2[position]
+        elif operation == "insertion":
+            seq2.insert(position, rnd.choice("ACGT"))
+        else:
+            seq2[position] = "N"
+    seq2 = "".join(seq2)
+    unrelated = "".join(rnd.choice("ACGT") for _ in range(length))
+    return seq1, seq2, unrelated
+
+
+def best_time(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = timeit.default_timer()
+        function()
+        timings.append(timeit.default_timer() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banded bounded_alignment benchmark")
+    parser.add_argument("--lengths", default="1000,10000", help="A coma separated list of flank lengths")
+    parser.add_argument("--band", type=int, default=100, help="max_edit_distance for the alignment")
+    parser.add_argument("--reference-max-length", type=int, default=1000, help="The longest flanks, the full-matrix implementation is run on")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    print("{length:>7} {case:<10} {banded:>10} {full:>10}".format(length="length", case="flanks", banded="banded, s", full="full, s"))
+    for length in [int(value) for value in args.lengths.split(",")]:
+        seq1, seq2, unrelated = get_flanks(length=length, edits_cnt=args.band // 4, rnd=rnd)
+        for case, other in [("similar", seq2), ("unrelated", unrelated)]:
+            result = algo.bounded_alignment(seq1=seq1, seq2=other, max_edit_distance=args.band)
+            banded = best_time(lambda: algo.bounded_alignment(seq1=seq1, seq2=other, max_edit_distance=args.band), repeats=args.repeats)
+            full = "-"
+            if length <= args.reference_max_length:
+                if full_matrix_bounded_alignment(seq1=seq1, seq2=other, max_edit_distance=args.band) != result.consensus:
+                    print("MISMATCH with the full-matrix implementation on {case} flanks of length {length}".format(case=case, length=length))
+                    exit(1)
+                full = "{time:.3f}".format(time=best_time(lambda: full_matrix_bounded_alignment(seq1=seq1, seq2=other, max_edit_distance=args.band),
+                                                          repeats=args.repeats))
+            print("{length:>7} {case:<10} {banded:>10.3f} {full:>10}".format(length=length, case=case, banded=banded, full=full))
+
+
+if __name__ == "__main__":
+    main()
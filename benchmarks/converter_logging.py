@@ -0,0 +1,107 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+""" Measures throughput of the AGP converter with eager per-line log formatting vs. the level-guarded `HotPathLogger`
+
+A synthetic AGP file (objects with alternating scaffold and gap components) is converted into CAMSA assembly points twice:
+with the reading loop, that formats a debug message for every line/object regardless of the logging level (as the converter used to do),
+and with the current converter. Both run with the INFO logging level, so neither of debug messages is actually emitted.
+
+Usage: python benchmarks/converter_logging.py [--objects 2000] [--components 500] [--repeats 3]
+"""
+from __future__ import print_function, division
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import timeit
+from collections import defaultdict
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from camsa.utils.agp import agp2camsa_points as agp
+
+
+def write_agp(destination, objects_cnt, components_cnt):
+    for object_cnt in range(objects_cnt):
+        object_id = "chr{cnt}".format(cnt=object_cnt)
+        position = 1
+        for part_number in range(1, components_cnt + 1):
+            if part_number % 2 == 1:
+                length = 1000
+                data = ["W", "ctg_{o}_{p}".format(o=object_cnt, p=part_number), "1", str(length), "+" if part_number % 4 == 1 else "-"]
+            else:
+                length = 100
+                data = ["N", str(length), "scaffold", "yes", "paired-ends"]
+            print("\t".join([object_id, str(position), str(position + length - 1), str(part_number)] + data), file=destination)
+            position += length
+
+
+def eager_convert(args, logger):
+    """ The AGP reading loop with per-line log formatting, as it was prior to the `HotPathLogger` """
+    objects = defaultdict(list)
+    assembly_points = []
+    with open(args.agp_file_name, "rt") as source:
+        for line in source:
+            line = line.strip()
+            if line.startswith("#"):
+                logger.debug("Skipping comment line: {line}".format(line=line))
+                continue
+            data = line.split("\t", 8)
+            if agp.Component.is_scaffold_component(data[4]):
+                logger.debug("Processing a non-gap data line: {line}".format(line=line))
+                component = agp.ScaffoldComponent.from_agp_data(data=data)
+            else:
+                logger.debug("Processing a gap data line: {line}".format(line=line))
+                component = agp.GapComponent.from_agp_data(data=data)
+            objects[component.object_id].append(component)
+    for object_id in objects.keys():
+        logger.debug("Processing object {object_id}".format(object_id=object_id))
+        components = sorted(objects[object_id], key=lambda component: (component.object_beg, component.object_end))
+        assembly_points.extend(agp.object_as_camsa_points(object_as_components=components, extra_data=args))
+    return assembly_points
+
+
+def current_convert(args, logger):
+    with open(args.agp_file_name, "rt") as source:
+        args.agp = [source]
+        return agp.convert(args=args, logger=logger)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AGP converter throughput benchmark (eager vs. level-guarded logging)")
+    parser.add_argument("--objects", type=int, default=2000)
+    parser.add_argument("--components", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    logger = logging.getLogger("CAMSA.benchmarks.converter_logging")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    fd, file_name = tempfile.mkstemp(suffix=".agp")
+    try:
+        with os.fdopen(fd, "wt") as destination:
+            write_agp(destination=destination, objects_cnt=args.objects, components_cnt=args.components)
+        lines_cnt = args.objects * args.components
+        convert_args = argparse.Namespace(agp_file_name=file_name, origin="benchmark")
+        results = {}
+        for name, convert in [("eager", eager_convert), ("hot path", current_convert)]:
+            timings = []
+            for _ in range(args.repeats):
+                start = timeit.default_timer()
+                assembly_points_cnt = len(convert(args=convert_args, logger=logger))
+                timings.append(timeit.default_timer() - start)
+            results[name] = min(timings)
+            print("{name:<10} {lines} lines, {aps} assembly points: {time:.2f} s ({rate:.0f} lines/s)"
+                  "".format(name=name, lines=lines_cnt, aps=assembly_points_cnt, time=results[name], rate=lines_cnt / results[name]))
+        print("speedup: {speedup:.2f}x".format(speedup=results["eager"] / results["hot path"]))
+    finally:
+        os.remove(file_name)
+
+
+if __name__ == "__main__":
+    main()
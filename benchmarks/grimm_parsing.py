@@ -0,0 +1,110 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+""" Validates the built-in GRIMM tokenizer (camsa.utils.grimm.io) against `bg.grimm.GRIMMReader` and compares their throughput
+
+A synthetic GRIMM file (with comments, linear and circular chromosomes, explicit/implicit signs and trailing data after terminators)
+is parsed by both, the results are checked to be identical, and the best of several timings is reported.
+Files, supplied as arguments, are validated as well.
+`bg` is a benchmark-only dependency (listed in dev-requirements.txt); without it only the built-in tokenizer is timed.
+
+Usage: python benchmarks/grimm_parsing.py [--genomes 10] [--chromosomes 100] [--blocks 1000] [--repeats 3] [file.grimm ...]
+"""
+from __future__ import print_function, division
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from camsa.utils.grimm.io import iter_chromosomes
+
+
+def write_grimm(destination, genomes_cnt, chromosomes_cnt, blocks_cnt, seed=1):
+    rnd = random.Random(seed)
+    signs = ["", "+", "-"]
+    for genome_cnt in range(genomes_cnt):
+        print("# genome {cnt}".format(cnt=genome_cnt), file=destination)
+        print(">genome_{cnt}.assembly".format(cnt=genome_cnt), file=destination)
+        for _ in range(chromosomes_cnt):
+            blocks = " ".join(rnd.choice(signs) + str(rnd.randint(1, blocks_cnt * chromosomes_cnt)) for _ in range(blocks_cnt))
+            print("{blocks} {terminator}{trailing}".format(blocks=blocks, terminator=rnd.choice("$@"), trailing=rnd.choice(["", " # tail", " 1 2 $"])),
+                  file=destination)
+        print("", file=destination)
+
+
+def iter_bg_chromosomes(source):
+    """ The per-line `bg.grimm.GRIMMReader` calls, that the GRIMM converter used to make """
+    from bg.grimm import GRIMMReader
+    current_genome = None
+    for line in source:
+        line = line.strip()
+        if len(line) == 0 or GRIMMReader.is_comment_string(data_string=line):
+            continue
+        if GRIMMReader.is_genome_declaration_string(data_string=line):
+            current_genome = GRIMMReader.parse_genome_declaration_string(data_string=line).name
+        elif current_genome is not None:
+            chr_type, blocks = GRIMMReader.parse_data_string(data_string=line)
+            yield current_genome, chr_type, blocks
+
+
+def parse(file_name, iter_function):
+    with open(file_name, "rt") as source:
+        return list(iter_function(source))
+
+
+def time_parsing(file_name, iter_function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = timeit.default_timer()
+        parse(file_name=file_name, iter_function=iter_function)
+        timings.append(timeit.default_timer() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validation and throughput benchmark of the built-in GRIMM tokenizer")
+    parser.add_argument("files", nargs="*", help="Additional GRIMM files to validate the tokenizer on")
+    parser.add_argument("--genomes", type=int, default=10)
+    parser.add_argument("--chromosomes", type=int, default=100)
+    parser.add_argument("--blocks", type=int, default=1000, help="A number of blocks per chromosome")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        import bg.grimm
+        has_bg = True
+    except ImportError:
+        print("bg package is not installed, validation and comparison are skipped")
+        has_bg = False
+
+    fd, file_name = tempfile.mkstemp(suffix=".grimm")
+    try:
+        with os.fdopen(fd, "wt") as destination:
+            write_grimm(destination=destination, genomes_cnt=args.genomes, chromosomes_cnt=args.chromosomes, blocks_cnt=args.blocks)
+        if has_bg:
+            for validated_file_name in [file_name] + args.files:
+                native = parse(file_name=validated_file_name, iter_function=iter_chromosomes)
+                reference = parse(file_name=validated_file_name, iter_function=iter_bg_chromosomes)
+                if native != reference:
+                    print("MISMATCH with bg on {file}".format(file=validated_file_name))
+                    exit(1)
+                print("validated against bg: {file} ({cnt} chromosomes)".format(file=validated_file_name, cnt=len(native)))
+        blocks_cnt = args.genomes * args.chromosomes * args.blocks
+        timings = [("native", time_parsing(file_name=file_name, iter_function=iter_chromosomes, repeats=args.repeats))]
+        if has_bg:
+            timings.append(("bg", time_parsing(file_name=file_name, iter_function=iter_bg_chromosomes, repeats=args.repeats)))
+        for name, timing in timings:
+            print("{name:<7} {blocks} blocks: {time:.2f} s ({rate:.0f} blocks/s)".format(name=name, blocks=blocks_cnt, time=timing, rate=blocks_cnt / timing))
+        if has_bg:
+            print("speedup: {speedup:.2f}x".format(speedup=timings[1][1] / timings[0][1]))
+    finally:
+        os.remove(file_name)
+
+
+if __name__ == "__main__":
+    main()
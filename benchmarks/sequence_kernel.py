@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+""" Benchmarks the byte-level sequence kernel (camsa.utils.fasta.seq) against the Biopython `Seq`/`SeqRecord` path, the FASTA tools used to take
+
+Three operations are timed on random sequences: oriented slicing (with reverse complements for half of the slices),
+whole sequence reverse complements, and writing FASTA records. Results of both paths are checked to be identical.
+
+Usage: python benchmarks/sequence_kernel.py [--records 200] [--length 100000] [--slices 10000] [--repeats 3]
+"""
+from __future__ import print_function, division
+
+import argparse
+import io
+import os
+import random
+import sys
+import timeit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from camsa.utils.fasta import seq as kernel
+
+
+def best_time(function, repeats):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = timeit.default_timer()
+        result = function()
+        timings.append(timeit.default_timer() - start)
+    return min(timings), result
+
+
+def bio_slices(seqs, queries):
+    result = []
+    for index, start, end, strand in queries:
+        piece = seqs[index][start:end]
+        result.append(str(piece if strand == "+" else piece.reverse_complement()))
+    return result
+
+
+def kernel_slices(seqs, queries):
+    result = []
+    for index, start, end, strand in queries:
+        result.append(kernel.get_subsequence(seqs[index], start=start, end=end, strand=strand).decode("ascii"))
+    return result
+
+
+def bio_write(records):
+    from Bio import SeqIO
+    destination = io.StringIO()
+    SeqIO.write(records, destination, "fasta")
+    return destination.getvalue()
+
+
+def kernel_write(titles, seqs):
+    destination = io.BytesIO()
+    for title, seq in zip(titles, seqs):
+        destination.write(kernel.format_fasta_record(title=title, seq=seq))
+    return destination.getvalue().decode("ascii")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Byte-level sequence kernel vs Biopython benchmark")
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--length", type=int, default=100000)
+    parser.add_argument("--slices", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    from Bio.Seq import Seq
+    from Bio.SeqRecord import SeqRecord
+
+    rnd = random.Random(1)
+    unit = "".join(rnd.choice("ACGTN") for _ in range(1000))
+    texts = [(unit * (args.length // len(unit) + 1))[cnt:cnt + args.length] for cnt in range(args.records)]
+    titles = ["seq_{cnt} description".format(cnt=cnt) for cnt in range(args.records)]
+    bio_seqs = [Seq(text) for text in texts]
+    bio_records = [SeqRecord(seq, id=title.split()[0], description=title) for seq, title in zip(bio_seqs, titles)]
+    byte_seqs = [text.encode("ascii") for text in texts]
+    queries = []
+    for _ in range(args.slices):
+        start = rnd.randint(0, args.length - 1)
+        queries.append((rnd.randrange(args.records), start, rnd.randint(start, args.length), rnd.choice("+-")))
+
+    benchmarks = [
+        ("oriented slices", lambda: bio_slices(seqs=bio_seqs, queries=queries), lambda: kernel_slices(seqs=byte_seqs, queries=queries)),
+        ("reverse complements", lambda: [str(seq.reverse_complement()) for seq in bio_seqs],
+         lambda: [kernel.reverse_complement(seq).decode("ascii") for seq in byte_seqs]),
+        ("FASTA writing", lambda: bio_write(records=bio_records), lambda: kernel_write(titles=titles, seqs=byte_seqs)),
+    ]
+    print("{name:<20} {bio:>12} {kernel:>12} {speedup:>8}".format(name="operation", bio="Biopython, s", kernel="kernel, s", speedup="speedup"))
+    for name, bio_function, kernel_function in benchmarks:
+        bio_time, bio_result = best_time(bio_function, repeats=args.repeats)
+        kernel_time, kernel_result = best_time(kernel_function, repeats=args.repeats)
+        if bio_result != kernel_result:
+            print("MISMATCH with Biopython on {name}".format(name=name))
+            exit(1)
+        print("{name:<20} {bio:>12.3f} {kernel:>12.3f} {speedup:>7.2f}x".format(name=name, bio=bio_time, kernel=kernel_time, speedup=bio_time / kernel_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+""" Measures startup time of every CAMSA script, listed in setup.py `scripts`
+
+Every script is invoked with "--version" (or "--help", if the former is not supported) several times (in a fresh interpreter each time),
+and the best and the median wall time is reported.
+Top level modules, that take most of the import time, are reported as well (requires python 3.7+ for "-X importtime").
+
+Usage: python benchmarks/startup_time.py [--repeats 10] [--top 5] [script ...]
+"""
+from __future__ import print_function, division
+
+import argparse
+import ast
+import os
+import re
+import subprocess
+import sys
+import timeit
+from collections import defaultdict
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_setup_scripts():
+    with open(os.path.join(ROOT_DIR, "setup.py"), "rt") as source:
+        match = re.search(r"scripts\s*=\s*(\[[^\]]*\])", source.read())
+    return ast.literal_eval(match.group(1))
+
+
+def get_command(script):
+    with open(os.devnull, "w") as devnull:
+        for flag in ("--version", "--help"):
+            command = [sys.executable, os.path.join(ROOT_DIR, script), flag]
+            if subprocess.call(command, stdout=devnull, stderr=devnull) == 0:
+                return command
+    return None
+
+
+def time_script(command, repeats):
+    with open(os.devnull, "w") as devnull:
+        timings = []
+        for _ in range(repeats):
+            start = timeit.default_timer()
+            subprocess.call(command, stdout=devnull, stderr=devnull)
+            timings.append(timeit.default_timer() - start)
+    timings.sort()
+    return timings[0], timings[len(timings) // 2]
+
+
+def get_heaviest_imports(command, top):
+    if sys.version_info < (3, 7):
+        return []
+    process = subprocess.Popen(command[:1] + ["-X", "importtime"] + command[1:],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    _, err = process.communicate()
+    cumulative_by_packages = defaultdict(int)
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        if len(name) - len(name.lstrip()) == 1:
+            cumulative_by_packages[name.strip().split(".")[0]] += int(cumulative)
+    return sorted(cumulative_by_packages.items(), key=lambda entry: entry[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark for CAMSA scripts")
+    parser.add_argument("scripts", nargs="*", help="Scripts (relative to the repository root) to benchmark. DEFAULT: all scripts from setup.py")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--top", type=int, default=5, help="A number of heaviest top level imports to report for each script")
+    args = parser.parse_args()
+
+    scripts = args.scripts if len(args.scripts) > 0 else get_setup_scripts()
+    print("{script:<55} {best:>9} {median:>9}  heaviest imports (ms)".format(script="script", best="best, ms", median="median, ms"))
+    for script in scripts:
+        command = get_command(script=script)
+        if command is None:
+            print("{script:<55} {failed:>9}".format(script=script, failed="FAILED"))
+            continue
+        timings = time_script(command=command, repeats=args.repeats)
+        heaviest = ", ".join("{name}: {time:.1f}".format(name=name, time=time / 1000) for name, time in get_heaviest_imports(command=command, top=args.top))
+        print("{script:<55} {best:>9.1f} {median:>9.1f}  {heaviest}".format(script=script, best=timings[0] * 1000, median=timings[1] * 1000, heaviest=heaviest))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+import importlib
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import camsa
+
+PIPELINE_SEPARATOR = "+"
+CONVERT_COMMAND = "convert"
+RUN_COMMAND = "run"
+TO_FASTA_COMMAND = "to-fasta"
+
+# modules are imported only when the respective stage is run, so that each of them pays only for its own dependencies
+CONVERTERS = {
+    "agp": "camsa.utils.agp.agp2camsa_points",
+    "grimm": "camsa.utils.grimm.grimm2camsa_points",
+    "agouti": "camsa.utils.agouti.agouti2camsa_points",
+    "ragout": "camsa.utils.ragout.ragout_coords2camsa_points",
+    "fasta": "camsa.utils.fasta.fasta2camsa_points",
+}
+COMMANDS = {
+    RUN_COMMAND: "camsa.run_camsa",
+    TO_FASTA_COMMAND: "camsa.utils.fasta.camsa_points2fasta",
+}
+
+USAGE = """usage: camsa COMMAND [ARGS ...] [{separator} COMMAND [ARGS ...] ...]
+
+Commands:
+  {convert} {{{converters}}} [ARGS ...]
+                      converts scaffold assemblies into CAMSA assembly points (same arguments as the respective *2camsa_points.py script)
+  {run} [ARGS ...]    runs the CAMSA analysis (same arguments as run_camsa.py)
+  {to_fasta} [ARGS ...]
+                      produces scaffolds from CAMSA assembly points and contigs (same arguments as camsa_points2fasta.py)
+
+Commands, separated by a standalone "{separator}", form a pipeline, that is executed in a single process.
+Assembly points, obtained by converters, that are followed by the "{run}" command in the pipeline, are passed to the analysis in memory,
+instead of being written down and parsed again. For example:
+
+  camsa {convert} agp a.agp --origin a {separator} {convert} grimm b.grimm {separator} {run} c.camsa.points -o camsa_output
+
+Run "camsa COMMAND --help" for the arguments of a specific command.""".format(separator=PIPELINE_SEPARATOR, convert=CONVERT_COMMAND, run=RUN_COMMAND,
+                                                                             to_fasta=TO_FASTA_COMMAND, converters="|".join(sorted(CONVERTERS)))
+
+
+class PipelineError(Exception):
+    pass
+
+
+def split_pipeline(argv):
+    """ Splits command line arguments into stages (i.e., lists of arguments, that start with a command), separated by the `PIPELINE_SEPARATOR` """
+    stages = [[]]
+    for arg in argv:
+        if arg == PIPELINE_SEPARATOR:
+            stages.append([])
+        else:
+            stages[-1].append(arg)
+    for stage in stages:
+        if len(stage) == 0:
+            raise PipelineError("Empty pipeline stage")
+        if stage[0] == CONVERT_COMMAND:
+            if len(stage) < 2 or stage[1] not in CONVERTERS:
+                raise PipelineError("\"{convert}\" command requires one of the formats {{{converters}}}".format(convert=CONVERT_COMMAND,
+                                                                                                              converters="|".join(sorted(CONVERTERS))))
+        elif stage[0] not in COMMANDS:
+            raise PipelineError("Unknown command \"{command}\"".format(command=stage[0]))
+    if sum(1 for stage in stages if stage[0] == RUN_COMMAND) > 1:
+        raise PipelineError("At most one \"{run}\" command is allowed in a pipeline".format(run=RUN_COMMAND))
+    return stages
+
+
+def run_pipeline(stages):
+    """ Executes pipeline stages one by one, handing assembly points over from converters to the analysis in memory
+
+    :return: an exit status of the pipeline (the first failed stage stops it)
+    """
+    commands = [stage[0] for stage in stages]
+    converted_assembly_points = []
+    for index, stage in enumerate(stages):
+        command = stage[0]
+        if command == CONVERT_COMMAND:
+            module = importlib.import_module(CONVERTERS[stage[1]])
+            hand_off = converted_assembly_points if RUN_COMMAND in commands[index + 1:] else None
+            module.main(argv=stage[2:], hand_off=hand_off)
+        elif command == RUN_COMMAND:
+            status = importlib.import_module(COMMANDS[command]).main(argv=stage[1:], converted_assembly_points=converted_assembly_points)
+            if status != 0:
+                return status
+            converted_assembly_points = []
+        else:
+            importlib.import_module(COMMANDS[command]).main(argv=stage[1:])
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 0 or argv[0] in ("-h", "--help"):
+        print(USAGE)
+        return 0
+    if argv[0] == "--version":
+        print(camsa.VERSION)
+        return 0
+    try:
+        stages = split_pipeline(argv=argv)
+    except PipelineError as exc:
+        print(USAGE, file=sys.stderr)
+        print("camsa: error: {error}".format(error=exc), file=sys.stderr)
+        return 2
+    return run_pipeline(stages=stages)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
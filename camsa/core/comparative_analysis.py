@@ -1,10 +1,7 @@
 # -*- coding: utf-8 -*-
 import enum
 import itertools
-
-import networkx
-
-from camsa.core.data_structures import ScaffoldAssemblyGraph
+from collections import defaultdict
 
 
 class Conflicts(enum.Enum):
@@ -20,9 +17,13 @@ def edges_conflict(edge1, edge2):
 
 
 def get_conflict_type(ap1, ap2):
+    return get_edges_conflict_type(edges1=ap1.get_edges(), edges2=ap2.get_edges())
+
+
+def get_edges_conflict_type(edges1, edges2):
     conflicted_cnt = 0
     non_conflicted_cnt = 0
-    for edge1, edge2 in itertools.product(ap1.get_edges(), ap2.get_edges()):
+    for edge1, edge2 in itertools.product(edges1, edges2):
         if edges_conflict(edge1=edge1, edge2=edge2):
             conflicted_cnt += 1
         else:
@@ -35,24 +36,6 @@ def get_conflict_type(ap1, ap2):
         return Conflicts.conflicted
 
 
-def get_conflicting_edges(sag, ap_edge):
-    result = []
-    for vertex in ap_edge:
-        conflicting_edges = [edge for edge in sag.graph.edges(nbunch=vertex, data=True)
-                             if edges_conflict(edge1=(edge[0], edge[1]), edge2=ap_edge)]
-        result.extend(conflicting_edges)
-    return result
-
-
-def get_conflicting_assembly_points(sag, assembly_point, assembly_points_by_ids):
-    conflicting_assembly_points_ids = []
-    for edge in assembly_point.get_edges():
-        conflicting_edges = get_conflicting_edges(sag=sag, ap_edge=edge)
-        ids = [data["ap_id"] for (u, v, data) in conflicting_edges]
-        conflicting_assembly_points_ids.extend(ids)
-    return [assembly_points_by_ids[ap_id] for ap_id in set(conflicting_assembly_points_ids) if ap_id != assembly_point.self_id]
-
-
 def update_conflicts(ap1, ap2, in_ap1, out_ap1, in_ap2, out_ap2):
     in_sources = set(ap1.sources) & set(ap2.sources)
     ap1_out_sources = set(ap2.sources) - set(ap1.sources)
@@ -86,21 +69,108 @@ def update_assembly_points_as_semi_conflicted(ap1, ap2):
                      in_ap2=in_ap2_destination, out_ap2=out_ap2_destination)
 
 
-def compute_and_update_assembly_points_conflicts(assembly_points_by_ids):
+class ConflictsIndex(object):
+    """ Per-extremity index of collapsed assembly points with their pairwise conflicts and per-source membership
+
+    Conflict type of two assembly points depends only on their edges, so pairwise conflicts are computed once for all assembly points,
+    and conflicts restricted to any subset of sources are derived by filtering, with no scaffold assembly graph rebuilt.
+    """
+
+    def __init__(self, ids_by_extremities, sources_by_ids, conflicts_by_ids):
+        self.ids_by_extremities = ids_by_extremities
+        self.sources_by_ids = sources_by_ids
+        self.conflicts_by_ids = conflicts_by_ids
+
+    @classmethod
+    def from_assembly_points(cls, assembly_points):
+        """
+
+        :param assembly_points: an iterable of collapsed assembly points with integer ids (i.e., all of them, or all the ones from some connected components)
+        """
+        ids_by_extremities = defaultdict(list)
+        edges_by_ids = {}
+        for ap in assembly_points:
+            edges = ap.get_edges()
+            edges_by_ids[ap.self_id] = edges
+            for extremity in set(extremity for edge in edges for extremity in edge):
+                ids_by_extremities[extremity].append(ap.self_id)
+        conflicts_by_ids = {ap_id: [] for ap_id in edges_by_ids}
+        for ap_id in sorted(edges_by_ids):
+            edges = edges_by_ids[ap_id]
+            candidates_ids = set(c_ap_id for extremity in set(extremity for edge in edges for extremity in edge)
+                                 for c_ap_id in ids_by_extremities[extremity] if c_ap_id > ap_id)
+            for c_ap_id in sorted(candidates_ids):
+                conflict_type = get_edges_conflict_type(edges1=edges, edges2=edges_by_ids[c_ap_id])
+                if conflict_type != Conflicts.non_conflicted:
+                    conflicts_by_ids[ap_id].append((c_ap_id, conflict_type))
+                    conflicts_by_ids[c_ap_id].append((ap_id, conflict_type))
+        sources_by_ids = {ap.self_id: frozenset(ap.sources) for ap in assembly_points}
+        return cls(ids_by_extremities=ids_by_extremities, sources_by_ids=sources_by_ids, conflicts_by_ids=conflicts_by_ids)
+
+    def get_assembly_points_ids(self, sources=None):
+        if sources is None:
+            return sorted(self.sources_by_ids)
+        sources = frozenset(sources)
+        return sorted(ap_id for ap_id, ap_sources in self.sources_by_ids.items() if not ap_sources.isdisjoint(sources))
+
+    def get_assembly_points_ids_for_extremity(self, extremity, sources=None):
+        ids = self.ids_by_extremities.get(extremity, [])
+        if sources is None:
+            return list(ids)
+        sources = frozenset(sources)
+        return [ap_id for ap_id in ids if not self.sources_by_ids[ap_id].isdisjoint(sources)]
+
+    def get_conflicts(self, ap_id, sources=None):
+        """ Classifies conflicts of a collapsed assembly point, taking into account only the supplied subset of sources
+
+        :param ap_id: an integer id of the collapsed assembly point
+        :param sources: (optional) a collection of sources names; all sources are considered if None
+        :return: a dict with in/out (semi) conflicted ids by sources, with the same keys as respective assembly point attributes
+        """
+        result = {
+            "in_conflicted": defaultdict(set),
+            "in_semi_conflicted": defaultdict(set),
+            "out_conflicted": defaultdict(set),
+            "out_semi_conflicted": defaultdict(set),
+        }
+        sources = None if sources is None else frozenset(sources)
+        ap_sources = self.sources_by_ids[ap_id] if sources is None else self.sources_by_ids[ap_id] & sources
+        if len(ap_sources) == 0:
+            return result
+        for c_ap_id, conflict_type in self.conflicts_by_ids[ap_id]:
+            c_ap_sources = self.sources_by_ids[c_ap_id] if sources is None else self.sources_by_ids[c_ap_id] & sources
+            if conflict_type == Conflicts.conflicted:
+                in_destination, out_destination = result["in_conflicted"], result["out_conflicted"]
+            else:
+                in_destination, out_destination = result["in_semi_conflicted"], result["out_semi_conflicted"]
+            for source in c_ap_sources:
+                if source in ap_sources:
+                    in_destination[source].add(c_ap_id)
+                else:
+                    out_destination[source].add(c_ap_id)
+        return result
+
+
+def compute_and_update_assembly_points_conflicts(assembly_points_by_ids, conflicts_index=None, assembly_points_ids=None):
     """
 
-    :param assembly_points_by_ids: a dictionary, where key is the assembly point id, and value is merged assembly points
-    :return:
+    :param assembly_points_by_ids: a list of merged assembly points, indexed by their integer ids
+    :param conflicts_index: (optional) a precomputed index of conflicts between the supplied assembly points
+    :param assembly_points_ids: (optional) ids of assembly points (closed under sharing extremities, i.e. whole connected components),
+        for which conflicts are computed; all assembly points are processed if None
+    :return: the conflicts index, which can be further used to obtain conflicts for subsets of sources
     """
-    sag = ScaffoldAssemblyGraph.from_assembly_points(assembly_points=assembly_points_by_ids.values(),
-                                                     add_scaffold_edges=False)
-    for ap in assembly_points_by_ids.values():
-        conflicted_assembly_points = get_conflicting_assembly_points(sag=sag, assembly_point=ap,
-                                                                     assembly_points_by_ids=assembly_points_by_ids)
-        for c_ap in conflicted_assembly_points:
-            conflict_type = get_conflict_type(ap1=ap, ap2=c_ap)
-            assert conflict_type != Conflicts.non_conflicted
+    if assembly_points_ids is None:
+        assembly_points = assembly_points_by_ids
+    else:
+        assembly_points = [assembly_points_by_ids[ap_id] for ap_id in assembly_points_ids]
+    if conflicts_index is None:
+        conflicts_index = ConflictsIndex.from_assembly_points(assembly_points=assembly_points)
+    for ap in assembly_points:
+        for c_ap_id, conflict_type in conflicts_index.conflicts_by_ids[ap.self_id]:
+            c_ap = assembly_points_by_ids[c_ap_id]
             if conflict_type == Conflicts.conflicted:
                 update_assembly_points_as_conflicted(ap1=ap, ap2=c_ap)
             elif conflict_type == Conflicts.semi_conflicted:
                 update_assembly_points_as_semi_conflicted(ap1=ap, ap2=c_ap)
+    return conflicts_index
@@ -3,10 +3,12 @@ import itertools
 import json
 from collections import defaultdict
 
-import networkx
-import six
 import sys
 
+ORIGINAL_ID_PREFIX = "or_"
+MERGED_ID_PREFIX = "m_"
+UNORIENTED_ID_PREFIX = "unor_"
+
 
 class AssemblyPoint(object):
     def __init__(self, seq1, seq2, seq1_or, seq2_or, sources, cw=None, parent_id=None, children_ids=None, self_id=None,
@@ -114,12 +116,23 @@ class AssemblyPoint(object):
 
 
 class APFieldOutExtractorConverter(object):
-    def __init__(self, field_name, converter_name):
+    def __init__(self, field_name, converter_name, id_prefix=None):
         self.field_name = field_name
+        # nested fields (i.e., "ref_metrics.present") are resolved attribute by attribute
+        self.field_path = field_name.split(".")
         self.converter = AP_FIELD_CONVERTERS[converter_name]
+        self.id_prefix = id_prefix
+
+    def extract_field_value(self, ap):
+        result = ap
+        for attribute_name in self.field_path:
+            result = getattr(result, attribute_name)
+        return result
 
     def extract_field_value_str(self, ap):
-        return self.converter.convert(getattr(ap, self.field_name))
+        if self.id_prefix is None:
+            return self.converter.convert(self.extract_field_value(ap))
+        return self.converter.convert(self.extract_field_value(ap), id_prefix=self.id_prefix)
 
 
 class APFieldConverter(object):
@@ -131,6 +144,9 @@ class APFieldConverter(object):
 class APFieldConverterStr(APFieldConverter):
     @staticmethod
     def convert(field_value, **kwargs):
+        id_prefix = kwargs.get("id_prefix", None)
+        if id_prefix is not None:
+            return format_assembly_point_id(ap_id=field_value, id_prefix=id_prefix)
         return str(field_value)
 
 
@@ -138,7 +154,7 @@ class APFieldConverterQuestionIfNone(APFieldConverterStr):
     @staticmethod
     def convert(field_value, **kwargs):
         if field_value is None:
-            field_value = "?"
+            return "?"
         return super(APFieldConverterQuestionIfNone, APFieldConverterQuestionIfNone).convert(field_value=field_value, **kwargs)
 
 
@@ -172,9 +188,9 @@ class IterableFieldConverter(APFieldConverterQuestionIfNone):
 
 class ConflictFieldConverter(APFieldConverter):
     @staticmethod
-    def convert(field_value):
+    def convert(field_value, **kwargs):
         conflicted_ids = [ap_id for conflict_assembly in field_value.values() for ap_id in conflict_assembly]
-        return IterableFieldConverter.convert(field_value=conflicted_ids)
+        return IterableFieldConverter.convert(field_value=conflicted_ids, **kwargs)
 
 
 class RefMetrics(object):
@@ -186,7 +202,7 @@ class RefMetrics(object):
         # the worst error
         self.interchromosomal = False
         # the best error
-        self.tranlocation = False
+        self.translocation = False
         self.translocation_path = []
         # can be combined with translocation, or can be on its own
         self.reversal = False
@@ -196,28 +212,9 @@ class RefMetrics(object):
         self.best_ref_reading_id = None
 
 
-class OrderGraph(object):
-    def __init__(self, graph=None):
-        self.graph = graph if graph is not None else networkx.Graph()
-
-    def add_ap(self, ap):
-        seq1, seq2 = ap.seq1, ap.seq2
-        if self.graph.has_edge(u=seq1, v=seq2):
-            self.graph[seq1][seq2]["ids"].append(ap.self_id)
-            self.graph[seq1][seq2]["sources"].extend(ap.sources)
-        else:
-            self.graph.add_edge(seq1, seq2, ids=[ap.self_id], sources=[source for source in ap.sources])
-
-    @classmethod
-    def from_aps(cls, aps):
-        result = cls()
-        for ap in aps:
-            result.add_ap(ap=ap)
-        return result
-
-
 class MergedScaffoldAssemblyGraph(object):
     def __init__(self):
+        import networkx
         self.graph = networkx.Graph()
 
     def add_edge(self, u, v, weight):
@@ -227,6 +224,7 @@ class MergedScaffoldAssemblyGraph(object):
             self.graph.add_edge(u, v, weight=weight)
 
     def get_maximal_non_conflicting_assembly_graph(self):
+        import networkx
         max_matching = networkx.max_weight_matching(G=self.graph)
         seen = set()
         edges = []
@@ -252,6 +250,7 @@ class MergedScaffoldAssemblyGraph(object):
 
 class ScaffoldAssemblyGraph(object):
     def __init__(self):
+        import networkx
         self.graph = networkx.MultiGraph()
 
     def add_edge(self, u, v, **kwargs):
@@ -271,12 +270,55 @@ class ScaffoldAssemblyGraph(object):
         return result
 
 
+class AssemblyStats(object):
+    """ Aggregated counts of assembly points of a single (individual or grouped) assembly """
+
+    def __init__(self):
+        self.total_cnt = 0
+        self.oriented_cnt = 0
+        self.semi_oriented_cnt = 0
+        self.unoriented_cnt = 0
+        self.non_conflicted_cnt = 0
+        self.in_conflicted_cnt = 0
+        self.in_semi_conflicted_cnt = 0
+        self.out_conflicted_cnt = 0
+        self.out_semi_conflicted_cnt = 0
+        self.merged_cnt = 0
+
+    def add_assembly_point(self, ap, in_conflicted, in_semi_conflicted):
+        self.total_cnt += 1
+        if ap.is_unoriented:
+            self.unoriented_cnt += 1
+        elif ap.is_semi_oriented:
+            self.semi_oriented_cnt += 1
+        else:
+            self.oriented_cnt += 1
+        self.non_conflicted_cnt += ap.is_non_conflicted
+        self.in_conflicted_cnt += in_conflicted
+        self.in_semi_conflicted_cnt += in_semi_conflicted
+        self.out_conflicted_cnt += ap.is_out_conflicted
+        self.out_semi_conflicted_cnt += ap.is_out_semi_conflicted
+        self.merged_cnt += ap.participates_in_merged
+
+    @classmethod
+    def from_assembly(cls, assembly):
+        result = cls()
+        names = assembly.name if isinstance(assembly.name, tuple) else [assembly.name]
+        for ap in assembly.aps:
+            result.add_assembly_point(ap=ap,
+                                      in_conflicted=any(ap.is_in_conflicted_for(name) for name in names),
+                                      in_semi_conflicted=any(ap.is_in_semi_conflicted_for(name) for name in names))
+        return result
+
+
 class Assembly(object):
     def __init__(self, name, aps):
         self.name = name
         self.aps = aps
         self.total_cnt = 0
         self.max_non_conflicting_aps = []
+        # precomputed aggregated counts (see `compute_assemblies_stats`), if None, counts are computed on the fly from assembly points
+        self.stats = None
 
     @property
     def entries_names(self):
@@ -289,86 +331,129 @@ class Assembly(object):
         self.aps = sorted(self.aps,
                           key=lambda ap: (ap.contig_1, ap.contig_1_orientation, ap.contig_2, ap.contig_2_orientation))
 
+    def get_stats(self):
+        if self.stats is not None:
+            return self.stats
+        return AssemblyStats.from_assembly(assembly=self)
+
     @property
     def unoriented_ap_cnt(self):
-        return sum(ap.is_unoriented for ap in self.aps)
+        return self.get_stats().unoriented_cnt
 
     @property
     def semi_oriented_aps_cnt(self):
-        return sum(ap.is_semi_oriented for ap in self.aps)
+        return self.get_stats().semi_oriented_cnt
 
     @property
     def oriented_aps_cnt(self):
-        return sum(ap.is_oriented for ap in self.aps)
+        return self.get_stats().oriented_cnt
 
     @property
     def in_conflicted_cnt(self):
-        cnt = 0
-        for ap in self.aps:
-            if isinstance(self.name, tuple):
-                to_check = self.name
-            else:
-                to_check = [self.name]
-            for name in to_check:
-                if ap.is_in_conflicted_for(name):
-                    cnt += 1
-                    break
-        return cnt
+        return self.get_stats().in_conflicted_cnt
 
     @property
     def in_semi_conflicted_cnt(self):
-        cnt = 0
-        for ap in self.aps:
-            if isinstance(self.name, tuple):
-                to_check = self.name
-            else:
-                to_check = [self.name]
-            for name in to_check:
-                if ap.is_in_semi_conflicted_for(name):
-                    cnt += 1
-                    break
-        return cnt
+        return self.get_stats().in_semi_conflicted_cnt
 
     @property
     def out_conflicted_cnt(self):
-        return sum(ap.is_out_conflicted for ap in self.aps)
+        return self.get_stats().out_conflicted_cnt
 
     @property
     def out_semi_conflicted_cnt(self):
-        return sum(ap.is_out_semi_conflicted for ap in self.aps)
+        return self.get_stats().out_semi_conflicted_cnt
 
     @property
     def non_conflicted_cnt(self):
-        return len([ap for ap in self.aps if ap.is_non_conflicted])
+        return self.get_stats().non_conflicted_cnt
 
+    @property
+    def merged_aps_cnt(self):
+        return self.get_stats().merged_cnt
 
-def assign_ids_to_assembly_points(assembly_points, id_prefix="", id_generator=None, skip_existing=True, sort=False):
-    assembly_points_by_ids = {}
-    if id_generator is None:
-        id_generator = itertools.count()
-    existing_ids = set()
-    if not skip_existing:
-        for ap in assembly_points:
-            if ap.self_id is not None and ap.self_id != "?":
-                existing_ids.add(ap.self_id)
-    if sort:
-        s_assembly_points = sorted(assembly_points, key=lambda entry: (entry.seq1, entry.seq2, entry.seq1_or, entry.seq2_or, entry.sources))
+
+def get_grouped_assemblies(assembly_points):
+    """ Groups assembly points into assemblies by the exact set of their sources in a single pass
+
+    :param assembly_points: an iterable of (collapsed/unoriented) assembly points
+    :return: a list of assemblies, which names are tuples of sources, sorted by the number of assembly points in them (in descending order)
+    """
+    aps_by_sources = defaultdict(list)
+    for ap in assembly_points:
+        aps_by_sources[tuple(ap.sources)].append(ap)
+    result = [Assembly(name=name, aps=aps) for name, aps in aps_by_sources.items()]
+    result.sort(key=lambda assembly: (-len(assembly.aps), len(assembly.name), assembly.name))
+    return result
+
+
+def compute_assemblies_stats(assembly_points, assemblies):
+    """ Computes aggregated counts for all individual and grouped assemblies in a single pass over the assembly points
+
+    Must be invoked after conflicts are computed and merged assembly is obtained, as those are reflected in the counts.
+    Individual assemblies are identified by the source name, grouped ones by the tuple of sources names.
+
+    :param assembly_points: an iterable of collapsed assembly points
+    :param assemblies: a list of individual/grouped assemblies, which obtain their precomputed stats
+    :return: a dict of computed stats by assemblies names
+    """
+    stats_by_names = {assembly.name: AssemblyStats() for assembly in assemblies}
+    for ap in assembly_points:
+        sources = tuple(ap.sources)
+        in_conflicted = in_semi_conflicted = False
+        for source in sources:
+            source_in_conflicted = ap.is_in_conflicted_for(source)
+            source_in_semi_conflicted = ap.is_in_semi_conflicted_for(source)
+            in_conflicted = in_conflicted or source_in_conflicted
+            in_semi_conflicted = in_semi_conflicted or source_in_semi_conflicted
+            stats = stats_by_names.get(source, None)
+            if stats is not None:
+                stats.add_assembly_point(ap=ap, in_conflicted=source_in_conflicted, in_semi_conflicted=source_in_semi_conflicted)
+        stats = stats_by_names.get(sources, None)
+        if stats is not None:
+            stats.add_assembly_point(ap=ap, in_conflicted=in_conflicted, in_semi_conflicted=in_semi_conflicted)
+    for assembly in assemblies:
+        assembly.stats = stats_by_names[assembly.name]
+    return stats_by_names
+
+
+def get_assembly_point_sort_key(assembly_point):
+    return assembly_point.seq1, assembly_point.seq2, assembly_point.seq1_or, assembly_point.seq2_or, tuple(assembly_point.sources)
+
+
+def assign_int_ids_to_assembly_points(assembly_points, sort_keys=None):
+    """ Assigns consecutive integer ids (starting from 0) to the supplied assembly points
+
+    Prefixed string ids (i.e., "m_12") are not stored, and are only formatted when assembly points are written down (see `format_assembly_point_id`).
+
+    :param assembly_points: a list of assembly points
+    :param sort_keys: (optional) a list of precomputed keys, aligned with the assembly points, in ascending order of which the ids are assigned
+    :return: a list of assembly points, where each assembly point is located at the position equal to its id
+    """
+    if sort_keys is not None:
+        order = sorted(range(len(assembly_points)), key=sort_keys.__getitem__)
+        assembly_points = [assembly_points[index] for index in order]
     else:
-        s_assembly_points = assembly_points
-    for assembly_point in s_assembly_points:
-        if skip_existing:
-            new_id = id_prefix + str(six.next(id_generator))
-            assembly_point.self_id = new_id
-        elif assembly_point.self_id is None or assembly_point.self_id == "?":
-            new_id = id_prefix + str(six.next(id_generator))
-            while new_id in existing_ids:
-                new_id = id_prefix + str(six.next(id_generator))
-            assembly_point.self_id = new_id
-        assembly_points_by_ids[assembly_point.self_id] = assembly_point
-    return assembly_points_by_ids
-
-
-def merge_assembly_points(assembly_points_by_source):
+        assembly_points = list(assembly_points)
+    for ap_id, assembly_point in enumerate(assembly_points):
+        assembly_point.self_id = ap_id
+    return assembly_points
+
+
+def format_assembly_point_id(ap_id, id_prefix=""):
+    if ap_id is None:
+        return "?"
+    return id_prefix + str(ap_id)
+
+
+def merge_assembly_points(assembly_points_by_source, unoriented_destination=None):
+    """ Collapses assembly points from all sources into a set of unique ones
+
+    :param assembly_points_by_source: a dict like object, where values are lists of assembly points
+    :param unoriented_destination: a dict like object, that (if supplied) is filled in the same traversal with lists of collapsed assembly points,
+        keyed by the unordered pair of sequences they join (i.e., collapsed assembly points, that are going to be further collapsed into an unoriented one)
+    :return: a list of collapsed assembly points
+    """
     unique_assembly_points = defaultdict(list)
 
     for assembly_points in assembly_points_by_source.values():
@@ -388,13 +473,47 @@ def merge_assembly_points(assembly_points_by_source):
         merged_assembly_point = AssemblyPoint(seq1=seq1, seq2=seq2, seq1_or=seq1_or, seq2_or=seq2_or,
                                               sources=sources, cw=weight, children_ids=children_ids)
         result.append(merged_assembly_point)
+        if unoriented_destination is not None:
+            unoriented_destination[(seq1, seq2)].append(merged_assembly_point)
+    return result
+
+
+def get_unoriented_assembly_points(assembly_points_by_seqs):
+    """ Creates unoriented assembly points from the collapsed ones, grouped by the unordered pair of sequences they join
+
+    Must be invoked after ids are assigned to the collapsed assembly points, as those are used as children ids for the unoriented ones.
+
+    :param assembly_points_by_seqs: a dict like object, filled by the `merge_assembly_points` function
+    :return: a list of unoriented assembly points
+    """
+    result = []
+    for (seq1, seq2), children in assembly_points_by_seqs.items():
+        sources = set(source for ap in children for source in ap.sources)
+        ap = AssemblyPoint(seq1=seq1, seq2=seq2, seq1_or="?", seq2_or="?",
+                           children_ids=set(ap.self_id for ap in children), sources=sources)
+        result.append(ap)
     return result
 
 
+def get_unoriented_assembly_points_sort_keys(unoriented_assembly_points):
+    """ Reuses ids of the collapsed assembly points as the sort keys for the unoriented ones
+
+    Collapsed assembly points ids, being assigned in sorted order, are ordered by the (seq1, seq2) pair first,
+    so the smallest child id orders the unoriented assembly points exactly as their (seq1, seq2) pairs do.
+    """
+    return [min(ap.children_ids) for ap in unoriented_assembly_points]
+
+
 def assign_parents_to_children(children_assembly_points_by_ids, parent_assembly_points_by_ids):
-    for p_assembly_point in parent_assembly_points_by_ids.values():
+    """ Scatters parents ids over the children assembly points
+
+    :param children_assembly_points_by_ids: a list of assembly points, indexed by their integer ids
+    :param parent_assembly_points_by_ids: a list of assembly points, indexed by their integer ids
+    """
+    for p_assembly_point in parent_assembly_points_by_ids:
+        p_id = p_assembly_point.self_id
         for child_id in p_assembly_point.children_ids:
-            children_assembly_points_by_ids[child_id].parent_id = p_assembly_point.self_id
+            children_assembly_points_by_ids[child_id].parent_id = p_id
 
 
 def inverse_orientation(orientation):
@@ -421,13 +540,15 @@ def get_scaffold_edges(assembly_points):
     return [(name + "t", name + "h") for name in unique_scaffolds]
 
 
-def to_json(value):
+def to_json(value, id_prefix=None):
     if isinstance(value, Sequence):
         return json.dumps({"seq_id": value.name, "length": value.length})
     result = {}
     for key, values in value.items():
         if isinstance(values, str):
             result[key] = values
+        elif id_prefix is not None:
+            result[key] = sorted(format_assembly_point_id(ap_id=ap_id, id_prefix=id_prefix) for ap_id in values)
         else:
             result[key] = sorted(values)
     return json.dumps(result)
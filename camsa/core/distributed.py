@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import os
+
+from camsa.core import io as camsa_io
+from camsa.core.incremental import AnalysisStateSnapshot
+from camsa.core.out_of_core import DisjointSets
+
+SHARD_FILE_NAME_TEMPLATE = "shard_{shard_id}.camsa.points"
+
+
+def iter_points(points, delimiter="\t", default_cw_eae=1.0, default_cw_cae=0.75):
+    for file_name in points:
+        with open(os.path.abspath(os.path.expanduser(file_name)), "rt") as source:
+            for ap in camsa_io.iter_pairs(source=source, delimiter=delimiter, default_cw_eae=default_cw_eae, default_cw_cae=default_cw_cae):
+                yield ap
+
+
+def shard_points(points, shards_cnt, output_dir, delimiter="\t", default_cw_eae=1.0, default_cw_cae=0.75):
+    """ Partitions assembly points by connected components of the scaffold assembly graph into self-contained shard files
+
+    Conflicts and merging never span several connected components, so every shard can be analyzed independently (i.e., on a separate node).
+    Input is streamed twice: first to compute connected components of sequences, and then to write every assembly point into its shard.
+
+    :param points: a list of paths to files with CAMSA assembly points
+    :param shards_cnt: a number of shards
+    :param output_dir: a directory, where shard files are written
+    :return: a list of paths to the shard files, and a list of assembly points counts in them
+    """
+    disjoint_sets = DisjointSets()
+    for ap in iter_points(points=points, delimiter=delimiter, default_cw_eae=default_cw_eae, default_cw_cae=default_cw_cae):
+        disjoint_sets.union(ap.seq1, ap.seq2)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    file_names = [os.path.join(output_dir, SHARD_FILE_NAME_TEMPLATE.format(shard_id=shard_id)) for shard_id in range(shards_cnt)]
+    destinations = [open(file_name, "wt") for file_name in file_names]
+    counts = [0] * shards_cnt
+    try:
+        writers = [camsa_io.AssemblyPointsWriter(destination=destination, output_setup=camsa_io.INPUT_OUTPUT_SETUP) for destination in destinations]
+        for ap in iter_points(points=points, delimiter=delimiter, default_cw_eae=default_cw_eae, default_cw_cae=default_cw_cae):
+            shard_id = disjoint_sets.get_component(ap.seq1) % shards_cnt
+            writers[shard_id].write(assembly_points=[ap])
+            counts[shard_id] += 1
+    finally:
+        for destination in destinations:
+            destination.close()
+    return file_names, counts
+
+
+def get_renumbering(keys_by_old_ids):
+    """ Assigns new consecutive integer ids in the ascending order of keys
+
+    :param keys_by_old_ids: a dict of keys by (shard id, old id) pairs
+    :return: a dict of new ids by (shard id, old id) pairs
+    """
+    return {old_id: new_id for new_id, old_id in enumerate(sorted(keys_by_old_ids, key=keys_by_old_ids.__getitem__))}
+
+
+def combine_analysis_states(snapshots):
+    """ Stitches analysis states of independently analyzed shards into a single one
+
+    Ids are reassigned in the same order, in which a single analysis of all the assembly points would assign them.
+
+    :param snapshots: a list of `AnalysisStateSnapshot` objects, obtained for disjoint sets of connected components
+    :return: an `AnalysisStateSnapshot` object
+    """
+    merging_setups = [snapshot.merging_setup for snapshot in snapshots]
+    if any(merging_setup != merging_setups[0] for merging_setup in merging_setups):
+        raise ValueError("Shards were analyzed with different merging setups: {setups}".format(setups=merging_setups))
+
+    original_keys = {}
+    merged_keys = {}
+    unoriented_keys = {}
+    for shard_id, snapshot in enumerate(snapshots):
+        for self_id, source, seq1, seq1_or, seq2, seq2_or, cw, gap_size in snapshot.original_assembly_points:
+            original_keys[(shard_id, self_id)] = (seq1, seq2, seq1_or, seq2_or, (source,))
+        for (seq1, seq1_or, seq2, seq2_or), ap_id in snapshot.merged_ids_by_keys.items():
+            merged_keys[(shard_id, ap_id)] = (seq1, seq2, seq1_or, seq2_or)
+        for seqs, ap_id in snapshot.unoriented_ids_by_keys.items():
+            unoriented_keys[(shard_id, ap_id)] = seqs
+    original_ids = get_renumbering(keys_by_old_ids=original_keys)
+    merged_ids = get_renumbering(keys_by_old_ids=merged_keys)
+    unoriented_ids = get_renumbering(keys_by_old_ids=unoriented_keys)
+
+    original_assembly_points = []
+    merged_ids_by_keys = {}
+    unoriented_ids_by_keys = {}
+    conflicts_by_ids = {}
+    merged_orientations_by_ids = {}
+    for shard_id, snapshot in enumerate(snapshots):
+        for entry in snapshot.original_assembly_points:
+            original_assembly_points.append((original_ids[(shard_id, entry[0])],) + tuple(entry[1:]))
+        for key, ap_id in snapshot.merged_ids_by_keys.items():
+            merged_ids_by_keys[key] = merged_ids[(shard_id, ap_id)]
+        for key, ap_id in snapshot.unoriented_ids_by_keys.items():
+            unoriented_ids_by_keys[key] = unoriented_ids[(shard_id, ap_id)]
+        for ap_id, conflicts in snapshot.conflicts_by_ids.items():
+            conflicts_by_ids[merged_ids[(shard_id, ap_id)]] = tuple({source: sorted(merged_ids[(shard_id, c_ap_id)] for c_ap_id in ids)
+                                                                     for source, ids in field_conflicts.items()}
+                                                                    for field_conflicts in conflicts)
+        for ap_id, orientations in snapshot.merged_orientations_by_ids.items():
+            merged_orientations_by_ids[merged_ids[(shard_id, ap_id)]] = orientations
+    original_assembly_points.sort()
+    return AnalysisStateSnapshot(original_assembly_points=original_assembly_points, merged_ids_by_keys=merged_ids_by_keys,
+                                 unoriented_ids_by_keys=unoriented_ids_by_keys, conflicts_by_ids=conflicts_by_ids,
+                                 merged_orientations_by_ids=merged_orientations_by_ids,
+                                 merging_setup=merging_setups[0] if len(merging_setups) > 0 else None)
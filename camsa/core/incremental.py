@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import os
+from collections import defaultdict
+
+import six
+from six.moves import cPickle as pickle
+
+from camsa.core import io as camsa_io
+from camsa.core.data_structures import AssemblyPoint, inverse_orientation
+
+STATE_FILE_NAME = "camsa.state"
+INPUT_CONFIG_FILE_NAME = "camsa_config.txt"
+STATE_VERSION = 1
+CONFLICTS_FIELDS = ("in_conflicted", "in_semi_conflicted", "out_conflicted", "out_semi_conflicted")
+
+
+def get_collapsed_assembly_point_key(ap):
+    """ A key, under which assembly points are collapsed together (see `merge_assembly_points`) """
+    if ap.seq1 < ap.seq2:
+        return ap.seq1, ap.seq1_or, ap.seq2, ap.seq2_or
+    return ap.seq2, inverse_orientation(ap.seq2_or), ap.seq1, inverse_orientation(ap.seq1_or)
+
+
+class AnalysisStateSnapshot(object):
+    """ Results of a finished CAMSA analysis, that are required to incrementally update it with new assembly points
+
+    Only plain values are stored: original assembly points, ids of collapsed/unoriented assembly points by their keys,
+    computed conflicts and the merged assembly participation of the collapsed ones, the merging setup,
+    as well as names of all the input files (copied into the "input" subdirectory of the report), that the analysis is based on.
+    """
+
+    def __init__(self, original_assembly_points, merged_ids_by_keys, unoriented_ids_by_keys, conflicts_by_ids, merged_orientations_by_ids, merging_setup,
+                 input_files=None):
+        self.original_assembly_points = original_assembly_points
+        self.merged_ids_by_keys = merged_ids_by_keys
+        self.unoriented_ids_by_keys = unoriented_ids_by_keys
+        self.conflicts_by_ids = conflicts_by_ids
+        self.merged_orientations_by_ids = merged_orientations_by_ids
+        self.merging_setup = merging_setup
+        self.input_files = input_files
+
+    @classmethod
+    def from_analysis(cls, original_assembly_points_by_ids, merged_assembly_points_by_ids, unoriented_assembly_points_by_ids, merging_setup,
+                      input_files=None):
+        original_assembly_points = [(ap.self_id, ap.sources[0], ap.seq1, ap.seq1_or, ap.seq2, ap.seq2_or, ap.cw, ap.gap_size)
+                                    for ap in original_assembly_points_by_ids]
+        merged_ids_by_keys = {get_collapsed_assembly_point_key(ap): ap.self_id for ap in merged_assembly_points_by_ids}
+        unoriented_ids_by_keys = {(ap.seq1, ap.seq2): ap.self_id for ap in unoriented_assembly_points_by_ids}
+        conflicts_by_ids = {}
+        merged_orientations_by_ids = {}
+        for ap in merged_assembly_points_by_ids:
+            conflicts_by_ids[ap.self_id] = tuple({source: sorted(ids) for source, ids in getattr(ap, field).items()} for field in CONFLICTS_FIELDS)
+            if ap.participates_in_merged:
+                merged_orientations_by_ids[ap.self_id] = (ap.seq1_par_or, ap.seq2_par_or)
+        return cls(original_assembly_points=original_assembly_points, merged_ids_by_keys=merged_ids_by_keys,
+                   unoriented_ids_by_keys=unoriented_ids_by_keys, conflicts_by_ids=conflicts_by_ids,
+                   merged_orientations_by_ids=merged_orientations_by_ids, merging_setup=merging_setup, input_files=input_files)
+
+    def get_assembly_points_by_sources(self):
+        result = defaultdict(list)
+        for self_id, source, seq1, seq1_or, seq2, seq2_or, cw, gap_size in self.original_assembly_points:
+            result[source].append(AssemblyPoint(seq1=seq1, seq2=seq2, seq1_or=seq1_or, seq2_or=seq2_or, sources=[source],
+                                                cw=cw, gap_size=gap_size, self_id=self_id))
+        return result
+
+    def restore_conflicts(self, ap):
+        for field, conflicts in zip(CONFLICTS_FIELDS, self.conflicts_by_ids[ap.self_id]):
+            destination = getattr(ap, field)
+            for source, ids in conflicts.items():
+                destination[source].update(ids)
+
+    def restore_merged_assembly_participation(self, ap, original_assembly_points_by_ids):
+        orientations = self.merged_orientations_by_ids.get(ap.self_id, None)
+        if orientations is None:
+            return
+        for target in [ap] + [original_assembly_points_by_ids[child_id] for child_id in ap.children_ids]:
+            target.participates_in_merged = True
+            target.seq1_par_or, target.seq2_par_or = orientations
+
+    def get_input_files(self, input_dir):
+        """ Reads the input files of the analysis back from the "input" subdirectory of its report
+
+        If the directory (or any of the recorded files) is missing, original assembly points are written down by their sources instead,
+        so that every assembly point of the analysis is still accounted for.
+
+        :return: a list of (file name, content bytes) pairs
+        """
+        file_names = self.input_files
+        if file_names is None and os.path.isdir(input_dir):
+            file_names = sorted(name for name in os.listdir(input_dir) if name != INPUT_CONFIG_FILE_NAME)
+        if file_names is not None and all(os.path.isfile(os.path.join(input_dir, name)) for name in file_names):
+            result = []
+            for name in file_names:
+                with open(os.path.join(input_dir, name), "rb") as source:
+                    result.append((name, source.read()))
+            return result
+        result = []
+        for source, aps in sorted(self.get_assembly_points_by_sources().items()):
+            destination = six.StringIO()
+            camsa_io.write_assembly_points(assembly_points=aps, destination=destination, output_setup=camsa_io.INPUT_OUTPUT_SETUP)
+            result.append(("{source}.camsa.points".format(source=source), destination.getvalue().encode("utf-8")))
+        return result
+
+    def save(self, file_name):
+        with open(file_name, "wb") as destination:
+            pickle.dump((STATE_VERSION, self.__dict__), destination, protocol=2)
+
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name, "rb") as source:
+            version, data = pickle.load(source)
+        if version != STATE_VERSION:
+            raise ValueError("Unsupported CAMSA analysis state version {version} in \"{file_name}\"".format(version=version, file_name=file_name))
+        return cls(**data)
+
+
+def assign_stable_int_ids_to_assembly_points(assembly_points, keys, previous_ids_by_keys, sort_keys=None):
+    """ Keeps previously assigned integer ids for assembly points with known keys, and assigns next consecutive ids to the new ones
+
+    :param assembly_points: a list of assembly points, which keys cover all of the previously known ones
+    :param keys: a list of keys, aligned with the assembly points, by which previous ids are looked up
+    :param previous_ids_by_keys: a dict of previously assigned consecutive integer ids (starting from 0) by the keys
+    :param sort_keys: (optional) a list of keys, aligned with the assembly points, in ascending order of which new ids are assigned
+    :return: a list of assembly points, where each assembly point is located at the position equal to its id
+    """
+    result = [None] * len(previous_ids_by_keys)
+    new_positions = []
+    for position, (ap, key) in enumerate(zip(assembly_points, keys)):
+        ap_id = previous_ids_by_keys.get(key, None)
+        if ap_id is None:
+            new_positions.append(position)
+        else:
+            ap.self_id = ap_id
+            result[ap_id] = ap
+    if sort_keys is not None:
+        new_positions.sort(key=sort_keys.__getitem__)
+    for position in new_positions:
+        ap = assembly_points[position]
+        ap.self_id = len(result)
+        result.append(ap)
+    return result
+
+
+def get_connected_seqs(assembly_points, seqs):
+    """ Collects all sequences, that are connected (via assembly points) to the supplied ones
+
+    :param assembly_points: an iterable of assembly points
+    :param seqs: an iterable of sequences names
+    :return: a set of sequences names, forming connected components, that include the supplied sequences
+    """
+    neighbors = defaultdict(list)
+    for ap in assembly_points:
+        neighbors[ap.seq1].append(ap.seq2)
+        neighbors[ap.seq2].append(ap.seq1)
+    result = set()
+    stack = list(seqs)
+    while len(stack) > 0:
+        seq = stack.pop()
+        if seq in result:
+            continue
+        result.add(seq)
+        stack.extend(neighbor for neighbor in neighbors[seq] if neighbor not in result)
+    return result
+
+
+def append_int_ids_to_assembly_points(assembly_points_by_ids, new_assembly_points, sort_keys=None):
+    """ Assigns next consecutive integer ids to the new assembly points and appends them to the existing ones
+
+    :param assembly_points_by_ids: a list of assembly points, indexed by their integer ids
+    :param new_assembly_points: a list of assembly points without ids
+    :param sort_keys: (optional) a list of keys, aligned with the new assembly points, in ascending order of which ids are assigned
+    :return: a list of all assembly points, where each assembly point is located at the position equal to its id
+    """
+    result = list(assembly_points_by_ids)
+    order = list(range(len(new_assembly_points)))
+    if sort_keys is not None:
+        order.sort(key=sort_keys.__getitem__)
+    for position in order:
+        ap = new_assembly_points[position]
+        ap.self_id = len(result)
+        result.append(ap)
+    return result
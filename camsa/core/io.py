@@ -6,6 +6,7 @@ from collections import defaultdict
 from enum import Enum
 
 from camsa.core.data_structures import AssemblyPoint, APFieldOutExtractorConverter, Sequence
+from camsa.core.data_structures import ORIGINAL_ID_PREFIX, MERGED_ID_PREFIX, UNORIENTED_ID_PREFIX
 
 
 def get_fn_relations_for_column_names(fieldnames, aliases):
@@ -67,27 +68,21 @@ def extract_nullable_numerical_value(field, row, fn_relations, default="?"):
     return value
 
 
-def read_pairs(source, delimiter="\t", destination=None, default_cw_eae=1, default_cw_cae=0.9, read_ids=False, read_extra_data=False):
-    """
+def iter_pairs(source, delimiter="\t", default_cw_eae=1, default_cw_cae=0.9, read_ids=False, read_extra_data=False):
+    """ Streams assembly points from the supplied source one by one
 
-    :param read_ids: a flag to whether or not try to extract the id values from the input (if no column is there, None is the result) 
     :param source: file like object tot APs data from
     :param delimiter: tab/comma/etc separator
-    :param destination: data structure, where information about APs will be stored
     :param default_cw_eae: confidence weight for exact AE, in case ? is provided in source
     :param default_cw_cae: confidence wight for candidate AE, in case ? is provided in source
-    :return: destination data structure, that can be viewed as a default dict of list of APs, where key is the source of the AP
+    :return: a generator of assembly points
     """
-
-    if destination is None:
-        destination = defaultdict(list)
     reader = csv.DictReader(source, delimiter=delimiter)
     fieldnames = reader.fieldnames
     fn_relations = get_fn_relations_for_column_names(fieldnames=fieldnames, aliases=PAIRS_COLUMN_ALIASES)
     for row in filter(lambda entry: not entry[fieldnames[0]].startswith("#"), reader):
         processed_fields = set()
         origin_field = fn_relations["origin"]
-        origin = row[origin_field]
         processed_fields.add(origin_field)
         cw = extract_nullable_numerical_value(field="cw", row=row, fn_relations=fn_relations)
         if "cw" in fn_relations:
@@ -125,7 +120,26 @@ def read_pairs(source, delimiter="\t", destination=None, default_cw_eae=1, defau
             remaining_fields = set(fieldnames) - set(processed_fields)
             for field in remaining_fields:
                 ap.extra_data[field] = row[field]
-        destination[origin].append(ap)
+        yield ap
+
+
+def read_pairs(source, delimiter="\t", destination=None, default_cw_eae=1, default_cw_cae=0.9, read_ids=False, read_extra_data=False):
+    """
+
+    :param read_ids: a flag to whether or not try to extract the id values from the input (if no column is there, None is the result) 
+    :param source: file like object tot APs data from
+    :param delimiter: tab/comma/etc separator
+    :param destination: data structure, where information about APs will be stored
+    :param default_cw_eae: confidence weight for exact AE, in case ? is provided in source
+    :param default_cw_cae: confidence wight for candidate AE, in case ? is provided in source
+    :return: destination data structure, that can be viewed as a default dict of list of APs, where key is the source of the AP
+    """
+
+    if destination is None:
+        destination = defaultdict(list)
+    for ap in iter_pairs(source=source, delimiter=delimiter, default_cw_eae=default_cw_eae, default_cw_cae=default_cw_cae,
+                         read_ids=read_ids, read_extra_data=read_extra_data):
+        destination[ap.sources[0]].append(ap)
     return destination
 
 
@@ -148,6 +162,38 @@ def read_assembly_points_from_input_sources(sources, delimiter="\t", default_cw_
     return result
 
 
+def iter_handed_off_assembly_points(assembly_points, output_setup=None, default_cw_eae=1, default_cw_cae=0.75):
+    """ Brings assembly points, produced in memory (i.e., by converters), to the exact form, in which `iter_pairs` would read them back
+
+    Allows to pass assembly points from converters to the analysis without writing them down and parsing them again.
+
+    :param assembly_points: an iterable of assembly points
+    :param output_setup: (optional) the CAMSA-out formatting, that the assembly points would have been written with;
+        confidence weights and gap sizes are only kept, if the respective fields are present in it
+    :return: a generator of new assembly points
+    """
+    fields = None
+    if output_setup is not None:
+        fields = {entry.split(",")[1] for entry in output_setup.split("|")}
+    for ap in assembly_points:
+        if ap.seq1 == ap.seq2:
+            continue
+        seq1_or, seq2_or = str(ap.seq1_or), str(ap.seq2_or)
+        cw = ap.cw if fields is None or "cw" in fields else "?"
+        try:
+            cw = float(cw)
+        except (ValueError, TypeError):
+            cw = default_cw_eae if "?" not in [seq1_or, seq2_or] else default_cw_cae
+        gap_size = ap.gap_size if fields is None or "gap_size" in fields else "?"
+        try:
+            gap_size = float(gap_size)
+        except (ValueError, TypeError):
+            gap_size = "?"
+        source = ",".join(sorted(set(str(source) for source in ap.sources)))
+        yield AssemblyPoint(seq1=str(ap.seq1), seq2=str(ap.seq2), seq1_or=seq1_or, seq2_or=seq2_or,
+                            sources=[source], cw=cw, gap_size=gap_size, self_id="?")
+
+
 LENGTHS_COLUMN_ALIASES = {
     ########################
     "ctg_id": "seq_id",
@@ -174,33 +220,73 @@ class OrientationChoice(Enum):
     merged = 1
 
 
-def get_header_and_extract_list(settings):
+# prefixes, that integer ids of CAMSA assembly points are formatted with on output
+# "conflicts" entry is used for all fields, that are converted with the "conflict" converter
+ORIGINAL_IDS_PREFIXES = {
+    "self_id": ORIGINAL_ID_PREFIX,
+    "parent_id": MERGED_ID_PREFIX,
+}
+
+MERGED_IDS_PREFIXES = {
+    "self_id": MERGED_ID_PREFIX,
+    "children_ids": ORIGINAL_ID_PREFIX,
+    "conflicts": MERGED_ID_PREFIX,
+}
+
+UNORIENTED_IDS_PREFIXES = {
+    "self_id": UNORIENTED_ID_PREFIX,
+    "children_ids": MERGED_ID_PREFIX,
+}
+
+
+# the formatting, that retains all the information, that is read from the CAMSA points by `iter_pairs`
+INPUT_OUTPUT_SETUP = "origin,sources,iter|seq1,seq1,str|seq1_or,seq1_or,str|seq2,seq2,str|seq2_or,seq2_or,str|gap_size,gap_size,str|cw,cw,str"
+
+
+def get_header_and_extract_list(settings, ids_prefixes=None):
+    if ids_prefixes is None:
+        ids_prefixes = {}
     data = settings.split("|")
     converters_setups = []
     for entry in data:
         converters_setups.append(entry.split(","))
     header = [entry[0] for entry in converters_setups]
-    converters = [APFieldOutExtractorConverter(field_name=entry[1], converter_name=entry[2]) for entry in converters_setups]
+    converters = []
+    for _, field_name, converter_name in converters_setups:
+        id_prefix = ids_prefixes.get("conflicts" if converter_name == "conflict" else field_name, None)
+        converters.append(APFieldOutExtractorConverter(field_name=field_name, converter_name=converter_name, id_prefix=id_prefix))
     return header, converters
 
 
-def write_assembly_points(assembly_points, destination, output_setup, delimiter="\t"):
+def write_assembly_points(assembly_points, destination, output_setup, delimiter="\t", ids_prefixes=None):
     """ Output a collection of assembly point in a text format to the specified stream
 
     :param assembly_points: an iterable with a collection of assembly points to be written down
     :param destination: a file like object to write to
     :param delimiter: a separator used for the SV format
+    :param ids_prefixes: a dict, with prefixes by field names, that integer ids (self/parent/children/conflicts) are formatted with
     :param orientation_type: a choice for AP relative seq orientations to be displayed (original = input vs inferred = merged).
         Makes a difference only for the un/semi-oriented APs
     """
-    intra_delimiter = "," if delimiter != "," else ";"
+    writer = AssemblyPointsWriter(destination=destination, output_setup=output_setup, delimiter=delimiter, ids_prefixes=ids_prefixes)
+    writer.write(assembly_points=assembly_points)
 
-    writer = csv.writer(destination, delimiter=delimiter)
-    header, field_processor = get_header_and_extract_list(settings=output_setup)
-    writer.writerow(header)
-    for ap in assembly_points:
-        assembly_points_entries_list = [processor.extract_field_value_str(ap) for processor in field_processor]
-        writer.writerow(assembly_points_entries_list)
+
+class AssemblyPointsWriter(object):
+    """ Writes assembly points to the stream in several portions (i.e., one connected component at a time), with the header written only once
+
+    :param write_header: whether to write the header (i.e., False, when the stream appends to a previously written file)
+    """
+
+    def __init__(self, destination, output_setup, delimiter="\t", ids_prefixes=None, write_header=True):
+        self.writer = csv.writer(destination, delimiter=delimiter)
+        header, self.field_processor = get_header_and_extract_list(settings=output_setup, ids_prefixes=ids_prefixes)
+        if write_header:
+            self.writer.writerow(header)
+
+    def write(self, assembly_points):
+        for ap in assembly_points:
+            self.writer.writerow([processor.extract_field_value_str(ap) for processor in self.field_processor])
 
 
 def write_seqi(sequences, destination, output_setup, delimiter="\t"):
@@ -4,9 +4,6 @@ import enum
 import numbers
 from collections import defaultdict
 
-import blist
-import networkx
-
 from camsa.core.data_structures import MergedScaffoldAssemblyGraph, inverse_orientation
 from camsa.core.data_structures import get_scaffold_edges
 
@@ -28,6 +25,10 @@ def get_un_oriented_assembly_points(assembly_points):
 ####################################################################
 
 def merge_greedily(assembly_points_by_sources, acyclic=True, min_cw=0.0):
+    # merging dependencies are imported lazily, as most of the CAMSA scripts never merge anything
+    import blist
+    import networkx
+
     def get_redundant_edges_from_assembly_points(e, points_by_edges, processed_points):
         result = []
         for assembly_point in points_by_edges[e]:
@@ -99,6 +100,8 @@ def merge_greedily(assembly_points_by_sources, acyclic=True, min_cw=0.0):
 ####################################################################
 
 def maximal_matching(assembly_points_by_sources, acyclic=True, min_cw=0.0):
+    import networkx
+
     assembly_points_by_sources = [ap for ap_list in assembly_points_by_sources.values() for ap in ap_list]
     scaffold_edges = get_scaffold_edges(assembly_points=assembly_points_by_sources)
     unoriented_assembly_points = get_un_oriented_assembly_points(assembly_points=assembly_points_by_sources)
@@ -155,8 +158,14 @@ strategies_bindings = {
 }
 
 
-def update_assembly_points_with_merged_assembly(original_assembly_points_by_ids, merged_assembly_points_by_ids, merged_assembly_graph):
-    for ap in merged_assembly_points_by_ids.values():
+def iter_assembly_points_in_merged_assembly(assembly_points, merged_assembly_graph):
+    """ Finds assembly points, that participate in the merged assembly, without updating them
+
+    :param assembly_points: an iterable of collapsed assembly points
+    :param merged_assembly_graph: a graph, produced by one of the merging strategies
+    :return: a generator of (assembly point, seq1 orientation, seq2 orientation) triples, where orientations are the ones in the merged assembly
+    """
+    for ap in assembly_points:
         for u, v in ap.get_edges():
             if merged_assembly_graph.has_edge(u=u, v=v):
                 par_or_1 = "+" if u.endswith("h") else "-"
@@ -164,19 +173,25 @@ def update_assembly_points_with_merged_assembly(original_assembly_points_by_ids,
                 forward = u[:-1] == ap.seq1
                 if not forward:
                     par_or_1, par_or_2 = inverse_orientation(par_or_2), inverse_orientation(par_or_1)
-                ap.seq1_par_or = par_or_1
-                ap.seq2_par_or = par_or_2
-                ap.participates_in_merged = True
-                for child_id in ap.children_ids:
-                    child = original_assembly_points_by_ids[child_id]
-                    child.participates_in_merged = True
-                    child.seq1_par_or = par_or_1
-                    child.seq2_par_or = par_or_2
+                yield ap, par_or_1, par_or_2
                 break
 
 
+def update_assembly_points_with_merged_assembly(original_assembly_points_by_ids, merged_assembly_points_by_ids, merged_assembly_graph):
+    for ap, par_or_1, par_or_2 in iter_assembly_points_in_merged_assembly(assembly_points=merged_assembly_points_by_ids,
+                                                                          merged_assembly_graph=merged_assembly_graph):
+        ap.seq1_par_or = par_or_1
+        ap.seq2_par_or = par_or_2
+        ap.participates_in_merged = True
+        for child_id in ap.children_ids:
+            child = original_assembly_points_by_ids[child_id]
+            child.participates_in_merged = True
+            child.seq1_par_or = par_or_1
+            child.seq2_par_or = par_or_2
+
+
 def update_gap_sizes_in_merged_assembly(original_assembly_points_by_ids, merged_assembly_points_by_ids):
-    aps_in_merged_assembly = [ap for ap in merged_assembly_points_by_ids.values() if ap.participates_in_merged]
+    aps_in_merged_assembly = [ap for ap in merged_assembly_points_by_ids if ap.participates_in_merged]
     for ap in aps_in_merged_assembly:
         children_aps = [original_assembly_points_by_ids[c_id] for c_id in ap.children_ids]
         cumulative_gap_size = 0.0
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+import heapq
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+from collections import defaultdict, OrderedDict
+
+from camsa.core import io as camsa_io
+from camsa.core import merging
+from camsa.core.comparative_analysis import compute_and_update_assembly_points_conflicts
+from camsa.core.data_structures import AssemblyPoint, inverse_orientation
+from camsa.core.merging import update_assembly_points_with_merged_assembly, update_gap_sizes_in_merged_assembly
+from camsa.core.reference_analysis import ReferenceIndex, analyze_and_update_assembly_points_based_on_reference
+
+# approximate number of bytes, that a single canonical record (together with assembly points, built from it) occupies in memory
+# used to translate the user specified memory limit into the number of records, that are buffered / processed at once
+RECORD_SIZE_ESTIMATE = 1024
+MAX_BUCKETS_CNT = 512
+# subgroups files are kept open (least recently used ones are closed and later reopened for appending) up to this number,
+# as the number of subgroups grows with the number of sources combinations, and can exceed the limit of open file descriptors
+MAX_OPEN_SUBGROUPS_FILES = 128
+
+
+class DisjointSets(object):
+    """ Union-find over hashable items (i.e., sequences names), that are mapped to consecutive integer indexes """
+
+    def __init__(self):
+        self.indexes = {}
+        self.parents = []
+
+    def get_index(self, item):
+        index = self.indexes.get(item, None)
+        if index is None:
+            index = len(self.parents)
+            self.indexes[item] = index
+            self.parents.append(index)
+        return index
+
+    def find(self, index):
+        parents = self.parents
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    def union(self, item1, item2):
+        root1 = self.find(self.get_index(item1))
+        root2 = self.find(self.get_index(item2))
+        if root1 != root2:
+            if root1 < root2:
+                root1, root2 = root2, root1
+            self.parents[root1] = root2
+
+    def get_component(self, item):
+        return self.find(self.indexes[item])
+
+
+def get_canonical_record(ap, serial):
+    """ Represents an input assembly point in a form, in which all assembly points, that are collapsed together, have equal leading fields
+
+    :return: a tuple (seq1, seq2, seq1_or, seq2_or, source, serial, cw, gap_size, inverted), where seq1 < seq2
+    """
+    if ap.seq1 < ap.seq2:
+        return ap.seq1, ap.seq2, ap.seq1_or, ap.seq2_or, ap.sources[0], serial, ap.cw, ap.gap_size, False
+    return ap.seq2, ap.seq1, inverse_orientation(ap.seq2_or), inverse_orientation(ap.seq1_or), ap.sources[0], serial, ap.cw, ap.gap_size, True
+
+
+def get_original_assembly_point(record, self_id, parent_id):
+    seq1, seq2, seq1_or, seq2_or, source, _, cw, gap_size, inverted = record
+    if inverted:
+        seq1, seq2, seq1_or, seq2_or = seq2, seq1, inverse_orientation(seq2_or), inverse_orientation(seq1_or)
+    return AssemblyPoint(seq1=seq1, seq2=seq2, seq1_or=seq1_or, seq2_or=seq2_or, sources=[source], cw=cw, gap_size=gap_size,
+                         self_id=self_id, parent_id=parent_id)
+
+
+def serialize_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def parse_numerical_value(value):
+    if value == "?":
+        return value
+    return float(value)
+
+
+def serialize_canonical_record(record):
+    seq1, seq2, seq1_or, seq2_or, source, serial, cw, gap_size, inverted = record
+    return "\t".join([seq1, seq2, seq1_or, seq2_or, source, str(serial), serialize_value(cw), serialize_value(gap_size), "1" if inverted else "0"])
+
+
+def parse_canonical_record(line):
+    seq1, seq2, seq1_or, seq2_or, source, serial, cw, gap_size, inverted = line.rstrip("\n").split("\t")
+    return seq1, seq2, seq1_or, seq2_or, source, int(serial), parse_numerical_value(cw), parse_numerical_value(gap_size), inverted == "1"
+
+
+def write_run(records, file_name):
+    with open(file_name, "wt") as destination:
+        for record in records:
+            destination.write(serialize_canonical_record(record))
+            destination.write("\n")
+
+
+def iter_run(file_name):
+    with open(file_name, "rt") as source:
+        for line in source:
+            yield parse_canonical_record(line)
+
+
+def spill_sorted_runs(records, buffer_size, tmp_dir):
+    """ Splits a stream of canonical records into sorted runs of at most `buffer_size` records, stored in temporary files
+
+    :return: a list of paths to the sorted runs
+    """
+    runs = []
+    buffer = []
+    for record in records:
+        buffer.append(record)
+        if len(buffer) >= buffer_size:
+            buffer.sort()
+            runs.append(os.path.join(tmp_dir, "run_{cnt}.tsv".format(cnt=len(runs))))
+            write_run(records=buffer, file_name=runs[-1])
+            buffer = []
+    if len(buffer) > 0:
+        buffer.sort()
+        runs.append(os.path.join(tmp_dir, "run_{cnt}.tsv".format(cnt=len(runs))))
+        write_run(records=buffer, file_name=runs[-1])
+    return runs
+
+
+def iter_collapsed_records(runs):
+    """ K-way merges sorted runs of canonical records and groups those, that are collapsed into a single assembly point
+
+    Collapsed groups are produced in the (seq1, seq2, seq1_or, seq2_or) order, that is the same order, in which collapsed assembly points obtain their ids.
+
+    :return: a generator of ((seq1, seq2, seq1_or, seq2_or), [canonical records]) pairs
+    """
+    return itertools.groupby(heapq.merge(*[iter_run(file_name=run) for run in runs]), key=lambda record: record[:4])
+
+
+def serialize_collapsed_record(component, ap_id, unoriented_id, records):
+    entries = [str(component), str(ap_id), str(unoriented_id)]
+    for record in records:
+        entries.append(serialize_canonical_record(record))
+    return "\t".join(entries)
+
+
+def parse_collapsed_record(line):
+    entries = line.rstrip("\n").split("\t")
+    component, ap_id, unoriented_id = int(entries[0]), int(entries[1]), int(entries[2])
+    records = []
+    for start in range(3, len(entries), 9):
+        records.append(parse_canonical_record("\t".join(entries[start:start + 9])))
+    return component, ap_id, unoriented_id, records
+
+
+class ComponentsOutput(object):
+    """ Output files of CAMSA analysis, that are filled in one connected component at a time """
+
+    def __init__(self, output_dir, output_setups, reference=False):
+        self.output_setups = output_setups
+        merged_report_dir = os.path.join(output_dir, "merged")
+        comparative_report_dir = os.path.join(output_dir, "comparative")
+        self.subgroups_report_dir = os.path.join(comparative_report_dir, "subgroups")
+        self.subgroups_unoriented_report_dir = os.path.join(comparative_report_dir, "unoriented_subgroups")
+        reference_report_dir = os.path.join(output_dir, "reference")
+        for dir_path in [merged_report_dir, comparative_report_dir, reference_report_dir]:
+            camsa_io.remove_dir(dir_path=dir_path)
+        for dir_path in [merged_report_dir, self.subgroups_report_dir, self.subgroups_unoriented_report_dir]:
+            os.makedirs(dir_path)
+        self.files = []
+        self.merged_writer = self.open_writer(file_name=os.path.join(merged_report_dir, "merged.camsa.points"),
+                                              output_setup=output_setups["merged"], ids_prefixes=camsa_io.MERGED_IDS_PREFIXES)
+        self.original_writer = self.open_writer(file_name=os.path.join(comparative_report_dir, "original.camsa.points"),
+                                                output_setup=output_setups["original"], ids_prefixes=camsa_io.ORIGINAL_IDS_PREFIXES)
+        self.collapsed_writer = self.open_writer(file_name=os.path.join(comparative_report_dir, "collapsed.camsa.points"),
+                                                 output_setup=output_setups["collapsed"], ids_prefixes=camsa_io.MERGED_IDS_PREFIXES)
+        self.reference_writer = None
+        if reference:
+            os.makedirs(reference_report_dir)
+            self.reference_writer = self.open_writer(file_name=os.path.join(reference_report_dir, "evaluated.camsa.points"),
+                                                     output_setup=output_setups["reference"], ids_prefixes=camsa_io.MERGED_IDS_PREFIXES)
+        self.subgroups_files = OrderedDict()
+        self.subgroups_created = set()
+
+    def open_writer(self, file_name, output_setup, ids_prefixes):
+        destination = open(file_name, "wt")
+        self.files.append(destination)
+        return camsa_io.AssemblyPointsWriter(destination=destination, output_setup=output_setup, ids_prefixes=ids_prefixes)
+
+    def get_subgroup_writer(self, group_name, unoriented=False):
+        """ A writer for the subgroup file, with at most `MAX_OPEN_SUBGROUPS_FILES` subgroups files open at any time """
+        key = (unoriented, group_name)
+        if key in self.subgroups_files:
+            destination, writer = self.subgroups_files.pop(key)
+            self.subgroups_files[key] = (destination, writer)
+            return writer
+        while len(self.subgroups_files) >= MAX_OPEN_SUBGROUPS_FILES:
+            _, (destination, _) = self.subgroups_files.popitem(last=False)
+            destination.close()
+        dir_path = self.subgroups_unoriented_report_dir if unoriented else self.subgroups_report_dir
+        file_name = os.path.join(dir_path, "{group_name}.camsa.points".format(group_name=".".join(group_name)))
+        is_created = key in self.subgroups_created
+        destination = open(file_name, "at" if is_created else "wt")
+        writer = camsa_io.AssemblyPointsWriter(destination=destination, output_setup=self.output_setups["subgroups_uo" if unoriented else "subgroups"],
+                                               ids_prefixes=camsa_io.UNORIENTED_IDS_PREFIXES if unoriented else camsa_io.MERGED_IDS_PREFIXES,
+                                               write_header=not is_created)
+        self.subgroups_created.add(key)
+        self.subgroups_files[key] = (destination, writer)
+        return writer
+
+    def write_component(self, original_assembly_points, merged_assembly_points, unoriented_assembly_points):
+        self.original_writer.write(assembly_points=original_assembly_points)
+        self.collapsed_writer.write(assembly_points=merged_assembly_points)
+        self.merged_writer.write(assembly_points=[ap for ap in merged_assembly_points if ap.participates_in_merged])
+        if self.reference_writer is not None:
+            self.reference_writer.write(assembly_points=merged_assembly_points)
+        for ap in merged_assembly_points:
+            self.get_subgroup_writer(group_name=tuple(ap.sources)).write(assembly_points=[ap])
+        for ap in unoriented_assembly_points:
+            self.get_subgroup_writer(group_name=tuple(ap.sources), unoriented=True).write(assembly_points=[ap])
+
+    def close(self):
+        for destination in self.files:
+            destination.close()
+        for destination, _ in self.subgroups_files.values():
+            destination.close()
+        self.subgroups_files.clear()
+
+
+def build_component(collapsed_records):
+    """ Creates original, collapsed and unoriented assembly points of a single connected component from its collapsed records
+
+    :param collapsed_records: a list of (collapsed id, unoriented id, canonical records) triples, sorted by collapsed ids
+    :return: original and collapsed assembly points by ids (dicts) and a list of unoriented assembly points
+    """
+    original_assembly_points_by_ids = {}
+    merged_assembly_points_by_ids = {}
+    unoriented_children = defaultdict(list)
+    for ap_id, unoriented_id, records in collapsed_records:
+        children_ids = []
+        for record in records:
+            child_id = record[5]
+            original_assembly_points_by_ids[child_id] = get_original_assembly_point(record=record, self_id=child_id, parent_id=ap_id)
+            children_ids.append(child_id)
+        seq1, seq2, seq1_or, seq2_or = records[0][:4]
+        merged_ap = AssemblyPoint(seq1=seq1, seq2=seq2, seq1_or=seq1_or, seq2_or=seq2_or, sources=set(record[4] for record in records),
+                                  cw=sum(record[6] for record in records), children_ids=children_ids, self_id=ap_id)
+        merged_assembly_points_by_ids[ap_id] = merged_ap
+        unoriented_children[unoriented_id].append(merged_ap)
+    unoriented_assembly_points = []
+    for unoriented_id, children in sorted(unoriented_children.items()):
+        unoriented_assembly_points.append(AssemblyPoint(seq1=children[0].seq1, seq2=children[0].seq2, seq1_or="?", seq2_or="?",
+                                                        sources=set(source for ap in children for source in ap.sources),
+                                                        children_ids=set(ap.self_id for ap in children), self_id=unoriented_id))
+    return original_assembly_points_by_ids, merged_assembly_points_by_ids, unoriented_assembly_points
+
+
+def process_component(original_assembly_points_by_ids, merged_assembly_points_by_ids, merging_strategy, acyclic, min_cw, reference_index=None):
+    """ Computes conflicts, the merged assembly and (optionally) the reference evaluation for a single connected component in place """
+    merged_assembly_points = [merged_assembly_points_by_ids[ap_id] for ap_id in sorted(merged_assembly_points_by_ids)]
+    compute_and_update_assembly_points_conflicts(assembly_points_by_ids=merged_assembly_points_by_ids,
+                                                 assembly_points_ids=[ap.self_id for ap in merged_assembly_points])
+    assembly_points_by_sources = defaultdict(list)
+    for ap_id in sorted(original_assembly_points_by_ids):
+        ap = original_assembly_points_by_ids[ap_id]
+        assembly_points_by_sources[ap.sources[0]].append(ap)
+    merged_assembly_graph = merging.strategies_bindings[merging_strategy](assembly_points_by_sources=assembly_points_by_sources,
+                                                                         acyclic=acyclic, min_cw=min_cw)
+    update_assembly_points_with_merged_assembly(original_assembly_points_by_ids=original_assembly_points_by_ids,
+                                                merged_assembly_points_by_ids=merged_assembly_points,
+                                                merged_assembly_graph=merged_assembly_graph)
+    update_gap_sizes_in_merged_assembly(original_assembly_points_by_ids=original_assembly_points_by_ids,
+                                        merged_assembly_points_by_ids=merged_assembly_points)
+    if reference_index is not None:
+        analyze_and_update_assembly_points_based_on_reference(assembly_points=merged_assembly_points, reference_index=reference_index)
+    return merged_assembly_points
+
+
+def run_out_of_core_analysis(points, output_dir, output_setups, memory_limit, merging_strategy, acyclic=True, min_cw=0.0,
+                             delimiter="\t", default_cw_eae=1.0, default_cw_cae=0.75, reference_name=None, logger=None):
+    """ Performs CAMSA analysis, keeping in memory at most (approximately) `memory_limit` megabytes worth of assembly points
+
+    Canonical records of the input assembly points are spilled into sorted runs on disk, which are k-way merged into a stream of collapsed assembly points.
+    Collapsed assembly points are then partitioned by their connected components into buckets on disk,
+    and conflicts, merging and output are processed one connected component at a time.
+
+    :param points: a list of paths to files with CAMSA assembly points
+    :param output_setups: a dict with CAMSA-out formatting for "original", "collapsed", "merged", "subgroups", "subgroups_uo" and "reference" outputs
+    :param memory_limit: a memory limit in megabytes
+    :param reference_name: (optional) a name of the source, which assembly points are used as a reference (those are kept in memory)
+    """
+    if logger is None:
+        logger = logging.getLogger("CAMSA.main")
+    buffer_size = max(1, int(memory_limit * 1024 * 1024 / RECORD_SIZE_ESTIMATE))
+    tmp_dir = tempfile.mkdtemp(prefix="camsa_tmp_", dir=output_dir)
+    try:
+        reference_assembly_points = []
+
+        def canonical_records():
+            serial = itertools.count()
+            for file_name in points:
+                with open(os.path.abspath(os.path.expanduser(file_name)), "rt") as source:
+                    for ap in camsa_io.iter_pairs(source=source, delimiter=delimiter, default_cw_eae=default_cw_eae, default_cw_cae=default_cw_cae):
+                        if reference_name is not None and ap.sources[0] == reference_name:
+                            reference_assembly_points.append(ap)
+                            continue
+                        yield get_canonical_record(ap=ap, serial=next(serial))
+
+        logger.info("Spilling canonical assembly points into sorted runs of at most {buffer_size} records".format(buffer_size=buffer_size))
+        runs = spill_sorted_runs(records=canonical_records(), buffer_size=buffer_size, tmp_dir=tmp_dir)
+        logger.info("Merging {runs_cnt} sorted runs into collapsed assembly points".format(runs_cnt=len(runs)))
+        reference_index = None
+        if reference_name is not None:
+            if len(reference_assembly_points) == 0:
+                logger.warning("Supplied reference \"{reference_name}\" was not found among assembly sources".format(reference_name=reference_name))
+            else:
+                reference_index = ReferenceIndex.from_assembly_points(assembly_points=reference_assembly_points)
+
+        # first pass: ids are assigned in the stream order, and connected components are computed
+        disjoint_sets = DisjointSets()
+        collapsed_file_name = os.path.join(tmp_dir, "collapsed.tsv")
+        records_cnt = 0
+        collapsed_cnt = 0
+        with open(collapsed_file_name, "wt") as destination:
+            unoriented_id = -1
+            previous_seqs = None
+            original_id = itertools.count()
+            for ap_id, (key, records) in enumerate(iter_collapsed_records(runs=runs)):
+                records = list(records)
+                if key[:2] != previous_seqs:
+                    unoriented_id += 1
+                    previous_seqs = key[:2]
+                records = [record[:5] + (next(original_id),) + record[6:] for record in records]
+                disjoint_sets.union(key[0], key[1])
+                destination.write(serialize_collapsed_record(component=-1, ap_id=ap_id, unoriented_id=unoriented_id, records=records))
+                destination.write("\n")
+                records_cnt += len(records)
+                collapsed_cnt += 1
+        for run in runs:
+            os.remove(run)
+        logger.info("Collapsed {records_cnt} assembly points into {collapsed_cnt} unique ones".format(records_cnt=records_cnt, collapsed_cnt=collapsed_cnt))
+
+        # second pass: collapsed assembly points are hash partitioned by connected components into buckets, each expected to fit into memory
+        buckets_cnt = min(MAX_BUCKETS_CNT, max(1, 2 * records_cnt // buffer_size + 1))
+        buckets_file_names = [os.path.join(tmp_dir, "bucket_{cnt}.tsv".format(cnt=cnt)) for cnt in range(buckets_cnt)]
+        buckets = [open(file_name, "wt") for file_name in buckets_file_names]
+        try:
+            with open(collapsed_file_name, "rt") as source:
+                for line in source:
+                    _, ap_id, unoriented_id, records = parse_collapsed_record(line)
+                    component = disjoint_sets.get_component(records[0][0])
+                    buckets[component % buckets_cnt].write(serialize_collapsed_record(component=component, ap_id=ap_id, unoriented_id=unoriented_id,
+                                                                                      records=records))
+                    buckets[component % buckets_cnt].write("\n")
+        finally:
+            for bucket in buckets:
+                bucket.close()
+        os.remove(collapsed_file_name)
+
+        logger.info("Processing connected components from {buckets_cnt} buckets".format(buckets_cnt=buckets_cnt))
+        output = ComponentsOutput(output_dir=output_dir, output_setups=output_setups, reference=reference_index is not None)
+        try:
+            for bucket_file_name in buckets_file_names:
+                components = defaultdict(list)
+                with open(bucket_file_name, "rt") as source:
+                    for line in source:
+                        component, ap_id, unoriented_id, records = parse_collapsed_record(line)
+                        components[component].append((ap_id, unoriented_id, records))
+                os.remove(bucket_file_name)
+                for component in sorted(components, key=lambda entry: components[entry][0][0]):
+                    collapsed_records = components.pop(component)
+                    component_records_cnt = sum(len(records) for _, _, records in collapsed_records)
+                    if component_records_cnt > buffer_size:
+                        logger.warning("A connected component with {cnt} assembly points exceeds the memory limit, "
+                                       "but is processed as a whole".format(cnt=component_records_cnt))
+                    original_assembly_points_by_ids, merged_assembly_points_by_ids, unoriented_assembly_points = build_component(collapsed_records=collapsed_records)
+                    merged_assembly_points = process_component(original_assembly_points_by_ids=original_assembly_points_by_ids,
+                                                               merged_assembly_points_by_ids=merged_assembly_points_by_ids,
+                                                               merging_strategy=merging_strategy, acyclic=acyclic, min_cw=min_cw,
+                                                               reference_index=reference_index)
+                    output.write_component(original_assembly_points=[original_assembly_points_by_ids[ap_id] for ap_id in sorted(original_assembly_points_by_ids)],
+                                           merged_assembly_points=merged_assembly_points,
+                                           unoriented_assembly_points=unoriented_assembly_points)
+        finally:
+            output.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
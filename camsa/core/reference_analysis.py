@@ -1,15 +1,141 @@
 # -*- coding: utf-8 -*-
-import networkx as nx
-from camsa.core.data_structures import ScaffoldAssemblyGraph
+from collections import defaultdict
 
+from camsa.core.data_structures import inverse_orientation, RefMetrics
 
-def analyze_and_update_assembly_points_based_on_reference(assembly, ref_assembly):
-    reference_graph = ScaffoldAssemblyGraph.from_assembly_points(assembly_points=ref_assembly.aps, reference=True)
-    ref_all_pairs_paths = nx.all_pairs_shortest_path(G=reference_graph.graph)
 
+class ReferenceIndex(object):
+    """ Positions of sequences along the chromosomes of the reference assembly
 
-def has_unoriented_assembly_points(assembly):
-    return not all(map(lambda ap: ap.is_oriented, assembly.aps))
+    Every sequence, that participates in the reference assembly points, is indexed once by its (chromosome, position, strand),
+    which allows to evaluate any assembly point against the reference in constant time.
+    If a sequence is present in the reference more than once, only its first occurrence is indexed.
+    """
+
+    def __init__(self):
+        self.positions = {}
+        self.chromosomes_lengths = []
+        self.chromosomes_circular = []
+
+    def add_chromosome(self, seqs_with_strands, circular=False):
+        chromosome_id = len(self.chromosomes_lengths)
+        for position, (seq, strand) in enumerate(seqs_with_strands):
+            self.positions.setdefault(seq, (chromosome_id, position, strand))
+        self.chromosomes_lengths.append(len(seqs_with_strands))
+        self.chromosomes_circular.append(circular)
+        return chromosome_id
+
+    @classmethod
+    def from_assembly_points(cls, assembly_points):
+        neighbors = defaultdict(list)
+        for ap in assembly_points:
+            neighbors[ap.seq1].append((ap.seq2, ap))
+            neighbors[ap.seq2].append((ap.seq1, ap))
+        result = cls()
+        visited = set()
+        # linear chromosomes are walked from their ends, all remaining sequences belong to circular ones
+        for seq in list(neighbors.keys()):
+            if seq not in visited and len(neighbors[seq]) == 1:
+                result.add_chromosome(seqs_with_strands=walk_reference_chromosome(start=seq, neighbors=neighbors, visited=visited))
+        for seq in list(neighbors.keys()):
+            if seq not in visited:
+                chromosome = walk_reference_chromosome(start=seq, neighbors=neighbors, visited=visited)
+                last_seq = chromosome[-1][0]
+                circular = len(chromosome) > 2 and any(neighbor == seq for neighbor, _ in neighbors[last_seq])
+                result.add_chromosome(seqs_with_strands=chromosome, circular=circular)
+        return result
+
+    def evaluate(self, ap):
+        """ Classifies an assembly point with respect to the reference
+
+        :param ap: an assembly point to be evaluated
+        :return: RefMetrics object with the assembly point classification; all flags are down if any of the sequences is not present in the reference
+        """
+        result = RefMetrics()
+        entry1 = self.positions.get(ap.seq1, None)
+        entry2 = self.positions.get(ap.seq2, None)
+        if entry1 is None or entry2 is None:
+            return result
+        chr1, p1, s1 = entry1
+        chr2, p2, s2 = entry2
+        if chr1 != chr2:
+            result.interchromosomal = True
+            return result
+        result.best_ref_reading_id = chr1
+        chromosome_length = self.chromosomes_lengths[chr1]
+        forward = p1 < p2
+        consecutive = abs(p1 - p2) == 1
+        if self.chromosomes_circular[chr1] and {p1, p2} == {0, chromosome_length - 1}:
+            consecutive = True
+            forward = p1 > p2
+        if forward:
+            expected_or1, expected_or2 = s1, s2
+        else:
+            expected_or1, expected_or2 = inverse_orientation(s1), inverse_orientation(s2)
+        orientations_agree = orientation_agrees(orientation=ap.seq1_or, expected=expected_or1) and \
+                             orientation_agrees(orientation=ap.seq2_or, expected=expected_or2)
+        if not consecutive:
+            result.translocation = True
+        if orientations_agree:
+            result.present = consecutive
+        elif ap.is_oriented:
+            result.reversal = True
+        else:
+            result.semi_reversal = True
+        return result
+
+
+def walk_reference_chromosome(start, neighbors, visited):
+    result = [[start, None]]
+    visited.add(start)
+    current, previous_ap = start, None
+    while True:
+        step = next(((neighbor, ap) for neighbor, ap in neighbors[current] if ap is not previous_ap and neighbor not in visited), None)
+        if step is None:
+            break
+        neighbor, ap = step
+        if ap.seq1 == current:
+            current_strand, neighbor_strand = ap.seq1_or, ap.seq2_or
+        else:
+            current_strand, neighbor_strand = inverse_orientation(ap.seq2_or), inverse_orientation(ap.seq1_or)
+        if result[-1][1] is None:
+            result[-1][1] = current_strand
+        result.append([neighbor, neighbor_strand])
+        visited.add(neighbor)
+        current, previous_ap = neighbor, ap
+    return [(seq, strand) for seq, strand in result]
 
 
+def orientation_agrees(orientation, expected):
+    return orientation == "?" or expected == "?" or orientation == expected
 
+
+def analyze_and_update_assembly_points_based_on_reference(assembly_points, reference_index):
+    for ap in assembly_points:
+        ap.ref_metrics = reference_index.evaluate(ap=ap)
+
+
+def get_reference_stats_by_sources(assembly_points):
+    """ Counts evaluated assembly points of each category for every assembly in a single pass
+
+    :param assembly_points: an iterable of assembly points, evaluated against the reference
+    :return: a dict of dicts, where first level keys are the sources names, and second level ones are the reference categories
+    """
+    result = defaultdict(lambda: defaultdict(int))
+    for ap in assembly_points:
+        metrics = ap.ref_metrics
+        evaluated = metrics.interchromosomal or metrics.best_ref_reading_id is not None
+        for source in ap.sources:
+            stats = result[source]
+            stats["total"] += 1
+            stats["evaluated"] += evaluated
+            stats["present"] += metrics.present
+            stats["reversal"] += metrics.reversal
+            stats["semi_reversal"] += metrics.semi_reversal
+            stats["translocation"] += metrics.translocation
+            stats["interchromosomal"] += metrics.interchromosomal
+    return result
+
+
+def has_unoriented_assembly_points(assembly):
+    return not all(map(lambda ap: ap.is_oriented, assembly.aps))
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import urlparse, parse_qs
+
+from camsa.core.merging import MergingStrategies
+from camsa.core.state import AnalysisState, merged_assembly_to_dicts, assembly_point_with_conflicts_to_dict, subgroups_to_dicts
+
+
+class DatasetLoading(object):
+    """ A dataset, that is being loaded by one of the threads, for other threads to wait for """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.state = None
+        self.error = None
+
+
+class DatasetsCache(object):
+    """ Least recently used cache of analysis states, keyed by the sets of input points files
+
+    A dataset is evicted when the cache grows beyond its capacity (least recently used ones first),
+    when it was not queried for longer than the idle timeout, or when any of its input files was modified.
+    """
+
+    def __init__(self, capacity=4, idle_timeout=3600, delimiter="\t", default_cw_eae=1.0, default_cw_cae=0.75, logger=None):
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.delimiter = delimiter
+        self.default_cw_eae = default_cw_eae
+        self.default_cw_cae = default_cw_cae
+        self.logger = logger if logger is not None else logging.getLogger("CAMSA.service")
+        self.datasets = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_dataset_key(points):
+        paths = sorted(set(os.path.abspath(os.path.expanduser(path)) for path in points))
+        return tuple((path, os.path.getmtime(path)) for path in paths)
+
+    def evict_idle(self, now=None):
+        if self.idle_timeout is None or self.idle_timeout < 0:
+            return
+        now = time.time() if now is None else now
+        for key in [key for key, (_, last_access) in self.datasets.items() if now - last_access > self.idle_timeout]:
+            self.logger.info("Evicting idle dataset [{paths}]".format(paths=",".join(path for path, _ in key)))
+            del self.datasets[key]
+
+    def get(self, points):
+        """ Obtains the analysis state for the points files, loading it, if it is not cached
+
+        Datasets are loaded outside of the cache lock, so that queries to other datasets are not blocked by the loading,
+        while concurrent queries to the dataset, that is being loaded, wait for that single loading to finish.
+        """
+        key = self.get_dataset_key(points=points)
+        with self.lock:
+            self.evict_idle()
+            if key in self.datasets:
+                state, _ = self.datasets.pop(key)
+                self.datasets[key] = (state, time.time())
+                return state
+            loading = self.loading.get(key)
+            is_loader = loading is None
+            if is_loader:
+                loading = DatasetLoading()
+                self.loading[key] = loading
+        if not is_loader:
+            loading.event.wait()
+            if loading.error is not None:
+                raise loading.error
+            return loading.state
+        paths = [path for path, _ in key]
+        try:
+            self.logger.info("Loading dataset [{paths}]".format(paths=",".join(paths)))
+            state = AnalysisState.from_points_files(points=paths, delimiter=self.delimiter,
+                                                    default_cw_eae=self.default_cw_eae, default_cw_cae=self.default_cw_cae)
+        except Exception as exc:
+            loading.error = exc
+            with self.lock:
+                del self.loading[key]
+            loading.event.set()
+            raise
+        with self.lock:
+            del self.loading[key]
+            # outdated versions of the same files are not going to be queried anymore
+            for outdated_key in [k for k in self.datasets if [path for path, _ in k] == paths]:
+                del self.datasets[outdated_key]
+            self.datasets[key] = (state, time.time())
+            while len(self.datasets) > self.capacity:
+                evicted_key, _ = self.datasets.popitem(last=False)
+                self.logger.info("Evicting least recently used dataset [{paths}]".format(paths=",".join(path for path, _ in evicted_key)))
+        loading.state = state
+        loading.event.set()
+        return state
+
+    def loaded_datasets(self):
+        with self.lock:
+            return [{"points": [path for path, _ in key], "idle": time.time() - last_access} for key, (_, last_access) in self.datasets.items()]
+
+
+class ServiceError(Exception):
+    def __init__(self, message, status=400):
+        super(ServiceError, self).__init__(message)
+        self.message = message
+        self.status = status
+
+
+def get_single_value(query, name, default=None, converter=str):
+    values = query.get(name, None)
+    if not values:
+        return default
+    try:
+        return converter(values[-1])
+    except ValueError:
+        raise ServiceError("Invalid value \"{value}\" for parameter \"{name}\"".format(value=values[-1], name=name))
+
+
+def get_list_value(query, name):
+    result = []
+    for value in query.get(name, []):
+        result.extend(entry for entry in value.split(",") if len(entry) > 0)
+    return result
+
+
+def get_state(cache, query):
+    points = get_list_value(query=query, name="points")
+    if len(points) == 0:
+        raise ServiceError("At least one \"points\" file must be specified")
+    try:
+        return cache.get(points=points)
+    except (IOError, OSError) as exc:
+        raise ServiceError("Unable to read points files: {error}".format(error=exc), status=404)
+
+
+def get_sources(state, query):
+    sources = get_list_value(query=query, name="sources")
+    if len(sources) == 0:
+        return None
+    unknown_sources = [source for source in sources if source not in state.assembly_points_by_sources]
+    if len(unknown_sources) > 0:
+        raise ServiceError("Unknown sources [{unknown}], available sources are [{available}]".format(unknown=",".join(unknown_sources),
+                                                                                                     available=",".join(state.sources)))
+    return sources
+
+
+def handle_merge(cache, query):
+    state = get_state(cache=cache, query=query)
+    strategy = get_single_value(query=query, name="strategy", default=MergingStrategies.maximal_matching.value)
+    if strategy not in (MergingStrategies.maximal_matching.value, MergingStrategies.greedy_merging.value):
+        raise ServiceError("Unknown merging strategy \"{strategy}\"".format(strategy=strategy))
+    merged_assembly = state.get_merged_assembly(sources=get_sources(state=state, query=query),
+                                                strategy=strategy,
+                                                acyclic=not get_single_value(query=query, name="cycles", default=0, converter=int),
+                                                min_cw=get_single_value(query=query, name="min_cw", default=0.0, converter=float))
+    return {"aps": merged_assembly_to_dicts(merged_assembly=merged_assembly)}
+
+
+def handle_conflicts(cache, query):
+    state = get_state(cache=cache, query=query)
+    seq = get_single_value(query=query, name="seq")
+    if seq is None:
+        raise ServiceError("A \"seq\" parameter must be specified")
+    return {"aps": [assembly_point_with_conflicts_to_dict(ap=ap, conflicts=conflicts)
+                    for ap, conflicts in state.get_conflicts_for_seq(seq=seq, sources=get_sources(state=state, query=query))]}
+
+
+def handle_subgroups(cache, query):
+    state = get_state(cache=cache, query=query)
+    oriented = bool(get_single_value(query=query, name="oriented", default=1, converter=int))
+    subgroups = state.get_subgroups(oriented=oriented, sources=get_sources(state=state, query=query))
+    return {"subgroups": subgroups_to_dicts(subgroups=subgroups, oriented=oriented)}
+
+
+def handle_datasets(cache, query):
+    return {"datasets": cache.loaded_datasets()}
+
+
+HANDLERS = {
+    "/merge": handle_merge,
+    "/conflicts": handle_conflicts,
+    "/subgroups": handle_subgroups,
+    "/datasets": handle_datasets,
+}
+
+
+class CAMSARequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Answers GET queries with JSON encoded results, computed from the cached analysis states
+
+    Supported queries (lists are comma separated, or given by repeated parameters):
+        /merge?points=a.camsa.points,b.camsa.points[&sources=a,b][&min_cw=1.5][&strategy=greedy][&cycles=1]
+        /conflicts?points=...&seq=contig_1[&sources=a,b]
+        /subgroups?points=...[&oriented=0][&sources=a,b]
+        /datasets
+    """
+
+    def do_GET(self):
+        parsed_url = urlparse(self.path)
+        handler = HANDLERS.get(parsed_url.path, None)
+        if handler is None:
+            self.send_json(status=404, data={"error": "Unknown query \"{path}\"".format(path=parsed_url.path)})
+            return
+        try:
+            result = handler(cache=self.server.cache, query=parse_qs(parsed_url.query))
+        except ServiceError as exc:
+            self.send_json(status=exc.status, data={"error": exc.message})
+            return
+        except Exception as exc:
+            self.server.logger.exception("Failed to answer query \"{path}\"".format(path=self.path))
+            self.send_json(status=500, data={"error": "Internal error: {error}".format(error=exc)})
+            return
+        self.send_json(status=200, data=result)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.server.logger.debug("{address} - {message}".format(address=self.address_string(), message=format % args))
+
+
+class CAMSAServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, cache, logger=None):
+        BaseHTTPServer.HTTPServer.__init__(self, server_address, CAMSARequestHandler)
+        self.cache = cache
+        self.logger = logger if logger is not None else logging.getLogger("CAMSA.service")
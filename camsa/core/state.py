@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+
+from camsa.core import io as camsa_io
+from camsa.core import merging
+from camsa.core.comparative_analysis import compute_and_update_assembly_points_conflicts
+from camsa.core.data_structures import AssemblyPoint, assign_int_ids_to_assembly_points, merge_assembly_points, assign_parents_to_children, \
+    get_assembly_point_sort_key, get_unoriented_assembly_points, get_unoriented_assembly_points_sort_keys, get_grouped_assemblies, \
+    format_assembly_point_id, MERGED_ID_PREFIX, UNORIENTED_ID_PREFIX
+from camsa.core.merging import MergingStrategies, iter_assembly_points_in_merged_assembly
+
+
+class AnalysisState(object):
+    """ Parsed and collapsed assembly points of a set of assemblies together with their conflicts
+
+    The state is computed once and then answers merging / conflicts / subgroups queries without re-reading or re-collapsing the input.
+    Queries never alter the stored assembly points, so a single state can be shared between them.
+    """
+
+    def __init__(self, assembly_points_by_sources, original_assembly_points_by_ids, merged_assembly_points_by_ids, unoriented_assembly_points_by_ids,
+                 conflicts_index):
+        self.assembly_points_by_sources = assembly_points_by_sources
+        self.original_assembly_points_by_ids = original_assembly_points_by_ids
+        self.merged_assembly_points_by_ids = merged_assembly_points_by_ids
+        self.unoriented_assembly_points_by_ids = unoriented_assembly_points_by_ids
+        self.conflicts_index = conflicts_index
+        self.merged_assembly_points_ids_by_seqs = defaultdict(list)
+        for ap in merged_assembly_points_by_ids:
+            self.merged_assembly_points_ids_by_seqs[ap.seq1].append(ap.self_id)
+            self.merged_assembly_points_ids_by_seqs[ap.seq2].append(ap.self_id)
+
+    @classmethod
+    def from_assembly_points_by_sources(cls, assembly_points_by_sources):
+        original_assembly_points = [or_ap for aps in assembly_points_by_sources.values() for or_ap in aps]
+        original_assembly_points_by_ids = assign_int_ids_to_assembly_points(assembly_points=original_assembly_points,
+                                                                            sort_keys=[get_assembly_point_sort_key(ap) for ap in original_assembly_points])
+        merged_assembly_points_by_seqs = defaultdict(list)
+        merged_assembly_points = merge_assembly_points(assembly_points_by_source=assembly_points_by_sources,
+                                                       unoriented_destination=merged_assembly_points_by_seqs)
+        merged_assembly_points_by_ids = assign_int_ids_to_assembly_points(assembly_points=merged_assembly_points,
+                                                                          sort_keys=[get_assembly_point_sort_key(ap) for ap in merged_assembly_points])
+        assign_parents_to_children(children_assembly_points_by_ids=original_assembly_points_by_ids,
+                                   parent_assembly_points_by_ids=merged_assembly_points_by_ids)
+        unoriented_aps = get_unoriented_assembly_points(assembly_points_by_seqs=merged_assembly_points_by_seqs)
+        unoriented_assembly_points_by_ids = assign_int_ids_to_assembly_points(assembly_points=unoriented_aps,
+                                                                              sort_keys=get_unoriented_assembly_points_sort_keys(unoriented_assembly_points=unoriented_aps))
+        conflicts_index = compute_and_update_assembly_points_conflicts(assembly_points_by_ids=merged_assembly_points_by_ids)
+        return cls(assembly_points_by_sources=assembly_points_by_sources,
+                   original_assembly_points_by_ids=original_assembly_points_by_ids,
+                   merged_assembly_points_by_ids=merged_assembly_points_by_ids,
+                   unoriented_assembly_points_by_ids=unoriented_assembly_points_by_ids,
+                   conflicts_index=conflicts_index)
+
+    @classmethod
+    def from_points_files(cls, points, delimiter="\t", default_cw_eae=1.0, default_cw_cae=0.75):
+        assembly_points_by_sources = camsa_io.read_assembly_points_from_input_sources(sources=points,
+                                                                                      default_cw_eae=default_cw_eae,
+                                                                                      default_cw_cae=default_cw_cae,
+                                                                                      delimiter=delimiter)
+        return cls.from_assembly_points_by_sources(assembly_points_by_sources=assembly_points_by_sources)
+
+    @property
+    def sources(self):
+        return sorted(self.assembly_points_by_sources.keys())
+
+    def get_merged_assembly(self, sources=None, strategy=MergingStrategies.maximal_matching.value, acyclic=True, min_cw=0.0):
+        """ Merges the (chosen subset of) assemblies
+
+        :param sources: (optional) a collection of sources names, which assemblies are merged; all assemblies are merged if None
+            (cw and sources of the returned assembly points are restricted to the chosen subset as well)
+        :return: a list of (collapsed assembly point, seq1 orientation, seq2 orientation) triples, that form the merged assembly
+        """
+        if sources is None:
+            assembly_points_by_sources = self.assembly_points_by_sources
+        else:
+            assembly_points_by_sources = {source: self.assembly_points_by_sources[source] for source in sources}
+        merged_assembly_graph = merging.strategies_bindings[strategy](assembly_points_by_sources=assembly_points_by_sources,
+                                                                      acyclic=acyclic, min_cw=min_cw)
+        if sources is None:
+            candidates = self.merged_assembly_points_by_ids
+        else:
+            sources = frozenset(sources)
+            candidates = (self.get_restricted_assembly_point(ap=ap, sources=sources)
+                          for ap in self.merged_assembly_points_by_ids if not sources.isdisjoint(ap.sources))
+        return list(iter_assembly_points_in_merged_assembly(assembly_points=candidates, merged_assembly_graph=merged_assembly_graph))
+
+    def get_restricted_assembly_point(self, ap, sources):
+        """ A copy of the collapsed assembly point with its sources, cw and children restricted to the supplied sources
+        (i.e., as the assembly point would be collapsed from the assemblies of those sources only)
+        """
+        children = [self.original_assembly_points_by_ids[child_id] for child_id in ap.children_ids]
+        children = [child for child in children if not sources.isdisjoint(child.sources)]
+        return AssemblyPoint(seq1=ap.seq1, seq2=ap.seq2, seq1_or=ap.seq1_or, seq2_or=ap.seq2_or,
+                             sources=set(source for child in children for source in child.sources),
+                             cw=sum(child.cw for child in children), children_ids=[child.self_id for child in children], self_id=ap.self_id)
+
+    def get_assembly_points_for_seq(self, seq, sources=None):
+        ids = self.merged_assembly_points_ids_by_seqs.get(seq, [])
+        if sources is not None:
+            sources = frozenset(sources)
+            ids = [ap_id for ap_id in ids if not self.conflicts_index.sources_by_ids[ap_id].isdisjoint(sources)]
+        return [self.merged_assembly_points_by_ids[ap_id] for ap_id in ids]
+
+    def get_conflicts_for_seq(self, seq, sources=None):
+        """ Obtains collapsed assembly points, that involve the supplied sequence, with their conflicts restricted to the (chosen subset of) sources
+
+        :return: a list of (collapsed assembly point, conflicts dict) pairs (see `ConflictsIndex.get_conflicts`)
+        """
+        return [(ap, self.conflicts_index.get_conflicts(ap_id=ap.self_id, sources=sources))
+                for ap in self.get_assembly_points_for_seq(seq=seq, sources=sources)]
+
+    def get_subgroups(self, oriented=True, sources=None):
+        assembly_points = self.merged_assembly_points_by_ids if oriented else self.unoriented_assembly_points_by_ids
+        if sources is None:
+            return get_grouped_assemblies(assembly_points=assembly_points)
+        sources = frozenset(sources)
+        restricted_assembly_points = []
+        for ap in assembly_points:
+            ap_sources = sources.intersection(ap.sources)
+            if len(ap_sources) > 0:
+                restricted_assembly_points.append(AssemblyPoint(seq1=ap.seq1, seq2=ap.seq2, seq1_or=ap.seq1_or, seq2_or=ap.seq2_or,
+                                                                sources=ap_sources, self_id=ap.self_id))
+        return get_grouped_assemblies(assembly_points=restricted_assembly_points)
+
+
+def assembly_point_to_dict(ap, id_prefix=MERGED_ID_PREFIX):
+    return {
+        "id": format_assembly_point_id(ap_id=ap.self_id, id_prefix=id_prefix),
+        "seq1": ap.seq1,
+        "seq1_or": ap.seq1_or,
+        "seq2": ap.seq2,
+        "seq2_or": ap.seq2_or,
+        "cw": ap.cw,
+        "sources": list(ap.sources),
+    }
+
+
+def conflicts_to_dict(conflicts, id_prefix=MERGED_ID_PREFIX):
+    return {source: sorted(format_assembly_point_id(ap_id=ap_id, id_prefix=id_prefix) for ap_id in ap_ids)
+            for source, ap_ids in conflicts.items()}
+
+
+def merged_assembly_to_dicts(merged_assembly):
+    result = []
+    for ap, seq1_or, seq2_or in merged_assembly:
+        entry = assembly_point_to_dict(ap=ap)
+        entry["seq1_or"] = seq1_or
+        entry["seq2_or"] = seq2_or
+        result.append(entry)
+    return result
+
+
+def assembly_point_with_conflicts_to_dict(ap, conflicts=None):
+    if conflicts is None:
+        conflicts = {
+            "in_conflicted": ap.in_conflicted,
+            "in_semi_conflicted": ap.in_semi_conflicted,
+            "out_conflicted": ap.out_conflicted,
+            "out_semi_conflicted": ap.out_semi_conflicted,
+        }
+    result = assembly_point_to_dict(ap=ap)
+    for key, value in conflicts.items():
+        result[key] = conflicts_to_dict(value)
+    return result
+
+
+def subgroups_to_dicts(subgroups, oriented=True):
+    id_prefix = MERGED_ID_PREFIX if oriented else UNORIENTED_ID_PREFIX
+    return [{"sources": list(group.name),
+             "aps_cnt": len(group.aps),
+             "aps": [format_assembly_point_id(ap_id=ap.self_id, id_prefix=id_prefix) for ap in group.aps]}
+            for group in subgroups]
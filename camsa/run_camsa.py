@@ -3,7 +3,6 @@
 from __future__ import print_function
 
 import datetime
-import itertools
 import logging
 import os
 import shutil
@@ -12,8 +11,6 @@ from collections import defaultdict
 
 import configargparse
 import six
-from jinja2 import FileSystemLoader
-from jinja2.environment import Environment
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -21,10 +18,25 @@ import camsa
 from camsa.core import io as camsa_io
 from camsa.core import merging
 from camsa.core.comparative_analysis import compute_and_update_assembly_points_conflicts
-from camsa.core.data_structures import Assembly, assign_ids_to_assembly_points, merge_assembly_points, assign_parents_to_children, to_json, Sequence, OrderGraph, AssemblyPoint
+from camsa.core.data_structures import Assembly, assign_int_ids_to_assembly_points, merge_assembly_points, assign_parents_to_children, to_json, Sequence, \
+    get_unoriented_assembly_points, get_assembly_point_sort_key, get_unoriented_assembly_points_sort_keys, format_assembly_point_id, MERGED_ID_PREFIX, \
+    get_grouped_assemblies, compute_assemblies_stats
+from camsa.core.incremental import AnalysisStateSnapshot, STATE_FILE_NAME, INPUT_CONFIG_FILE_NAME, get_collapsed_assembly_point_key, get_connected_seqs, \
+    assign_stable_int_ids_to_assembly_points, append_int_ids_to_assembly_points
 from camsa.core.merging import MergingStrategies, update_assembly_points_with_merged_assembly, update_gap_sizes_in_merged_assembly
+from camsa.core.out_of_core import run_out_of_core_analysis
+from camsa.core.reference_analysis import ReferenceIndex, analyze_and_update_assembly_points_based_on_reference, get_reference_stats_by_sources
 
-if __name__ == "__main__":
+
+def main(argv=None, converted_assembly_points=None):
+    """ Runs the CAMSA analysis with the supplied command line arguments
+
+    :param converted_assembly_points: (optional) a list of (assembly points, CAMSA-out formatting) pairs, obtained by converters in the same process,
+        which are analyzed together with the assembly points from the input files, without writing them down and parsing them again
+    :return: an exit status (0 on success), as the analysis may be a stage of a longer pipeline, run in the same process
+    """
+    if converted_assembly_points is None:
+        converted_assembly_points = []
     full_description = camsa.full_description_template.format(
         names=camsa.CAMSA_AUTHORS,
         affiliations=camsa.AFFILIATIONS,
@@ -38,8 +50,8 @@ if __name__ == "__main__":
                                       formatter_class=configargparse.RawTextHelpFormatter,
                                       default_config_files=[os.path.join(camsa.root_dir, "run_camsa.ini"),
                                                             os.path.join(camsa.root_dir, "logging.ini")])
-    parser.add_argument("points", nargs="+",
-                        help="A list of input files, representing a standard CAMSA format for assembly points.")
+    parser.add_argument("points", nargs="*",
+                        help="A list of input files, representing a standard CAMSA format for assembly points.\nMay be empty only if a previous analysis state is supplied.")
     parser.add_argument("--seqi", default=None,
                         help="A file with sequences' information about fragments, involved in input assembly points")
     parser.add_argument("--seqi-delimiter", type=str, default="\t",
@@ -59,9 +71,9 @@ if __name__ == "__main__":
     parser.add_argument("--c-subgroups-uo-cntlim", type=int,
                         help="A maximum number of unoriented versions of assemblies subgroups (sorted in descending order) to be output. -1 for no limit.")
     parser.add_argument("--ref-disable", action="store_false", dest="reference", default=True,
-                        help="")
+                        help="Whether to disable the evaluation of assemblies against the reference, even if one is specified.")
     parser.add_argument("--ref", type=str, default="", dest="reference_name",
-                        help="")
+                        help="A name of the source, which assembly points are treated as a reference.\nReferenced assembly points are excluded from the comparative analysis and merging.")
     # parser.add_argument("--c-merging-disable", action="store_false", dest="merging", default=True,
     #                     help="")
     parser.add_argument("--c-merging-cw-min", type=float,
@@ -71,9 +83,18 @@ if __name__ == "__main__":
                         help="A strategy to produced a merged assembly from the given ones.\nDEFAULT: maximal-matching")
     parser.add_argument("--c-merging-cycles", dest="allow_cycles", action="store_true", default=False,
                         help="Whether to allow cycles in the produced merged assembly.\nDEFAULT: False")
+    parser.add_argument("--c-memory-limit", type=float,
+                        help="A memory limit (in megabytes) for the out-of-core mode, in which assembly points are collapsed via sorted runs on disk,\n"
+                             "and conflicts and merging are processed one connected component at a time.\n"
+                             "The HTML report is not produced in this mode, and subgroups count limits are not applied. -1 for the in-memory mode.\nDEFAULT: -1")
     parser.add_argument("--version", action="version", version=camsa.VERSION)
     parser.add_argument("--i-delimiter", default="\t", type=str,
                         help="String used as a delimiter in the input files with CAMSA assembly points")
+    parser.add_argument("--i-previous-state", default=None, type=str,
+                        help="A state of the previous CAMSA analysis (\"{state}\" file in its output directory, or the directory itself).\n"
+                             "If supplied, the previous analysis is incrementally updated with the assembly points from the input files:\n"
+                             "ids of the previously collapsed assembly points are kept, and conflicts and merging are recomputed\n"
+                             "only for the connected components, affected by the new assembly points.".format(state=STATE_FILE_NAME))
     parser.add_argument("-o", "--o-dir",
                         help="A directory, where CAMSA will store all of the produced output (report, assets, etc).\nDEFAULT: camsa_{date}")
     # parser.add_argument("--o-interactive-disable", action="store_false", dest="o_interactive", default=True,
@@ -88,12 +109,16 @@ if __name__ == "__main__":
                         help="The CAMSA-out formatting for the collapsed assembly points and their computed conflicts.")
     parser.add_argument("--o-original-format", type=str,
                         help="The CAMSA-out formatting for the non-collapsed assembly points and their computed conflicts.")
+    parser.add_argument("--o-reference-format", type=str,
+                        help="The CAMSA-out formatting for the collapsed assembly points evaluated against the reference.")
     parser.add_argument("--c-logging-level", default=logging.INFO, type=int,
                         choices=[logging.NOTSET, logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL],
                         help="Logging level for CAMSA.\nDEFAULT: {info}".format(info=logging.INFO))
     parser.add_argument("--c-logging-formatter-entry",
                         help="Format string for python logger.")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if len(args.points) == 0 and len(converted_assembly_points) == 0 and args.i_previous_state is None:
+        parser.error("at least one input file with assembly points must be supplied, unless \"--i-previous-state\" is specified")
 
     start_time = datetime.datetime.now()
 
@@ -121,6 +146,33 @@ if __name__ == "__main__":
     fh.setFormatter(logging.Formatter(args.c_logging_formatter_entry))
     logger.info("Starting the analysis")
 
+    #######################################
+    #          out-of-core mode           #
+    #######################################
+    if args.c_memory_limit > 0:
+        if len(converted_assembly_points) > 0:
+            logger.critical("The out-of-core mode only works with assembly points from the input files")
+            return 1
+        logger.info("Running in the out-of-core mode with the memory limit of {memory_limit} MB".format(memory_limit=args.c_memory_limit))
+        run_out_of_core_analysis(points=args.points, output_dir=args.output_dir,
+                                 output_setups={
+                                     "original": args.o_original_format,
+                                     "collapsed": args.o_collapsed_format,
+                                     "merged": args.o_merged_format,
+                                     "subgroups": args.o_subgroups_format,
+                                     "subgroups_uo": args.o_subgroups_uo_format,
+                                     "reference": args.o_reference_format,
+                                 },
+                                 memory_limit=args.c_memory_limit, merging_strategy=args.c_merging_strategy,
+                                 acyclic=not args.allow_cycles, min_cw=args.c_merging_cw_min,
+                                 delimiter=args.i_delimiter, default_cw_eae=args.c_cw_exact, default_cw_cae=args.c_cw_candidate,
+                                 reference_name=args.reference_name if args.reference and args.reference_name != "" else None,
+                                 logger=logger)
+        logger.info("HTML report is not produced in the out-of-core mode, as it embeds all of the assembly points")
+        logger.info("Finished Comparative Analysis and Merging of input assemblies.")
+        logger.info("Elapsed time: {el_time}".format(el_time=str(datetime.datetime.now() - start_time)))
+        return 0
+
     #######################################
     #           input stage               #
     #######################################
@@ -132,6 +184,13 @@ if __name__ == "__main__":
                                                                                   default_cw_eae=args.c_cw_exact,
                                                                                   default_cw_cae=args.c_cw_candidate,
                                                                                   delimiter=args.i_delimiter)
+    converted_assembly_points_by_sources = defaultdict(list)
+    for assembly_points, output_setup in converted_assembly_points:
+        for ap in camsa_io.iter_handed_off_assembly_points(assembly_points=assembly_points, output_setup=output_setup,
+                                                           default_cw_eae=args.c_cw_exact, default_cw_cae=args.c_cw_candidate):
+            converted_assembly_points_by_sources[ap.sources[0]].append(ap)
+    for source, aps in converted_assembly_points_by_sources.items():
+        assembly_points_by_sources[source].extend(aps)
     or_seqi = defaultdict(list)
     if args.seqi is not None:
         args.seqi = os.path.abspath(os.path.expanduser(args.seqi))
@@ -171,20 +230,55 @@ if __name__ == "__main__":
             reference_assembly = Assembly(name=args.reference_name, aps=reference_aps)
         except KeyError:
             logger.critical("Supplied reference \"{reference_name}\" was not found among assembly sources [{avail_sources}]".format(reference_name=args.reference_name, avail_sources=",".join(assembly_points_by_sources.keys())))
-            exit(1)
+            return 1
+
+    #######################################
+    #       previous analysis state       #
+    #######################################
+    previous_state = None
+    affected_seqs = None
+    if args.i_previous_state is not None:
+        previous_state_path = os.path.abspath(os.path.expanduser(args.i_previous_state))
+        if os.path.isdir(previous_state_path):
+            previous_state_path = os.path.join(previous_state_path, STATE_FILE_NAME)
+        logger.info("Loading previous analysis state from \"{state_path}\"".format(state_path=previous_state_path))
+        previous_state = AnalysisStateSnapshot.load(file_name=previous_state_path)
+        # input files of the previous analysis are carried over into the report, so that it lists every input behind it
+        previous_input_files = previous_state.get_input_files(input_dir=os.path.join(os.path.dirname(previous_state_path), "input"))
 
-    id_generator = itertools.count()
     original_assembly_points = [or_ap for aps in assembly_points_by_sources.values() for or_ap in aps]
-    # for assembly_points in assembly_points_by_sources.values():
-    original_assembly_points_by_ids = assign_ids_to_assembly_points(assembly_points=original_assembly_points, id_prefix="or_",
-                                                                    id_generator=id_generator, sort=True)
+    if previous_state is None:
+        original_assembly_points_by_ids = assign_int_ids_to_assembly_points(assembly_points=original_assembly_points,
+                                                                            sort_keys=[get_assembly_point_sort_key(ap) for ap in original_assembly_points])
+    else:
+        affected_seqs = set(seq for ap in original_assembly_points for seq in (ap.seq1, ap.seq2))
+        previous_assembly_points_by_sources = previous_state.get_assembly_points_by_sources()
+        previous_assembly_points_by_ids = sorted((ap for aps in previous_assembly_points_by_sources.values() for ap in aps), key=lambda ap: ap.self_id)
+        original_assembly_points_by_ids = append_int_ids_to_assembly_points(assembly_points_by_ids=previous_assembly_points_by_ids,
+                                                                            new_assembly_points=original_assembly_points,
+                                                                            sort_keys=[get_assembly_point_sort_key(ap) for ap in original_assembly_points])
+        for source, aps in assembly_points_by_sources.items():
+            previous_assembly_points_by_sources[source].extend(aps)
+        assembly_points_by_sources = previous_assembly_points_by_sources
 
     #######################################
     #       assembly points merging       #
     #######################################
     logger.info("Merging assembly points from different sources into a set of unique ones.")
-    merged_assembly_points = merge_assembly_points(assembly_points_by_source=assembly_points_by_sources)
-    merged_assembly_points_by_ids = assign_ids_to_assembly_points(assembly_points=merged_assembly_points, id_prefix="m_", sort=True)
+    merged_assembly_points_by_seqs = defaultdict(list)
+    merged_assembly_points = merge_assembly_points(assembly_points_by_source=assembly_points_by_sources,
+                                                   unoriented_destination=merged_assembly_points_by_seqs)
+    if previous_state is None:
+        merged_assembly_points_by_ids = assign_int_ids_to_assembly_points(assembly_points=merged_assembly_points,
+                                                                          sort_keys=[get_assembly_point_sort_key(ap) for ap in merged_assembly_points])
+    else:
+        merged_assembly_points_by_ids = assign_stable_int_ids_to_assembly_points(assembly_points=merged_assembly_points,
+                                                                                 keys=[get_collapsed_assembly_point_key(ap) for ap in merged_assembly_points],
+                                                                                 previous_ids_by_keys=previous_state.merged_ids_by_keys,
+                                                                                 sort_keys=[get_assembly_point_sort_key(ap) for ap in merged_assembly_points])
+        affected_seqs = get_connected_seqs(assembly_points=merged_assembly_points, seqs=affected_seqs)
+        logger.info("{affected_cnt} out of {total_cnt} collapsed assembly points are affected by the new ones"
+                    "".format(affected_cnt=sum(1 for ap in merged_assembly_points if ap.seq1 in affected_seqs), total_cnt=len(merged_assembly_points)))
     assign_parents_to_children(children_assembly_points_by_ids=original_assembly_points_by_ids,
                                parent_assembly_points_by_ids=merged_assembly_points_by_ids)
 
@@ -199,63 +293,81 @@ if __name__ == "__main__":
             tmp_individual_assemblies[source_name].append(ap)
     individual_assemblies = [Assembly(name=name, aps=aps) for name, aps in tmp_individual_assemblies.items()]
 
-    grouped_assemblies = []
-    for i in range(1, len(individual_assemblies) + 1):
-        for assembly_combination in itertools.combinations(sorted([a.name for a in individual_assemblies]), i):
-            assembly = Assembly(name=assembly_combination, aps=[])
-            for ap in merged_assembly_points:
-                if len(ap.sources) == len(assembly_combination) and all(map(lambda entry: entry in ap.sources, assembly_combination)):
-                    assembly.aps.append(ap)
-            grouped_assemblies.append(assembly)
-    grouped_assemblies = list(filter(lambda a: len(a.aps) > 0, sorted(grouped_assemblies, key=lambda entry: len(entry.aps), reverse=True)))
+    grouped_assemblies = get_grouped_assemblies(assembly_points=merged_assembly_points)
     if args.c_subgroups_cntlim >= 0:
         grouped_assemblies = grouped_assemblies[:args.c_subgroups_cntlim]
 
     logger.info("Processing assembly points, taking just order into account")
-    order_graph = OrderGraph.from_aps(aps=merged_assembly_points)
-    unoriented_aps = []
-    for (u, v, data) in order_graph.graph.edges(data=True):
-        ap = AssemblyPoint(seq1=u, seq2=v, seq1_or="?", seq2_or="?",
-                           children_ids=set(data["ids"]), sources=sorted(set(data["sources"])))
-        unoriented_aps.append(ap)
-    unoriented_aps_by_ids = assign_ids_to_assembly_points(assembly_points=unoriented_aps, id_prefix="unor_")
-    grouped_unoriented_assemblies = []
-    for i in range(1, len(individual_assemblies) + 1):
-        for assembly_combination in itertools.combinations(sorted([a.name for a in individual_assemblies]), i):
-            assembly = Assembly(name=assembly_combination, aps=[])
-            for ap in unoriented_aps:
-                if len(ap.sources) == len(assembly_combination) and all(map(lambda entry: entry in ap.sources, assembly_combination)):
-                    assembly.aps.append(ap)
-            grouped_unoriented_assemblies.append(assembly)
-    grouped_unoriented_assemblies = list(filter(lambda a: len(a.aps) > 0, sorted(grouped_unoriented_assemblies, key=lambda entry: len(entry.aps), reverse=True)))
+    unoriented_aps = get_unoriented_assembly_points(assembly_points_by_seqs=merged_assembly_points_by_seqs)
+    if previous_state is None:
+        unoriented_aps_by_ids = assign_int_ids_to_assembly_points(assembly_points=unoriented_aps,
+                                                                  sort_keys=get_unoriented_assembly_points_sort_keys(unoriented_assembly_points=unoriented_aps))
+    else:
+        unoriented_aps_by_ids = assign_stable_int_ids_to_assembly_points(assembly_points=unoriented_aps,
+                                                                         keys=[(ap.seq1, ap.seq2) for ap in unoriented_aps],
+                                                                         previous_ids_by_keys=previous_state.unoriented_ids_by_keys,
+                                                                         sort_keys=get_unoriented_assembly_points_sort_keys(unoriented_assembly_points=unoriented_aps))
+    grouped_unoriented_assemblies = get_grouped_assemblies(assembly_points=unoriented_aps)
     if args.c_subgroups_uo_cntlim >= 0:
         grouped_unoriented_assemblies = grouped_unoriented_assemblies[:args.c_subgroups_uo_cntlim]
 
     #######################################
     #        reference   analysis         #
     #######################################
-    # for assembly in individual_assemblies:
-    #     analyze_and_update_assembly_points_based_on_reference(assembly=assembly, ref_assembly=reference_assembly)
+    reference_stats = None
+    if reference_assembly is not None:
+        logger.info("Evaluating assembly points against the reference \"{reference_name}\"".format(reference_name=reference_assembly.name))
+        reference_index = ReferenceIndex.from_assembly_points(assembly_points=reference_assembly.aps)
+        analyze_and_update_assembly_points_based_on_reference(assembly_points=merged_assembly_points, reference_index=reference_index)
+        reference_stats = get_reference_stats_by_sources(assembly_points=merged_assembly_points)
 
     #######################################
     #        comparative analysis         #
     #######################################
     logger.info("Computing assembly points conflicts")
-    compute_and_update_assembly_points_conflicts(assembly_points_by_ids=merged_assembly_points_by_ids)
+    if previous_state is None:
+        compute_and_update_assembly_points_conflicts(assembly_points_by_ids=merged_assembly_points_by_ids)
+    else:
+        # conflicting assembly points share extremities, so conflicts outside of the affected connected components are unchanged
+        affected_ids = []
+        for ap in merged_assembly_points_by_ids:
+            if ap.seq1 in affected_seqs:
+                affected_ids.append(ap.self_id)
+            else:
+                previous_state.restore_conflicts(ap=ap)
+        compute_and_update_assembly_points_conflicts(assembly_points_by_ids=merged_assembly_points_by_ids, assembly_points_ids=affected_ids)
 
     #######################################
     #       merging assemblies            #
     #######################################
     logger.info("Obtaining a merged assembly, using {strategy} strategy".format(strategy=args.c_merging_strategy))
-    merged_assembly_graph = merging.strategies_bindings[args.c_merging_strategy](assembly_points_by_sources=assembly_points_by_sources,
+    merging_setup = {"strategy": args.c_merging_strategy, "acyclic": not args.allow_cycles, "min_cw": args.c_merging_cw_min}
+    merging_assembly_points_by_sources = assembly_points_by_sources
+    merging_assembly_points = merged_assembly_points_by_ids
+    if previous_state is not None:
+        if previous_state.merging_setup != merging_setup:
+            logger.warning("Merging setup differs from the one of the previous analysis, so the merged assembly is obtained from scratch")
+        else:
+            # merging strategies never join different connected components, so the rest of the previously merged assembly is kept as is
+            merging_assembly_points_by_sources = {source: [ap for ap in aps if ap.seq1 in affected_seqs] for source, aps in assembly_points_by_sources.items()}
+            merging_assembly_points = []
+            for ap in merged_assembly_points_by_ids:
+                if ap.seq1 in affected_seqs:
+                    merging_assembly_points.append(ap)
+                else:
+                    previous_state.restore_merged_assembly_participation(ap=ap, original_assembly_points_by_ids=original_assembly_points_by_ids)
+    merged_assembly_graph = merging.strategies_bindings[args.c_merging_strategy](assembly_points_by_sources=merging_assembly_points_by_sources,
                                                                                  acyclic=not args.allow_cycles,
                                                                                  min_cw=args.c_merging_cw_min)
     update_assembly_points_with_merged_assembly(original_assembly_points_by_ids=original_assembly_points_by_ids,
-                                                merged_assembly_points_by_ids=merged_assembly_points_by_ids,
+                                                merged_assembly_points_by_ids=merging_assembly_points,
                                                 merged_assembly_graph=merged_assembly_graph)
     update_gap_sizes_in_merged_assembly(original_assembly_points_by_ids=original_assembly_points_by_ids,
                                         merged_assembly_points_by_ids=merged_assembly_points_by_ids)
 
+    logger.info("Computing assemblies' statistics")
+    compute_assemblies_stats(assembly_points=merged_assembly_points, assemblies=individual_assemblies + grouped_assemblies)
+
     #######################################
     #           output stage              #
     #######################################
@@ -272,14 +384,35 @@ if __name__ == "__main__":
     input_report_dir = os.path.join(args.output_dir, "input")
     camsa_io.remove_dir(dir_path=input_report_dir)
     os.makedirs(input_report_dir)
-    input_report_config_path = os.path.join(input_report_dir, "camsa_config.txt")
+    input_report_config_path = os.path.join(input_report_dir, INPUT_CONFIG_FILE_NAME)
     with open(input_report_config_path, "wt") as destination:
         print("# NOTE: this is not a valid config, but rather a summary of the utilized options", file=destination)
         print(parser.format_values(), file=destination)
+    input_files = []
     for pairs_path in args.points:
         full_path = os.path.abspath(os.path.expanduser(pairs_path))
         base_name = os.path.basename(full_path)
         shutil.copyfile(src=full_path, dst=os.path.join(input_report_dir, base_name))
+        input_files.append(base_name)
+    for source, aps in converted_assembly_points_by_sources.items():
+        base_name = "{source}.camsa.points".format(source=source)
+        with open(os.path.join(input_report_dir, base_name), "wt") as destination:
+            camsa_io.write_assembly_points(assembly_points=aps, destination=destination, output_setup=camsa_io.INPUT_OUTPUT_SETUP)
+        input_files.append(base_name)
+    if previous_state is not None:
+        for base_name, content in previous_input_files:
+            # a new input file may have the same name, as one of the previous ones
+            while base_name in input_files or base_name == INPUT_CONFIG_FILE_NAME:
+                base_name = "previous." + base_name
+            with open(os.path.join(input_report_dir, base_name), "wb") as destination:
+                destination.write(content)
+            input_files.append(base_name)
+
+    # analysis state, that allows to incrementally update this analysis with new assembly points later on
+    AnalysisStateSnapshot.from_analysis(original_assembly_points_by_ids=original_assembly_points_by_ids,
+                                        merged_assembly_points_by_ids=merged_assembly_points_by_ids,
+                                        unoriented_assembly_points_by_ids=unoriented_aps_by_ids,
+                                        merging_setup=merging_setup, input_files=input_files).save(file_name=os.path.join(args.output_dir, STATE_FILE_NAME))
 
     # "merged" subdir of the report
     # will contain assembly points, that constitute the merged assembly
@@ -290,7 +423,8 @@ if __name__ == "__main__":
     with open(merged_report_points_path, "wt") as destination:
         camsa_io.write_assembly_points(destination=destination,
                                        assembly_points=[ap for ap in merged_assembly_points if ap.participates_in_merged],
-                                       output_setup=args.o_merged_format)
+                                       output_setup=args.o_merged_format,
+                                       ids_prefixes=camsa_io.MERGED_IDS_PREFIXES)
 
     # "comparative" subdir of the report
     # will contain assembly points divided into subgroups based in the agreement in input assemblies
@@ -305,7 +439,8 @@ if __name__ == "__main__":
         with open(comparative_report_group_points_path, "wt") as destination:
             camsa_io.write_assembly_points(assembly_points=group.aps,
                                            destination=destination,
-                                           output_setup=args.o_subgroups_format)
+                                           output_setup=args.o_subgroups_format,
+                                           ids_prefixes=camsa_io.MERGED_IDS_PREFIXES)
     subgroups_unoriented_report_dir = os.path.join(comparative_report_dir, "unoriented_subgroups")
     os.makedirs(subgroups_unoriented_report_dir)
     for group in grouped_unoriented_assemblies:
@@ -314,21 +449,42 @@ if __name__ == "__main__":
         with open(comparative_report_group_unoriented_points_path, "wt") as destination:
             camsa_io.write_assembly_points(assembly_points=group.aps,
                                            destination=destination,
-                                           output_setup=args.o_subgroups_uo_format)
+                                           output_setup=args.o_subgroups_uo_format,
+                                           ids_prefixes=camsa_io.UNORIENTED_IDS_PREFIXES)
 
     original_points_path = os.path.join(comparative_report_dir, "original.camsa.points")
     with open(original_points_path, "wt") as destination:
-        camsa_io.write_assembly_points(assembly_points=original_assembly_points_by_ids.values(),
+        camsa_io.write_assembly_points(assembly_points=original_assembly_points_by_ids,
                                        destination=destination,
-                                       output_setup=args.o_original_format)
+                                       output_setup=args.o_original_format,
+                                       ids_prefixes=camsa_io.ORIGINAL_IDS_PREFIXES)
 
     collapsed_points_path = os.path.join(comparative_report_dir, "collapsed.camsa.points")
     with open(collapsed_points_path, "wt") as destination:
         camsa_io.write_assembly_points(destination=destination,
                                        assembly_points=merged_assembly_points,
-                                       output_setup=args.o_collapsed_format)
+                                       output_setup=args.o_collapsed_format,
+                                       ids_prefixes=camsa_io.MERGED_IDS_PREFIXES)
+
+    # "reference" subdir of the report
+    # will contain collapsed assembly points evaluated against the reference assembly
+    if reference_assembly is not None:
+        reference_report_dir = os.path.join(args.output_dir, "reference")
+        camsa_io.remove_dir(dir_path=reference_report_dir)
+        os.makedirs(reference_report_dir)
+        reference_points_path = os.path.join(reference_report_dir, "evaluated.camsa.points")
+        with open(reference_points_path, "wt") as destination:
+            camsa_io.write_assembly_points(destination=destination,
+                                           assembly_points=merged_assembly_points,
+                                           output_setup=args.o_reference_format,
+                                           ids_prefixes=camsa_io.MERGED_IDS_PREFIXES)
+    # jinja2 is only needed for the report, so it does not slow down the startup (i.e., "--help", or the out-of-core mode)
+    from jinja2 import FileSystemLoader
+    from jinja2.environment import Environment
+
     env = Environment()
     env.filters['tojson'] = to_json
+    env.filters['ap_id'] = format_assembly_point_id
 
     individual_assemblies.sort(key=lambda it: it.name.lower())
     assemblies_to_ids = {assembly.name: "A" + str(cnt) for cnt, assembly in enumerate(individual_assemblies, start=1)}
@@ -347,6 +503,11 @@ if __name__ == "__main__":
                 "assemblies_conflicts": [],
                 "graph_compiled": False,
                 "aps": merged_assembly_points,
+                "merged_id_prefix": MERGED_ID_PREFIX,
+                "reference": {
+                    "name": reference_assembly.name,
+                    "stats": reference_stats,
+                } if reference_assembly is not None else None,
                 "assemblies_to_ids": assemblies_to_ids,
                 "assemblies_to_colors": assemblies_to_colors,
                 "grouped_assemblies": grouped_assemblies,
@@ -373,3 +534,8 @@ if __name__ == "__main__":
     end_time = datetime.datetime.now()
     logger.info("Elapsed time: {el_time}".format(el_time=str(end_time - start_time)))
     logger.info("Thank you for using CAMSA!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
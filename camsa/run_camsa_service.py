@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import logging
+import os
+import sys
+
+import configargparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import camsa
+from camsa.core.service import CAMSAServer, DatasetsCache
+
+if __name__ == "__main__":
+    full_description = camsa.full_description_template.format(
+        names=camsa.CAMSA_AUTHORS,
+        affiliations=camsa.AFFILIATIONS,
+        dummy=" ",
+        tool="Local CAMSA service, answering merging/conflicts/subgroups queries from in-memory analysis states.",
+        information="For more information refer to {docs}".format(docs=camsa.CAMSA_DOCS_URL),
+        contact=camsa.CONTACT)
+    full_description = "=" * 80 + "\n" + full_description + "=" * 80 + "\n"
+
+    parser = configargparse.ArgParser(description=full_description,
+                                      formatter_class=configargparse.RawTextHelpFormatter,
+                                      default_config_files=[os.path.join(camsa.root_dir, "run_camsa_service.ini"),
+                                                            os.path.join(camsa.root_dir, "logging.ini")])
+    parser.add_argument("-c", "--config", is_config_file=True,
+                        help="Config file overwriting some of the default settings as well as any flag starting with \"--\".")
+    parser.add_argument("--version", action="version", version=camsa.VERSION)
+    parser.add_argument("--s-host", type=str,
+                        help="A host name (address) the service is bound to. Only local addresses are advised.\nDEFAULT: 127.0.0.1")
+    parser.add_argument("--s-port", type=int,
+                        help="A port the service listens on.\nDEFAULT: 8765")
+    parser.add_argument("--s-cache-size", type=int,
+                        help="A maximum number of datasets (sets of input files) kept in memory. Least recently used ones are evicted first.\nDEFAULT: 4")
+    parser.add_argument("--s-idle-timeout", type=float,
+                        help="A number of seconds after which a dataset, that was not queried, is evicted from memory. -1 for no timeout.\nDEFAULT: 3600")
+    parser.add_argument("--i-delimiter", default="\t", type=str,
+                        help="String used as a delimiter in the input files with CAMSA assembly points")
+    parser.add_argument("--c-cw-exact", type=float,
+                        help="A confidence weight value assigned to oriented assembly points and respective exact assembly edges,\nin case \"?\" is specified as the respective assembly point confidence weight.\nDEFAULT: 1.0")
+    parser.add_argument("--c-cw-candidate", type=float,
+                        help="A confidence weight value assigned to semi/un-oriented assembly points and respective candidate assembly edges,\nin case \"?\" is specified as the respective assembly point confidence weight.\nDEFAULT: 0.75")
+    parser.add_argument("--c-logging-level", type=int,
+                        choices=[logging.NOTSET, logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL],
+                        help="Logging level for the service.\nDEFAULT: {info}".format(info=logging.INFO))
+    parser.add_argument("--c-logging-formatter-entry",
+                        help="Format string for python logger.")
+    args = parser.parse_args()
+
+    #######################################
+    #           logging setup             #
+    #######################################
+    logger = logging.getLogger("CAMSA.service")
+    ch = logging.StreamHandler()
+    ch.setLevel(args.c_logging_level)
+    logger.setLevel(args.c_logging_level)
+    logger.addHandler(ch)
+    logger.info(full_description)
+    logger.info(parser.format_values())
+    ch.setFormatter(logging.Formatter(args.c_logging_formatter_entry))
+
+    cache = DatasetsCache(capacity=args.s_cache_size, idle_timeout=args.s_idle_timeout, delimiter=args.i_delimiter,
+                          default_cw_eae=args.c_cw_exact, default_cw_cae=args.c_cw_candidate, logger=logger)
+    server = CAMSAServer(server_address=(args.s_host, args.s_port), cache=cache, logger=logger)
+    logger.info("Serving CAMSA queries on http://{host}:{port}".format(host=args.s_host, port=server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down the service")
+    finally:
+        server.server_close()
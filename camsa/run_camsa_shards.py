@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import datetime
+import logging
+import os
+import subprocess
+import sys
+from multiprocessing.pool import ThreadPool
+
+import configargparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import camsa
+from camsa.core.distributed import shard_points, combine_analysis_states
+from camsa.core.incremental import AnalysisStateSnapshot, STATE_FILE_NAME
+
+SHARD_COMMAND = "shard"
+REDUCE_COMMAND = "reduce"
+LOCAL_COMMAND = "local"
+RUN_CAMSA_SCRIPT = os.path.join(camsa.root_dir, "run_camsa.py")
+
+
+def run_camsa(points, output_dir, camsa_args, previous_state=None):
+    command = [sys.executable, RUN_CAMSA_SCRIPT] + list(points) + ["-o", output_dir] + list(camsa_args)
+    if previous_state is not None:
+        command += ["--i-previous-state", previous_state]
+    return subprocess.call(command)
+
+
+def shard(points, output_dir, shards_cnt, args, logger):
+    logger.info("Partitioning assembly points from [{points}] into {shards_cnt} shards".format(points=",".join(points), shards_cnt=shards_cnt))
+    file_names, counts = shard_points(points=points, shards_cnt=shards_cnt, output_dir=output_dir, delimiter=args.i_delimiter,
+                                      default_cw_eae=args.c_cw_exact, default_cw_cae=args.c_cw_candidate)
+    for file_name, count in zip(file_names, counts):
+        logger.info("{file_name}: {count} assembly points".format(file_name=file_name, count=count))
+    return [file_name for file_name, count in zip(file_names, counts) if count > 0]
+
+
+def reduce_shards(shards_dirs, output_dir, camsa_args, logger):
+    logger.info("Combining analysis states of {shards_cnt} shards".format(shards_cnt=len(shards_dirs)))
+    snapshots = [AnalysisStateSnapshot.load(file_name=os.path.join(os.path.abspath(os.path.expanduser(shard_dir)), STATE_FILE_NAME))
+                 for shard_dir in shards_dirs]
+    state = combine_analysis_states(snapshots=snapshots)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    state_file_name = os.path.join(output_dir, "shards." + STATE_FILE_NAME)
+    state.save(file_name=state_file_name)
+    logger.info("Producing the output from the combined analysis state \"{state}\"".format(state=state_file_name))
+    return run_camsa(points=[], output_dir=output_dir, camsa_args=camsa_args, previous_state=state_file_name)
+
+
+def main(argv=None):
+    """ Runs the sharded CAMSA analysis with the supplied command line arguments
+
+    :return: an exit status (0 on success)
+    """
+    full_description = camsa.full_description_template.format(
+        names=camsa.CAMSA_AUTHORS,
+        affiliations=camsa.AFFILIATIONS,
+        dummy=" ",
+        tool="Running CAMSA analysis on several nodes, by independently analyzing connected components of the scaffold assembly graph.",
+        information="For more information refer to {docs}".format(docs=camsa.CAMSA_DOCS_URL),
+        contact=camsa.CONTACT)
+    full_description = "=" * 80 + "\n" + full_description + "=" * 80 + "\n"
+
+    parser = configargparse.ArgParser(description=full_description,
+                                      formatter_class=configargparse.RawTextHelpFormatter,
+                                      default_config_files=[os.path.join(camsa.root_dir, "run_camsa_shards.ini"),
+                                                            os.path.join(camsa.root_dir, "logging.ini")],
+                                      epilog="Any unrecognized arguments are passed to \"run_camsa.py\" as is.\n"
+                                             "Reference evaluation (\"--ref\") is not supported for the sharded analysis.")
+    parser.add_argument("command", choices=[SHARD_COMMAND, REDUCE_COMMAND, LOCAL_COMMAND],
+                        help="\"{shard}\": partitions input assembly points into shard files, each of which can be analyzed with \"run_camsa.py\" on a separate node.\n"
+                             "\"{reduce}\": combines analyses of the shards (their output directories are the inputs) into a single CAMSA output.\n"
+                             "\"{local}\": shards the input, analyzes shards in parallel processes on this machine, and reduces the results."
+                             "".format(shard=SHARD_COMMAND, reduce=REDUCE_COMMAND, local=LOCAL_COMMAND))
+    parser.add_argument("inputs", nargs="+",
+                        help="Files with CAMSA assembly points for \"{shard}\" and \"{local}\" commands,\n"
+                             "or output directories of shards analyses for \"{reduce}\" command.".format(shard=SHARD_COMMAND, local=LOCAL_COMMAND, reduce=REDUCE_COMMAND))
+    parser.add_argument("-c", "--config", is_config_file=True,
+                        help="Config file overwriting some of the default settings as well as any flag starting with \"--\".")
+    parser.add_argument("--version", action="version", version=camsa.VERSION)
+    parser.add_argument("-o", "--o-dir",
+                        help="A directory, where shard files (for \"{shard}\" command), or the combined CAMSA output are stored.\nDEFAULT: camsa_{{date}}".format(shard=SHARD_COMMAND))
+    parser.add_argument("--s-shards", type=int,
+                        help="A number of shards, assembly points are partitioned into.\nDEFAULT: 4")
+    parser.add_argument("--s-processes", type=int,
+                        help="A number of shards analyzed simultaneously by \"{local}\" command. -1 for one process per shard.\nDEFAULT: -1".format(local=LOCAL_COMMAND))
+    parser.add_argument("--i-delimiter", default="\t", type=str,
+                        help="String used as a delimiter in the input files with CAMSA assembly points")
+    parser.add_argument("--c-cw-exact", type=float,
+                        help="A confidence weight value assigned to oriented assembly points and respective exact assembly edges,\nin case \"?\" is specified as the respective assembly point confidence weight.\nDEFAULT: 1.0")
+    parser.add_argument("--c-cw-candidate", type=float,
+                        help="A confidence weight value assigned to semi/un-oriented assembly points and respective candidate assembly edges,\nin case \"?\" is specified as the respective assembly point confidence weight.\nDEFAULT: 0.75")
+    parser.add_argument("--c-logging-level", type=int,
+                        choices=[logging.NOTSET, logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL],
+                        help="Logging level for the sharded analysis.\nDEFAULT: {info}".format(info=logging.INFO))
+    parser.add_argument("--c-logging-formatter-entry",
+                        help="Format string for python logger.")
+    args, camsa_args = parser.parse_known_args(argv)
+
+    start_time = datetime.datetime.now()
+
+    #######################################
+    #           logging setup             #
+    #######################################
+    if args.o_dir is None:
+        args.o_dir = os.path.join(os.getcwd(), "camsa_{date}".format(date=datetime.datetime.now().strftime("%b_%d_%Y__%H_%M")))
+    args.output_dir = os.path.abspath(os.path.expanduser(args.o_dir))
+
+    logger = logging.getLogger("CAMSA.shards")
+    ch = logging.StreamHandler()
+    ch.setLevel(args.c_logging_level)
+    logger.setLevel(args.c_logging_level)
+    logger.addHandler(ch)
+    logger.info(full_description)
+    logger.info(parser.format_values())
+    ch.setFormatter(logging.Formatter(args.c_logging_formatter_entry))
+
+    if args.command == SHARD_COMMAND:
+        shard(points=args.inputs, output_dir=args.output_dir, shards_cnt=args.s_shards, args=args, logger=logger)
+        return_code = 0
+    elif args.command == REDUCE_COMMAND:
+        return_code = reduce_shards(shards_dirs=args.inputs, output_dir=args.output_dir, camsa_args=camsa_args, logger=logger)
+    else:
+        shards_dir = os.path.join(args.output_dir, "shards")
+        shards_files = shard(points=args.inputs, output_dir=shards_dir, shards_cnt=args.s_shards, args=args, logger=logger)
+        shards_dirs = [file_name[:-len(".camsa.points")] for file_name in shards_files]
+        processes_cnt = len(shards_files) if args.s_processes < 0 else args.s_processes
+        logger.info("Analyzing {shards_cnt} non-empty shards in {processes_cnt} processes".format(shards_cnt=len(shards_files), processes_cnt=processes_cnt))
+        pool = ThreadPool(processes=max(processes_cnt, 1))
+        try:
+            return_codes = pool.map(lambda entry: run_camsa(points=[entry[0]], output_dir=entry[1], camsa_args=camsa_args),
+                                    list(zip(shards_files, shards_dirs)))
+        finally:
+            pool.close()
+        failed = [shard_dir for shard_dir, code in zip(shards_dirs, return_codes) if code != 0]
+        if len(failed) > 0:
+            logger.critical("Analysis of shards [{failed}] has failed".format(failed=",".join(failed)))
+            return 1
+        return_code = reduce_shards(shards_dirs=shards_dirs, output_dir=args.output_dir, camsa_args=camsa_args, logger=logger)
+
+    logger.info("Elapsed time: {el_time}".format(el_time=str(datetime.datetime.now() - start_time)))
+    return return_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
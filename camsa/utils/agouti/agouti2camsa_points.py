@@ -4,11 +4,11 @@
 import datetime
 import os
 import sys
-import more_itertools
-from collections import defaultdict
+import threading
 
 import configargparse
 import logging
+from six.moves import queue
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
@@ -16,10 +16,14 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
 import camsa
 from camsa.core.data_structures import AssemblyPoint
 import camsa.core.io as camsa_io
+from camsa.utils.shared import get_script_logger
+
+QUEUE_SIZE = 1024
+
 
 def get_assembly_points(agouti_path, source, oriented=False):
     result = []
-    for left, right in more_itertools.windowed(agouti_path, n=2):
+    for left, right in zip(agouti_path[:-1], agouti_path[1:]):
         if oriented:
             if left.startswith("-"):
                 seq1 = left[1:]
@@ -43,7 +47,7 @@ def get_assembly_points(agouti_path, source, oriented=False):
     return result
 
 
-if __name__ == "__main__":
+def get_parser():
     full_description = camsa.full_description_template.format(
         names=camsa.CAMSA_AUTHORS,
         affiliations=camsa.AFFILIATIONS,
@@ -63,49 +67,141 @@ if __name__ == "__main__":
     parser.add_argument("--source", default=None, help="A value to be used in the \"source\" column in the output.\n"
                                                        " If not specified, the name of the file for each set of paths will be used for all assembly points inferred from the corresponding paths.")
     parser.add_argument("--i-delimiter", default=",", type=str, help="A character to be used as a delimiter during the parsing of the AGOUTI data sets")
+    parser.add_argument("--c-threads", type=int,
+                        help="A number of input files converted concurrently (assembly points are outputted in the order of input files regardless).\nDEFAULT: 4")
     parser.add_argument("--c-logging-level", type=int,
                         choices=[logging.NOTSET, logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL],
                         help="Logging level for the converter.\nDEFAULT: {info}".format(info=logging.INFO))
     parser.add_argument("--c-logging-formatter-entry",
                         help="Format string for python logger.")
-    args = parser.parse_args()
+    return parser
+
+
+def iter_file_assembly_points(file_name, args, logger):
+    """ Streams assembly points from a single AGOUTI formatted file, converting every path as soon as it is read
+
+    :return: an iterator over lists of assembly points (one list per path)
+    """
+    if args.source is not None:
+        source = args.source
+    else:
+        source = os.path.splitext(os.path.basename(file_name))[0]
+    paths_cnt = 0
+    logger.info("Processing file \"{file_name}\"".format(file_name=file_name))
+    with open(file_name, "rt") as stream:
+        for line in stream:
+            line = line.strip()
+            if len(line) == 0 or line.startswith("#") or line.startswith(">"):
+                continue
+            path = line.split(args.i_delimiter)
+            paths_cnt += 1
+            if len(path) <= 1:
+                logger.warning("Encountered a path of length <= 1 {{{path}}}; skipping"
+                               "".format(path=",".join(path)))
+                continue
+            yield get_assembly_points(agouti_path=path, source=source, oriented=args.oriented)
+    logger.info("A total of {paths_cnt} paths were extracted from \"{file_name}\"".format(paths_cnt=paths_cnt, file_name=file_name))
+
+
+class FileConverter(threading.Thread):
+    """ Converts a single AGOUTI formatted file in a background thread, handing assembly points over through a bounded queue
+
+    The queue size bounds the amount of assembly points, that are kept in memory, while the file waits for its turn in the output.
+    """
+
+    END = object()
+
+    def __init__(self, file_name, args, logger, queue_size=QUEUE_SIZE):
+        super(FileConverter, self).__init__()
+        self.daemon = True
+        self.file_name = file_name
+        self.args = args
+        self.logger = logger
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+
+    def run(self):
+        try:
+            for path_assembly_points in iter_file_assembly_points(file_name=self.file_name, args=self.args, logger=self.logger):
+                self.queue.put(path_assembly_points)
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.queue.put(self.END)
+
+    def __iter__(self):
+        while True:
+            path_assembly_points = self.queue.get()
+            if path_assembly_points is self.END:
+                break
+            yield path_assembly_points
+        if self.error is not None:
+            raise self.error
+
+
+def iter_converted(args, logger):
+    """ Streams assembly points from the AGOUTI formatted files, specified in the parsed arguments
+
+    Up to `args.c_threads` files are converted concurrently, while assembly points are still produced in the order of files (and paths in them).
+
+    :return: an iterator over lists of assembly points (one list per path)
+    """
+    threads_cnt = args.c_threads if args.c_threads is not None and args.c_threads > 0 else 1
+    if threads_cnt == 1 or len(args.agouti) == 1:
+        for file_name in args.agouti:
+            for path_assembly_points in iter_file_assembly_points(file_name=file_name, args=args, logger=logger):
+                yield path_assembly_points
+        return
+    converters = [FileConverter(file_name=file_name, args=args, logger=logger) for file_name in args.agouti]
+    for converter in converters[:threads_cnt]:
+        converter.start()
+    for index, converter in enumerate(converters):
+        for path_assembly_points in converter:
+            yield path_assembly_points
+        if index + threads_cnt < len(converters):
+            converters[index + threads_cnt].start()
+
+
+def convert(args, logger):
+    """ Obtains assembly points from the AGOUTI formatted paths, specified in the parsed arguments
+
+    :return: a list of assembly points
+    """
+    return [ap for path_assembly_points in iter_converted(args=args, logger=logger) for ap in path_assembly_points]
+
+
+def main(argv=None, hand_off=None):
+    """ Runs the converter with the supplied command line arguments
+
+    :param hand_off: (optional) a list, to which a pair of the obtained assembly points and their CAMSA-out formatting is appended
+        (i.e., to be passed to the analysis in the same process), instead of writing the assembly points to the output stream
+        (handed off assembly points are still written to the output stream, if it was explicitly specified, i.e., is not stdout)
+    :return: a list of assembly points, if they were handed off, None otherwise (assembly points are written one path at a time)
+    """
+    parser = get_parser()
+    args = parser.parse_args(argv)
 
     start_time = datetime.datetime.now()
 
-    logger = logging.getLogger("CAMSA.utils.agouti2camsa_points")
-    ch = logging.StreamHandler()
-    ch.setLevel(args.c_logging_level)
-    logger.setLevel(args.c_logging_level)
-    logger.addHandler(ch)
-    logger.info(full_description)
+    logger = get_script_logger(name="CAMSA.utils.agouti2camsa_points", args=args, description=parser.description)
     logger.info(parser.format_values())
-    ch.setFormatter(logging.Formatter(args.c_logging_formatter_entry))
     logger.info("Starting the converting process")
 
-    paths = []
-    for file_name in args.agouti:
-        logger.info("Processing file \"{file_name}\"".format(file_name=file_name))
-        with open(file_name, "rt") as source:
-            for line in source:
-                line = line.strip()
-                if len(line) == 0 or line.startswith("#") or line.startswith(">"):
-                    continue
-                path = line.split(args.i_delimiter)
-                if args.source is not None:
-                    source = args.source
-                else:
-                    source = os.path.basename(file_name)
-                    source = os.path.splitext(source)[0]
-                paths.append((source, path))
-    logger.info("A total of {paths_cnt} paths were extracted from {file_cnt} files"
-                "".format(paths_cnt=len(paths), file_cnt=len(args.agouti)))
-    assembly_points = []
-    for source, path in paths:
-        if len(path) <= 1:
-            logger.warning("Encountered a path of length <= 1 {{{path}}}; skipping"
-                           "".format(path=",".join(path)))
-            continue
-        assembly_points.extend(get_assembly_points(agouti_path=path, source=source, oriented=args.oriented))
-    logger.info("Writing output to file \"{file_name}\"".format(file_name=args.output))
-    camsa_io.write_assembly_points(assembly_points=assembly_points, destination=args.output, output_setup=args.o_format, delimiter=args.o_delimiter)
+    if hand_off is not None:
+        assembly_points = convert(args=args, logger=logger)
+        hand_off.append((assembly_points, args.o_format))
+        if args.output is not sys.stdout:
+            logger.info("Writing output to file \"{file_name}\"".format(file_name=args.output))
+            camsa_io.write_assembly_points(assembly_points=assembly_points, destination=args.output, output_setup=args.o_format, delimiter=args.o_delimiter)
+    else:
+        assembly_points = None
+        logger.info("Writing output to file \"{file_name}\"".format(file_name=args.output))
+        writer = camsa_io.AssemblyPointsWriter(destination=args.output, output_setup=args.o_format, delimiter=args.o_delimiter)
+        for path_assembly_points in iter_converted(args=args, logger=logger):
+            writer.write(assembly_points=path_assembly_points)
     logger.info("Elapsed time: {el_time}".format(el_time=str(datetime.datetime.now() - start_time)))
+    return assembly_points
+
+
+if __name__ == "__main__":
+    main()
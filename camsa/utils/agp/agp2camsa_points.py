@@ -2,10 +2,13 @@
 # -*- coding: utf-8 -*-
 import datetime
 import enum
+import itertools
 import logging
 import os
+import shutil
 import sys
-from collections import defaultdict
+import tempfile
+from collections import OrderedDict
 
 import configargparse
 
@@ -15,6 +18,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
 import camsa
 import camsa.core.io as camsa_io
 from camsa.core.data_structures import AssemblyPoint
+from camsa.utils.shared import get_script_logger, HotPathLogger
 
 
 class Component(object):
@@ -146,7 +150,7 @@ def object_as_camsa_points(object_as_components, extra_data):
     return result
 
 
-if __name__ == "__main__":
+def get_parser():
     full_description = camsa.full_description_template.format(
         names=camsa.CAMSA_AUTHORS,
         affiliations=camsa.AFFILIATIONS,
@@ -175,26 +179,114 @@ if __name__ == "__main__":
                         help="The CAMSA-out formatting for the assembly points obtained form the AGPv2 formatted scaffold assemblies")
     parser.add_argument("-o", "--output", type=configargparse.FileType("wt"), default=sys.stdout,
                         help="The stream where CAMSA formatted assembly points are outputted\nDEFAULT: stdout")
+    return parser
 
-    args = parser.parse_args()
 
-    start_time = datetime.datetime.now()
-    #######################################
-    #           logging setup             #
-    #######################################
-    logger = logging.getLogger("CAMSA.utils.agp2camsa_points")
-    ch = logging.StreamHandler()
-    ch.setLevel(args.c_logging_level)
-    logger.setLevel(args.c_logging_level)
-    logger.addHandler(ch)
-    logger.info(full_description)
-    logger.info(parser.format_values())
-    ch.setFormatter(logging.Formatter(args.c_logging_formatter_entry))
-    logger.info("Starting the converting process")
+def is_objects_contiguous(sources):
+    """ Checks (by object ids only) that components of every object form a single contiguous run of lines in the AGP data streams,
+    taken one after another (i.e., that no object, finished in one stream, shows up again in the same or any later stream)
+
+    :param sources: a list of seekable AGP data streams, that are rewound to their beginning afterwards
+    """
+    finished_objects = set()
+    current_object_id = None
+    result = True
+    for source in sources:
+        for line in source:
+            if line.startswith("#") or len(line.strip()) == 0:
+                continue
+            object_id = line.split("\t", 1)[0].strip()
+            if object_id != current_object_id:
+                if object_id in finished_objects:
+                    result = False
+                    break
+                finished_objects.add(current_object_id)
+                current_object_id = object_id
+        if not result:
+            break
+    for source in sources:
+        source.seek(0)
+    return result
 
-    objects = defaultdict(list)
-    assembly_points = []
 
+def get_seekable_source(source):
+    """ Spools a non-seekable (i.e., stdin) AGP data stream into a temporary file, so that it can be read twice """
+    try:
+        source.seek(0, os.SEEK_CUR)
+        return source
+    except (IOError, OSError, AttributeError, ValueError):
+        spooled = tempfile.TemporaryFile(mode="w+t")
+        shutil.copyfileobj(source, spooled)
+        spooled.seek(0)
+        return spooled
+
+
+def iter_components(source, hot_logger):
+    """ Parses components from the AGP data stream
+
+    :param hot_logger: a `HotPathLogger` object, that accounts for every processed line
+    """
+    is_debug = hot_logger.is_debug
+    for line in source:
+        hot_logger.tick()
+        line = line.strip()
+        if line.startswith("#"):
+            if is_debug:
+                hot_logger.debug("Skipping comment line: {line}", line=line)
+            continue
+        if len(line) == 0:
+            continue
+        data = line.split("\t", 8)
+        if Component.is_scaffold_component(data[4]):
+            if is_debug:
+                hot_logger.debug("Processing a non-gap data line: {line}", line=line)
+            yield ScaffoldComponent.from_agp_data(data=data)
+        else:
+            if is_debug:
+                hot_logger.debug("Processing a gap data line: {line}", line=line)
+            yield GapComponent.from_agp_data(data=data)
+
+
+def iter_contiguous_objects(components):
+    """ Groups a stream of components into objects, assuming components of every object come in a single contiguous run
+
+    Only components of a single (current) object are kept in memory.
+
+    :return: an iterator over (object id, list of components) pairs
+    """
+    object_id, object_components = None, []
+    for component in components:
+        if component.object_id != object_id and len(object_components) > 0:
+            yield object_id, object_components
+            object_components = []
+        object_id = component.object_id
+        object_components.append(component)
+    if len(object_components) > 0:
+        yield object_id, object_components
+
+
+def iter_buffered_objects(components):
+    """ Groups a stream of components into objects, with all the components kept in memory until the stream is exhausted
+
+    :return: an iterator over (object id, list of components) pairs, in the order of objects first appearance
+    """
+    objects = OrderedDict()
+    for component in components:
+        objects.setdefault(component.object_id, []).append(component)
+    for object_id, object_components in objects.items():
+        yield object_id, object_components
+
+
+def iter_objects_assembly_points(args, logger):
+    """ Obtains assembly points from the AGP formatted scaffold assemblies, specified in the parsed arguments, one object at a time
+
+    Assembly points of an object are produced as soon as the last of its components is read, so long as components of every object
+    form a contiguous run of lines (as required by the AGP specification) in the input streams, taken one after another.
+    Otherwise (e.g., when the same object is described in several input streams) all the input streams are fully buffered,
+    and components of every object are grouped across all of them.
+
+    :return: an iterator over lists of assembly points (one list per object)
+    """
     if args.origin is None:
         logger.debug("\"origin\" were not specified explicitly for this AGP data. Inferring from the data stream")
         sources = []
@@ -207,29 +299,71 @@ if __name__ == "__main__":
     #      reading input AGP data         #
     #######################################
     logger.info("Reading input AGP formatted data")
-    for source in args.agp:
-        for line in source:
-            line = line.strip()
-            if line.startswith("#"):
-                logger.debug("Skipping comment line: {line}".format(line=line))
-                continue
-            data = line.split("\t", 8)
-            if Component.is_scaffold_component(data[4]):
-                logger.debug("Processing a non-gap data line: {line}".format(line=line))
-                component = ScaffoldComponent.from_agp_data(data=data)
-            else:
-                logger.debug("Processing a gap data line: {line}".format(line=line))
-                component = GapComponent.from_agp_data(data=data)
-            objects[component.object_id].append(component)
-
-    for object_id in objects.keys():
-        logger.debug("Processing object {object_id}".format(object_id=object_id))
-        objects[object_id] = sorted(objects[object_id], key=lambda component: (component.object_beg, component.object_end))
-        components = objects[object_id]
-        camsa_points = object_as_camsa_points(object_as_components=components, extra_data=args)
-        assembly_points.extend(camsa_points)
-
-    logger.info("Writing CAMSA formatted assembly poitns to {file}".format(file=args.output.name))
-    camsa_io.write_assembly_points(assembly_points=assembly_points, destination=args.output, output_setup=args.o_format)
+    hot_logger = HotPathLogger(logger=logger, records="AGP lines")
+    sources = [get_seekable_source(source=source) for source in args.agp]
+    components = itertools.chain.from_iterable(iter_components(source=source, hot_logger=hot_logger) for source in sources)
+    if is_objects_contiguous(sources=sources):
+        logger.debug("Components of every object are contiguous in the input AGP data. Streaming the objects")
+        objects = iter_contiguous_objects(components=components)
+    else:
+        logger.warning("Components of some objects are not contiguous in the input AGP data. Buffering the entire input")
+        objects = iter_buffered_objects(components=components)
+    for object_id, object_components in objects:
+        hot_logger.debug("Processing object {object_id}", object_id=object_id)
+        object_components.sort(key=lambda component: (component.object_beg, component.object_end))
+        yield object_as_camsa_points(object_as_components=object_components, extra_data=args)
+    hot_logger.finish()
+
+
+def convert(args, logger):
+    """ Obtains assembly points from the AGP formatted scaffold assemblies, specified in the parsed arguments
+
+    :return: a list of assembly points
+    """
+    assembly_points = []
+    for object_assembly_points in iter_objects_assembly_points(args=args, logger=logger):
+        assembly_points.extend(object_assembly_points)
+    return assembly_points
+
+
+def main(argv=None, hand_off=None):
+    """ Runs the converter with the supplied command line arguments
+
+    :param hand_off: (optional) a list, to which a pair of the obtained assembly points and their CAMSA-out formatting is appended
+        (i.e., to be passed to the analysis in the same process), instead of writing the assembly points to the output stream
+        (handed off assembly points are still written to the output stream, if it was explicitly specified, i.e., is not stdout)
+    :return: a list of assembly points, if they were handed off, None otherwise (assembly points are written one object at a time)
+    """
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    start_time = datetime.datetime.now()
+    #######################################
+    #           logging setup             #
+    #######################################
+    logger = get_script_logger(name="CAMSA.utils.agp2camsa_points", args=args, description=parser.description)
+    logger.info(parser.format_values())
+    logger.info("Starting the converting process")
+
+    if hand_off is not None:
+        assembly_points = convert(args=args, logger=logger)
+        hand_off.append((assembly_points, args.o_format))
+        if args.output is not sys.stdout:
+            logger.info("Writing CAMSA formatted assembly poitns to {file}".format(file=args.output.name))
+            camsa_io.write_assembly_points(assembly_points=assembly_points, destination=args.output, output_setup=args.o_format)
+    else:
+        logger.info("Writing CAMSA formatted assembly poitns to {file}".format(file=args.output.name))
+        writer = camsa_io.AssemblyPointsWriter(destination=args.output, output_setup=args.o_format)
+        assembly_points_cnt = 0
+        for object_assembly_points in iter_objects_assembly_points(args=args, logger=logger):
+            writer.write(assembly_points=object_assembly_points)
+            assembly_points_cnt += len(object_assembly_points)
+        assembly_points = None
+        logger.info("Written {cnt} assembly points".format(cnt=assembly_points_cnt))
     logger.info("Finished the conversion.")
     logger.info("Elapsed time: {el_time}".format(el_time=str(datetime.datetime.now() - start_time)))
+    return assembly_points
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import math
+from collections import Counter
+
 
 def get_alignments(iseq, jseq, backtracking, end_cell):
     iseq_r = []
@@ -47,40 +50,184 @@ def substitute_score(letter1, letter2):
     return 1
 
 
+class BandedRow(object):
+    """ A row of a banded DP matrix, that stores only values of the band columns
+
+    Column 0 and columns outside of the band have fixed (default) values, as in the full matrix.
+    """
+    __slots__ = ("lo", "values", "first", "default")
+
+    def __init__(self, lo, values, first, default):
+        self.lo = lo
+        self.values = values
+        self.first = first
+        self.default = default
+
+    def __getitem__(self, j):
+        if j == 0:
+            return self.first
+        k = j - self.lo
+        if 0 <= k < len(self.values):
+            return self.values[k]
+        return self.default
+
+
+def get_peq(seq, wildcard="N"):
+    """ Bit masks of positions in the sequence, that match every letter (with the wildcard letter matching everything) """
+    full_mask = (1 << len(seq)) - 1
+    wildcard_mask = 0
+    masks = {}
+    for index, letter in enumerate(seq):
+        if letter == wildcard:
+            wildcard_mask |= 1 << index
+        else:
+            masks[letter] = masks.get(letter, 0) | (1 << index)
+    peq = {letter: mask | wildcard_mask for letter, mask in masks.items()}
+    peq[wildcard] = full_mask
+    return peq, wildcard_mask
+
+
+def bit_parallel_edit_distance(seq1, seq2):
+    """ Computes the (global, unbanded) edit distance between two sequences with Myers bit-parallel algorithm
+
+    Substitution scoring is the same, as in `substitute_score` ("N" matches any letter), so the result is a lower bound
+    for the banded distance, computed by `bounded_alignment`.
+    Runs in O(len(seq1) * len(seq2) / w) time, where w is the machine word size.
+    """
+    m = len(seq1)
+    if m == 0:
+        return len(seq2)
+    peq, wildcard_mask = get_peq(seq=seq1)
+    mask = (1 << m) - 1
+    high_bit = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for letter in seq2:
+        eq = peq.get(letter, wildcard_mask)
+        xv = eq | mv
+        xh = (((((eq & pv) + pv) & mask) ^ pv) | eq)
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high_bit:
+            score += 1
+        elif mh & high_bit:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score
+
+
+def get_qgrams_cnt(seq, q, wildcard="N"):
+    """ Counts q-grams of the sequence, skipping the ones, that contain the wildcard letter """
+    return Counter(qgram for qgram in (seq[index:index + q] for index in range(len(seq) - q + 1)) if wildcard not in qgram)
+
+
+def may_be_within_edit_distance(seq1, seq2, max_edit_distance, q=None, wildcard="N"):
+    """ Rules out a pair of sequences, that are further apart than the edit distance, in linear time, by the q-gram lemma
+
+    Every edit operation, as well as every wildcard letter, can affect at most q q-grams,
+    so sequences within the edit distance must share at least max(len) - q + 1 - (max_edit_distance + wildcards count) * q q-grams.
+    The longest q (up to the one, that makes spurious shared q-grams unlikely), for which the bound is positive, is used.
+
+    :param q: (optional) a fixed q-gram length
+    :return: False, if the (unbanded) edit distance is certainly greater than `max_edit_distance`, True otherwise
+    """
+    if abs(len(seq1) - len(seq2)) > max_edit_distance:
+        return False
+    length = max(len(seq1), len(seq2))
+    wildcards_cnt = seq1.count(wildcard) + seq2.count(wildcard)
+    if q is None:
+        q = int(math.log(max(length, 1), 4)) + 2
+    while q > 0:
+        threshold = length - q + 1 - (max_edit_distance + wildcards_cnt) * q
+        if threshold > 0:
+            break
+        q -= 1
+    else:
+        return True
+    qgrams_cnt1 = get_qgrams_cnt(seq=seq1, q=q, wildcard=wildcard)
+    qgrams_cnt2 = get_qgrams_cnt(seq=seq2, q=q, wildcard=wildcard)
+    shared_cnt = sum(min(cnt, qgrams_cnt2[qgram]) for qgram, cnt in qgrams_cnt1.items() if qgram in qgrams_cnt2)
+    return shared_cnt >= threshold
+
+
+def banded_alignment_matrix(seq1, seq2, band):
+    """ Fills the edit distance DP matrix only within the band of diagonals |i - j| <= band
+
+    Only O(len(seq1) * band) memory is used for the backtracking, and two rows are kept for the distance values.
+    Cells outside of the band are treated exactly as in the (never filled) full matrix: 0 distance and a stop mark.
+
+    :return: the distance value in the last cell, and a list of `BandedRow` objects with backtracking marks
+    """
+    n, m = len(seq1), len(seq2)
+    backtracking = [BandedRow(lo=1, values="l" * m, first="s", default="s")]
+    prev_lo, prev = 1, list(range(1, m + 1))
+    prev_cnt = m
+    reach = int(math.floor(band))
+    for i in range(1, n + 1):
+        lo = max(1, i - reach)
+        hi = min(m, i + reach)
+        letter1 = seq1[i - 1]
+        cur = []
+        bt = []
+        left = i if lo == 1 else 0
+        for j in range(lo, hi + 1):
+            k = j - 1 - prev_lo
+            if j == 1:
+                diagonal = i - 1
+            else:
+                diagonal = prev[k] if 0 <= k < prev_cnt else 0
+            letter2 = seq2[j - 1]
+            if letter1 != letter2 and letter1 != "N" and letter2 != "N":
+                diagonal += 1
+            best, mark = diagonal, "d"
+            diff = i - j
+            if -band < diff < band or diff > 0:
+                # cells on the band border can only be reached from the direction of the main diagonal
+                up = (prev[k + 1] if 0 <= k + 1 < prev_cnt else 0) + 1
+                if up < best:
+                    best, mark = up, "u"
+            if -band < diff < band or diff <= 0:
+                if left + 1 < best:
+                    best, mark = left + 1, "l"
+            cur.append(best)
+            bt.append(mark)
+            left = best
+        backtracking.append(BandedRow(lo=lo, values="".join(bt), first="u", default="s"))
+        prev_lo, prev, prev_cnt = lo, cur, len(cur)
+    if n == 0:
+        distance = m
+    elif m == 0:
+        distance = n
+    else:
+        k = m - prev_lo
+        distance = prev[k] if 0 <= k < prev_cnt else 0
+    return distance, backtracking
+
+
 def bounded_alignment(seq1, seq2, max_edit_distance=-1):
+    """ Aligns two sequences within a band of `max_edit_distance` cells around the main diagonal
+
+    :param max_edit_distance: the band (and the largest acceptable edit distance), -1 for an unbounded alignment
+    :return: an `AlignmentResult` object. If the sequences are not within the `max_edit_distance`, its consensus and alignments are None,
+        and its edit distance is only guaranteed to exceed `max_edit_distance` (i.e., it may be a lower bound for the banded distance,
+        when the alignment is rejected by the bit-parallel pre-check)
+    """
     if max_edit_distance == -1:
         max_edit_distance = max(len(seq1), len(seq2))
-    i_range = len(seq1) + 1
-    j_range = len(seq2) + 1
-    M = [[0] * j_range for _ in range(i_range)]
-    Mbt = [["s" for _ in range(j_range)] for _ in range(i_range)]
-    for j in range(1, j_range):
-        M[0][j] = j
-        Mbt[0][j] = "l"
-    for i in range(1, i_range):
-        M[i][0] = i
-        Mbt[i][0] = "u"
-    for i in range(1, i_range):
-        for j in range(1, j_range):
-            if abs(i - j) > max_edit_distance:
-                continue
-            options = [(M[i - 1][j - 1] + substitute_score(seq1[i - 1], seq2[j - 1]), "d")]
-            if abs(i - j) < max_edit_distance:
-                options.append((M[i - 1][j] + 1, "u"))
-                options.append((M[i][j - 1] + 1, "l"))
-            else:
-                if i > j:
-                    options.append((M[i - 1][j] + 1, "u"))
-                else:
-                    options.append((M[i][j - 1] + 1, "l"))
-            result = min(options, key=lambda entry: entry[0])
-            M[i][j] = result[0]
-            Mbt[i][j] = result[1]
-    if M[-1][-1] > max_edit_distance:
-        return AlignmentResult(seq1=seq1, seq2=seq2, consensus=None, al_seq1=None, al_seq2=None, edit_distance=M[-1][-1])
-    aligned_seqs = get_alignments(iseq=seq1, jseq=seq2, backtracking=Mbt, end_cell=(i_range - 1, j_range - 1))
+    if max_edit_distance >= 1 and max_edit_distance == int(max_edit_distance) and abs(len(seq1) - len(seq2)) <= max_edit_distance:
+        # for a (positive integer) band, that contains the last cell, the unbanded distance is a lower bound for the banded one,
+        # and is way cheaper to compute
+        lower_bound = bit_parallel_edit_distance(seq1=seq1, seq2=seq2)
+        if lower_bound > max_edit_distance:
+            return AlignmentResult(seq1=seq1, seq2=seq2, consensus=None, al_seq1=None, al_seq2=None, edit_distance=lower_bound)
+    edit_distance, backtracking = banded_alignment_matrix(seq1=seq1, seq2=seq2, band=max_edit_distance)
+    if edit_distance > max_edit_distance:
+        return AlignmentResult(seq1=seq1, seq2=seq2, consensus=None, al_seq1=None, al_seq2=None, edit_distance=edit_distance)
+    aligned_seqs = get_alignments(iseq=seq1, jseq=seq2, backtracking=backtracking, end_cell=(len(seq1), len(seq2)))
     consensus_seq = get_consensus_sequences(aligned_seqs=aligned_seqs)
-    return AlignmentResult(seq1=seq1, seq2=seq2, consensus=consensus_seq, al_seq1=aligned_seqs[0], al_seq2=aligned_seqs[1], edit_distance=M[-1][-1])
+    return AlignmentResult(seq1=seq1, seq2=seq2, consensus=consensus_seq, al_seq1=aligned_seqs[0], al_seq2=aligned_seqs[1], edit_distance=edit_distance)
 
 
 class AlignmentResult(object):
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+""" Reading and writing of BGZF (blocked gzip, as produced by bgzip/samtools) files with zlib only
+
+A BGZF file is a series of gzip members, every one of which holds at most 64 KiB of data and records its own compressed size,
+so it is still a valid gzip file, yet any part of the data can be decompressed without decompressing everything before it.
+A position in the uncompressed data is addressed by a virtual offset: (compressed offset of the block << 16) | offset within the block.
+Compressed offsets of blocks are indexed in a samtools compatible .gzi file.
+"""
+import bisect
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+GZI_EXTENSION = ".gzi"
+MAX_BLOCK_DATA_SIZE = 0xff00
+BLOCK_CACHE_SIZE = 64
+
+GZIP_MAGIC = b"\x1f\x8b"
+BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+HEADER = struct.Struct("<4sI2BH")
+SUBFIELD_HEADER = struct.Struct("<2sH")
+FOOTER = struct.Struct("<2I")
+GZI_ENTRY = struct.Struct("<2Q")
+GZI_COUNT = struct.Struct("<Q")
+EOF_BLOCK = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00\x42\x43\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+
+
+def make_virtual_offset(block_offset, within_block_offset):
+    return (block_offset << 16) | within_block_offset
+
+
+def split_virtual_offset(virtual_offset):
+    return virtual_offset >> 16, virtual_offset & 0xffff
+
+
+def is_gzip(file_name):
+    with open(file_name, "rb") as source:
+        return source.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+
+def get_block_size(data, offset=0):
+    """ A full (compressed) size of the BGZF block, that starts at the `offset` in the `data`
+
+    :return: the block size, or None, if there is no BGZF block header at the offset
+    """
+    if len(data) < offset + HEADER.size:
+        return None
+    magic, _, _, _, extra_length = HEADER.unpack_from(data, offset)
+    if magic != BGZF_MAGIC:
+        return None
+    position = offset + HEADER.size
+    extra_end = position + extra_length
+    while position + SUBFIELD_HEADER.size <= extra_end:
+        subfield_id, subfield_length = SUBFIELD_HEADER.unpack_from(data, position)
+        position += SUBFIELD_HEADER.size
+        if subfield_id == b"BC" and subfield_length == 2:
+            return struct.unpack_from("<H", data, position)[0] + 1
+        position += subfield_length
+    return None
+
+
+def is_bgzf(file_name):
+    with open(file_name, "rb") as source:
+        return get_block_size(source.read(HEADER.size + 64)) is not None
+
+
+def compress_block(data, level=zlib.Z_DEFAULT_COMPRESSION):
+    """ Compresses at most `MAX_BLOCK_DATA_SIZE` bytes into a single BGZF block """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    block_size = HEADER.size + SUBFIELD_HEADER.size + 2 + len(compressed) + FOOTER.size
+    header = HEADER.pack(BGZF_MAGIC, 0, 0, 0xff, SUBFIELD_HEADER.size + 2) + SUBFIELD_HEADER.pack(b"BC", 2) + struct.pack("<H", block_size - 1)
+    return header + compressed + FOOTER.pack(zlib.crc32(data) & 0xffffffff, len(data))
+
+
+def decompress_block(block):
+    """ Decompresses a single BGZF block (the block bytes, as stored in the file, including its header and footer) """
+    extra_length = HEADER.unpack_from(block)[4]
+    data = zlib.decompress(block[HEADER.size + extra_length:len(block) - FOOTER.size], -zlib.MAX_WBITS)
+    crc, size = FOOTER.unpack_from(block, len(block) - FOOTER.size)
+    if size != len(data) or crc != zlib.crc32(data) & 0xffffffff:
+        raise ValueError("Corrupted BGZF block")
+    return data
+
+
+class BgzfWriter(object):
+    """ Writes data into BGZF blocks, keeping track of block offsets for the .gzi index
+
+    :param destination: a path to the output file, or a binary file-like object (which is not closed by the writer)
+    """
+
+    def __init__(self, destination, level=zlib.Z_DEFAULT_COMPRESSION):
+        self.should_close = not hasattr(destination, "write")
+        self.destination = open(destination, "wb") if self.should_close else destination
+        self.level = level
+        self.buffer = bytearray()
+        self.compressed_offset = 0
+        self.uncompressed_offset = 0
+        self.index = []
+
+    def write(self, data):
+        if not isinstance(data, (bytes, bytearray)):
+            data = data.encode("ascii")
+        self.buffer.extend(data)
+        while len(self.buffer) >= MAX_BLOCK_DATA_SIZE:
+            self.flush_block(size=MAX_BLOCK_DATA_SIZE)
+
+    def flush_block(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        if self.compressed_offset > 0:
+            self.index.append((self.compressed_offset, self.uncompressed_offset))
+        block = compress_block(data, level=self.level)
+        self.destination.write(block)
+        self.compressed_offset += len(block)
+        self.uncompressed_offset += len(data)
+
+    def tell(self):
+        """ A virtual offset of the next byte to be written """
+        return make_virtual_offset(self.compressed_offset, len(self.buffer))
+
+    def close(self):
+        if len(self.buffer) > 0:
+            self.flush_block(size=len(self.buffer))
+        self.destination.write(EOF_BLOCK)
+        if self.should_close:
+            self.destination.close()
+        else:
+            self.destination.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def build_gzi(file_name):
+    """ Indexes blocks of the BGZF file by scanning their headers and footers only (i.e., without decompression)
+
+    :return: a list of (compressed offset, uncompressed offset) tuples for every, but the first, block (as samtools stores them),
+        except for empty blocks (i.e., the EOF marker), that hold no data to address
+    :raises ValueError: if the file is not a BGZF file
+    """
+    index = []
+    compressed_offset = uncompressed_offset = 0
+    with open(file_name, "rb") as source:
+        while True:
+            header = source.read(HEADER.size + 64)
+            if len(header) == 0:
+                break
+            block_size = get_block_size(header)
+            if block_size is None:
+                raise ValueError("Not a BGZF block at offset {offset} of \"{file_name}\"".format(offset=compressed_offset, file_name=file_name))
+            source.seek(compressed_offset + block_size - FOOTER.size)
+            data_size = FOOTER.unpack(source.read(FOOTER.size))[1]
+            if compressed_offset > 0 and data_size > 0:
+                index.append((compressed_offset, uncompressed_offset))
+            uncompressed_offset += data_size
+            compressed_offset += block_size
+    return index
+
+
+def write_gzi(index, file_name):
+    with open(file_name, "wb") as destination:
+        destination.write(GZI_COUNT.pack(len(index)))
+        for entry in index:
+            destination.write(GZI_ENTRY.pack(*entry))
+
+
+def read_gzi(file_name):
+    with open(file_name, "rb") as source:
+        data = source.read()
+    entries_cnt = GZI_COUNT.unpack_from(data)[0]
+    return [GZI_ENTRY.unpack_from(data, GZI_COUNT.size + cnt * GZI_ENTRY.size) for cnt in range(entries_cnt)]
+
+
+def load_gzi(file_name, logger=None):
+    """ Reads the .gzi index, cached next to the BGZF file, or builds (and tries to cache) it, if it is missing or outdated """
+    index_file_name = file_name + GZI_EXTENSION
+    if os.path.exists(index_file_name) and os.path.getmtime(index_file_name) >= os.path.getmtime(file_name):
+        return read_gzi(file_name=index_file_name)
+    index = build_gzi(file_name=file_name)
+    try:
+        write_gzi(index=index, file_name=index_file_name)
+    except (IOError, OSError) as exc:
+        if logger is not None:
+            logger.warning("Could not cache BGZF index \"{index}\": {error}".format(index=index_file_name, error=exc))
+    return index
+
+
+class BgzfReader(object):
+    """ Random access to the uncompressed data of a BGZF file, that only decompresses blocks, that overlap requested ranges
+
+    Recently decompressed blocks are cached, and several blocks, requested at once, are decompressed by a pool of threads
+    (zlib releases the GIL during decompression).
+
+    :param threads: a number of threads to decompress blocks with (1 to decompress them in the current thread)
+    """
+
+    def __init__(self, file_name, index=None, threads=1):
+        self.file_name = file_name
+        index = load_gzi(file_name=file_name) if index is None else index
+        self.compressed_offsets = [0] + [entry[0] for entry in index]
+        self.uncompressed_offsets = [0] + [entry[1] for entry in index]
+        self.source = open(file_name, "rb")
+        self.data = mmap.mmap(self.source.fileno(), 0, access=mmap.ACCESS_READ)
+        self.cache = OrderedDict()
+        self.threads = threads if threads is not None and threads > 1 else 1
+        self.pool = None
+
+    def get_block(self, block_index):
+        start = self.compressed_offsets[block_index]
+        return decompress_block(self.data[start:start + get_block_size(self.data, start)])
+
+    def get_blocks(self, block_indexes):
+        missing = [block_index for block_index in block_indexes if block_index not in self.cache]
+        if self.threads > 1 and len(missing) > 1:
+            if self.pool is None:
+                self.pool = ThreadPool(processes=self.threads)
+            decompressed = self.pool.map(self.get_block, missing)
+        else:
+            decompressed = [self.get_block(block_index) for block_index in missing]
+        for block_index, block in zip(missing, decompressed):
+            self.cache[block_index] = block
+        result = [self.cache[block_index] for block_index in block_indexes]
+        for block_index in block_indexes:
+            self.cache[block_index] = self.cache.pop(block_index)
+        while len(self.cache) > max(BLOCK_CACHE_SIZE, len(block_indexes)):
+            self.cache.popitem(last=False)
+        return result
+
+    def get_virtual_offset(self, position):
+        """ A virtual offset of the byte at the `position` in the uncompressed data """
+        block_index = bisect.bisect_right(self.uncompressed_offsets, position) - 1
+        return make_virtual_offset(self.compressed_offsets[block_index], position - self.uncompressed_offsets[block_index])
+
+    def read(self, start, end):
+        """ Bytes [start, end) of the uncompressed data """
+        if end <= start:
+            return b""
+        first = bisect.bisect_right(self.uncompressed_offsets, start) - 1
+        last = bisect.bisect_right(self.uncompressed_offsets, end - 1) - 1
+        blocks = self.get_blocks(list(range(first, last + 1)))
+        offset = start - self.uncompressed_offsets[first]
+        if len(blocks) == 1:
+            return blocks[0][offset:offset + end - start]
+        return b"".join(blocks)[offset:offset + end - start]
+
+    def read_virtual(self, virtual_offset, size):
+        """ `size` bytes of the uncompressed data, starting at the `virtual_offset` """
+        block_offset, within_block_offset = split_virtual_offset(virtual_offset)
+        block_index = bisect.bisect_left(self.compressed_offsets, block_offset)
+        if block_index == len(self.compressed_offsets) or self.compressed_offsets[block_index] != block_offset:
+            raise ValueError("Virtual offset {offset} does not point to a BGZF block start".format(offset=virtual_offset))
+        start = self.uncompressed_offsets[block_index] + within_block_offset
+        return self.read(start, start + size)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+        self.data.close()
+        self.source.close()
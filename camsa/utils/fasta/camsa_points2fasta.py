@@ -5,26 +5,29 @@ from __future__ import print_function, division
 
 import datetime
 import logging
+import multiprocessing
 import numbers
 import os
 import sys
-from collections import defaultdict
+from collections import defaultdict, deque
 
-import Bio
 import configargparse
-import networkx
-from Bio import SeqIO
-from Bio.Alphabet import generic_dna
-from Bio.Seq import Seq
-from Bio.SeqRecord import SeqRecord
+import six
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
 import camsa
 from camsa.core.io import read_pairs, read_seqi_from_input_sources
-from camsa.core.data_structures import get_scaffold_edges, Sequence
-from camsa.utils.fasta.data_structures import IntraGapFilling, FlankingGapFilling
+from camsa.core.data_structures import Sequence
+from camsa.utils.fasta.data_structures import IntraGapFilling, FlankingGapFilling, AssemblyGraph
+from camsa.utils.fasta.io import WrappedFastaWriter, IndexedFasta, open_fasta
+from camsa.utils.shared import HotPathLogger
+
+
+SCAFFOLDS_IN_FLIGHT_PER_PROCESS = 4
+
+logger = logging.getLogger("CAMSA.utils.camsa_points2fasta")
 
 
 def get_scaffold_name_from_vertex(v):
@@ -39,12 +42,16 @@ def reverse_ap(f1, f1_or, f2, f2_or):
     return f2, reverse_or(orientaiton=f2_or), f1, reverse_or(orientaiton=f1_or)
 
 
-def get_assembly_edge(graph):
-    for edge in graph.edges():
-        v1, v2 = edge
-        if v1[:-1] != v2[:-1]:
-            return edge
-    return None, None
+def get_ordered_scaffold_edges(assembly_points):
+    """ Scaffold edges (between tail and head extremities), in the order, in which scaffolds first appear in the assembly points """
+    seen = set()
+    result = []
+    for ap in assembly_points:
+        for name in (ap.seq1, ap.seq2):
+            if name not in seen:
+                seen.add(name)
+                result.append((name + "t", name + "h"))
+    return result
 
 
 def get_sequence_of_fragments_from_path(path, assembly_points_by_edges):
@@ -64,7 +71,64 @@ def get_sequence_of_fragments_from_path(path, assembly_points_by_edges):
     return result
 
 
-if __name__ == "__main__":
+def write_scaffold(writer, fasta, title, fragment_aps, sep, sep_length):
+    """ Writes a single scaffold record: its fragments (oriented as in the assembly points) and gaps between them
+
+    :param sep_length: a gap length to be used for assembly points with unknown (or non positive) gap sizes
+    """
+    writer.start_record(title=title)
+    for f_cnt, (f1, f1_or, f2, f2_or, gap_size) in enumerate(fragment_aps):
+        writer.write(fasta.fetch(name=f1, strand=f1_or))
+        gap_length = gap_size if isinstance(gap_size, numbers.Number) else sep_length
+        if gap_length <= 0:
+            gap_length = sep_length
+        writer.write_repeated(unit=sep, count=int(gap_length))
+        if f_cnt == len(fragment_aps) - 1:
+            writer.write(fasta.fetch(name=f2, strand=f2_or))
+    writer.end_record()
+
+
+scaffold_worker_setup = {}
+
+
+def init_scaffold_worker(fasta_file_name, threads, sep, sep_length):
+    scaffold_worker_setup["fasta"] = open_fasta(source=fasta_file_name, threads=threads)
+    scaffold_worker_setup["sep"] = sep
+    scaffold_worker_setup["sep_length"] = sep_length
+
+
+def build_scaffold_record(task):
+    title, fragment_aps = task
+    destination = six.StringIO()
+    write_scaffold(writer=WrappedFastaWriter(destination=destination), fasta=scaffold_worker_setup["fasta"], title=title, fragment_aps=fragment_aps,
+                   sep=scaffold_worker_setup["sep"], sep_length=scaffold_worker_setup["sep_length"])
+    return destination.getvalue()
+
+
+def iter_scaffold_records(tasks, fasta_file_name, processes, threads, sep, sep_length, in_flight):
+    """ Builds FASTA formatted scaffold records in a pool of processes (each one with its own indexed access to the fasta file)
+
+    At most `in_flight` scaffolds are being built (or wait to be outputted) at any time,
+    and records are produced in the order of tasks, regardless of the order they are built in.
+
+    :param tasks: an iterable over (title, fragment assembly points) tuples
+    :return: an iterator over FASTA formatted records
+    """
+    pool = multiprocessing.Pool(processes=processes, initializer=init_scaffold_worker, initargs=(fasta_file_name, threads, sep, sep_length))
+    pending = deque()
+    try:
+        for task in tasks:
+            if len(pending) >= in_flight:
+                yield pending.popleft().get()
+            pending.append(pool.apply_async(build_scaffold_record, (task,)))
+        while len(pending) > 0:
+            yield pending.popleft().get()
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main(argv=None):
     full_description = camsa.full_description_template.format(
         names=camsa.CAMSA_AUTHORS,
         affiliations=camsa.AFFILIATIONS,
@@ -91,6 +155,11 @@ if __name__ == "__main__":
                         help="A default length, that is used for the gap size between scaffolds in the translated assemblies. Used in case, when gap-size column has \"?\" value\nDEFAULT: 20")
     parser.add_argument("--scaffold-name-template", type=str,
                         help="Python string template for the scaffold ids, in the produced FASTA formatted sequences. \"cnt\" attribute can be utilized\nDEFAULT: scaffold_{cnt}")
+    parser.add_argument("--c-threads", type=int,
+                        help="A number of threads, that decompress blocks of BGZF compressed fasta files in parallel\nDEFAULT: 4")
+    parser.add_argument("--c-processes", type=int,
+                        help="A number of processes, that build scaffold sequences in parallel (for fasta files, that can be indexed, i.e., not streams).\n"
+                             "Scaffolds are outputted in their original order regardless\nDEFAULT: 1")
     parser.add_argument("-o", "--output", type=configargparse.FileType("wt"), default=sys.stdout,
                         help="A stream to which the FASTA formatted converted sequence, representing the CAMSA formatted scaffold assembly, is output\nDEFAULT: stdout")
 
@@ -99,10 +168,9 @@ if __name__ == "__main__":
                         help="Logging level for the converter.\nDEFAULT: {info}".format(info=logging.INFO))
     parser.add_argument("--c-logging-formatter-entry",
                         help="Format string for python logger.")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     start_time = datetime.datetime.now()
 
-    logger = logging.getLogger("CAMSA.utils.camsa_points2fasta")
     ch = logging.StreamHandler()
     ch.setLevel(args.logging_level)
     logger.setLevel(args.logging_level)
@@ -118,9 +186,11 @@ if __name__ == "__main__":
     assembly_points_by_sources = [ap for ap_list in assembly_points_by_sources.values() for ap in ap_list]
     logger.info("A total of {ap_cnt} assembly points was obtained".format(ap_cnt=len(assembly_points_by_sources)))
 
-    assembly_graph = networkx.Graph()
+    assembly_graph = AssemblyGraph()
 
-    scaffold_edges = get_scaffold_edges(assembly_points=assembly_points_by_sources)
+    # scaffold edges go first, so that circular scaffolds are cut by an assembly point,
+    # and in the order of assembly points, so that scaffolds are produced in the same order (and orientation) on every run
+    scaffold_edges = get_ordered_scaffold_edges(assembly_points=assembly_points_by_sources)
     assembly_graph.add_edges_from(scaffold_edges)
     assembly_points_by_edges = {}
 
@@ -130,41 +200,30 @@ if __name__ == "__main__":
             assembly_points_by_edges[tuple(sorted([u, v]))] = ap
 
     logger.debug("Checking that there are no in(semi)conflicting assembly points")
-    for vertex in assembly_graph.nodes():
-        degree = assembly_graph.degree[vertex]
-        if degree > 2:
-            scaffold_name = get_scaffold_name_from_vertex(v=vertex)
-            logger.error("Supplied assembly contained a conflict.")
-            logger.error("Scaffold {scaffold_name} by its extremity {extremity_name} is reported as adjacent to more than one other scaffold's extremity"
-                         "".format(scaffold_name=scaffold_name, extremity_name=vertex))
-            exit(1)
+    for vertex in assembly_graph.get_conflicting_vertices():
+        scaffold_name = get_scaffold_name_from_vertex(v=vertex)
+        logger.error("Supplied assembly contained a conflict.")
+        logger.error("Scaffold {scaffold_name} by its extremity {extremity_name} is reported as adjacent to more than one other scaffold's extremity"
+                     "".format(scaffold_name=scaffold_name, extremity_name=vertex))
+        exit(1)
     logger.debug("All clear, no (semi)conflicts, we can proceed")
 
     logger.info("Processing assemblies constructed from obtained assembly points")
     logger.debug("Extracting paths from assembly graph")
     paths = []
-    for cc in networkx.connected_components(G=assembly_graph):
-        cc = assembly_graph.subgraph(cc).copy()
-        origins = [v for v in cc.nodes() if cc.degree[v] == 1]
-        if len(origins) == 2:
-            path = networkx.shortest_path(G=cc, source=origins[0], target=origins[1])
-            logger.debug("Extracted a linear scaffold of length {scaffold_length}, staring with {s_v} and ending with {e_v}"
-                         "".format(scaffold_length=int(len(path) / 2),
-                                   s_v=get_scaffold_name_from_vertex(v=origins[0]),
-                                   e_v=get_scaffold_name_from_vertex(v=origins[1])))
-            paths.append((path, "l"))
-        if len(origins) == 1:
-            logger.error("Something is wrong with the assembly graph. We have a connected component with a single vertex of degree 1.")
-            exit(1)
-        if len(origins) == 0:
-            logger.debug("Encountered a circular chromosome. Splitting it at random assembly point")
-            assembly_edge = get_assembly_edge(graph=cc)
-            if assembly_edge[0] is None or assembly_edge[1] is None:
-                logger.error("Something is wrong with the assembly graph. Couldn't find a scaffold edge in a circular scaffold.")
-                exit(1)
-            cc.remove_edge(u=assembly_edge[0], v=assembly_edge[1])
-            path = networkx.shortest_path(G=cc, source=assembly_edge[0], target=assembly_edge[1])
-            paths.append((path, "c"))
+    hot_logger = HotPathLogger(logger=logger, records="connected components", report_every=100000)
+    for path, path_type in assembly_graph.iter_paths():
+        hot_logger.tick()
+        if path_type == "l":
+            if hot_logger.is_debug:
+                hot_logger.debug("Extracted a linear scaffold of length {scaffold_length}, staring with {s_v} and ending with {e_v}",
+                                 scaffold_length=int(len(path) / 2),
+                                 s_v=get_scaffold_name_from_vertex(v=path[0]),
+                                 e_v=get_scaffold_name_from_vertex(v=path[-1]))
+        else:
+            hot_logger.debug("Encountered a circular chromosome. Splitting it at random assembly point")
+        paths.append((path, path_type))
+    hot_logger.finish()
     logger.debug("Total number of extracted paths is {path_cnt}".format(path_cnt=len(paths)))
     logger.debug("Out of which {linear_cnt} are linear, and {circular_cnt} are circular"
                  "".format(linear_cnt=len([p for p in paths if p[1] == "l"]),
@@ -172,13 +231,8 @@ if __name__ == "__main__":
     fragments = [get_sequence_of_fragments_from_path(path=p, assembly_points_by_edges=assembly_points_by_edges) for p in paths]
     logger.info("Total number of {scaffold_cnt} scaffolds was obtained from observed assembly points".format(scaffold_cnt=len(fragments)))
 
-    logger.info("Reading fasta of contigs/scaffolds from {file}".format(file=args.fasta))
-    frag_fasta_by_id = {}
-    s_cnt = 0
-    for record in SeqIO.parse(args.fasta, "fasta"):
-        frag_fasta_by_id[record.id] = record
-        s_cnt += 1
-    logger.debug("Processed {cnt} records from fasta file \"{file_name}\"".format(cnt=s_cnt, file_name=args.fasta))
+    logger.info("Indexing fasta of contigs/scaffolds from {file}".format(file=args.fasta))
+    frag_fasta_by_id = open_fasta(source=args.fasta, threads=args.c_threads)
     logger.info("Total number of contig/scaffold sequences is {seq_cnt}".format(seq_cnt=len(frag_fasta_by_id)))
 
     for fragment_aps in fragments:
@@ -189,32 +243,37 @@ if __name__ == "__main__":
 
     used_fragments = set()
     logger.info("Outputting new scaffolds. Data is written to {file_name}".format(file_name=args.output))
-    for s_cnt, fragment_aps in enumerate(fragments):
-        current = Seq("")
-        for f_cnt, (f1, f1_or, f2, f2_or, gap_size) in enumerate(fragment_aps):
+    hot_logger = HotPathLogger(logger=logger, records="scaffolds", report_every=100000)
+    writer = WrappedFastaWriter(destination=args.output)
+    for fragment_aps in fragments:
+        for f1, f1_or, f2, f2_or, gap_size in fragment_aps:
             used_fragments.add(f1)
             used_fragments.add(f2)
-            if f1_or == "+":
-                current += frag_fasta_by_id[f1].seq
-            else:
-                current += frag_fasta_by_id[f1].reverse_complement().seq
-            sep_length = gap_size if isinstance(gap_size, numbers.Number) else args.c_sep_length
-            if sep_length <= 0:
-                sep_length = args.c_sep_length
-            current += Seq(args.c_sep * int(sep_length))
-            if f_cnt == len(fragment_aps) - 1:
-                if f2_or == "+":
-                    current += frag_fasta_by_id[f2].seq
-                else:
-                    current += frag_fasta_by_id[f2].reverse_complement().seq
-        name = args.scaffold_name_template.format(cnt=s_cnt)
-        seq_record = SeqRecord(seq=current, id=name, description="")
-        SeqIO.write(sequences=seq_record, handle=args.output, format="fasta")
+    titles = [args.scaffold_name_template.format(cnt=s_cnt) for s_cnt in range(len(fragments))]
+    processes = args.c_processes if args.c_processes is not None else 1
+    if processes != 1 and not isinstance(frag_fasta_by_id, IndexedFasta):
+        logger.warning("Fasta of contigs/scaffolds can not be indexed, so scaffolds are built in a single process")
+        processes = 1
+    if processes == 1 or len(fragments) <= 1:
+        for title, fragment_aps in zip(titles, fragments):
+            hot_logger.tick()
+            write_scaffold(writer=writer, fasta=frag_fasta_by_id, title=title, fragment_aps=fragment_aps, sep=args.c_sep, sep_length=args.c_sep_length)
+    else:
+        processes = processes if processes > 0 else multiprocessing.cpu_count()
+        for record in iter_scaffold_records(tasks=zip(titles, fragments), fasta_file_name=frag_fasta_by_id.file_name, processes=processes,
+                                            threads=args.c_threads, sep=args.c_sep, sep_length=args.c_sep_length, in_flight=SCAFFOLDS_IN_FLIGHT_PER_PROCESS * processes):
+            hot_logger.tick()
+            args.output.write(record)
+    hot_logger.finish()
     if args.allow_singletons:
         logger.info("Adding singleton fragments, that did not participate in any assembly points to the resulting assmebly")
-        for f_id, fragment in frag_fasta_by_id.items():
+        for f_id in frag_fasta_by_id.names():
             if f_id not in used_fragments:
-                SeqIO.write(sequences=fragment, handle=args.output, format="fasta")
+                writer.write_record(title=frag_fasta_by_id.get_title(name=f_id), pieces=[frag_fasta_by_id.fetch(name=f_id)])
+    frag_fasta_by_id.close()
     logger.info("All done!")
     logger.info("Elapsed time: {el_time}".format(el_time=str(datetime.datetime.now() - start_time)))
 
+
+if __name__ == "__main__":
+    main()
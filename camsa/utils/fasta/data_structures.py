@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
-from Bio.Seq import Seq
+import six
 
-from camsa.utils.fasta.algo import bounded_alignment
+from camsa.utils.fasta.algo import bounded_alignment, may_be_within_edit_distance, AlignmentResult
+
+
+def get_non_n_content(seq):
+    """ Counts letters other than "N" with a single C-level scan (works for both text and byte sequences) """
+    return len(seq) - seq.count(b"N" if isinstance(seq, six.binary_type) else "N")
 
 
 class GapFilling(object):
@@ -13,8 +18,7 @@ class GapFilling(object):
         return False
 
     def compute_score(self, gap_size, gap_size_error):
-        non_N_content = len([letter for letter in self.seq if letter != "N"])
-        self.score = non_N_content
+        self.score = get_non_n_content(seq=self.seq)
 
 
 class IntraGapFilling(GapFilling):
@@ -49,7 +53,16 @@ class FlankingGapFilling(GapFilling):
             max_overlap = int(min(max_overlap, len(self.start_seq), len(self.end_seq)))
             l1s = self.start_seq[-max_overlap:]
             l2p = self.end_seq[:max_overlap]
-            alignment_result = bounded_alignment(seq1=l1s, seq2=l2p, max_edit_distance=max_overlap - min_overlap)
+            max_edit_distance = max_overlap - min_overlap
+            if max_edit_distance >= 0 and l1s == l2p:
+                # an exact suffix/prefix overlap is its own (all matches) alignment
+                self.alignment_result = AlignmentResult(seq1=l1s, seq2=l2p, consensus=l1s, al_seq1=l1s, al_seq2=l2p, edit_distance=0)
+                return True
+            if max_edit_distance >= 1 and max_edit_distance == int(max_edit_distance) and \
+                    not may_be_within_edit_distance(seq1=l1s, seq2=l2p, max_edit_distance=max_edit_distance):
+                # no plausible overlap, rejected without any DP
+                return False
+            alignment_result = bounded_alignment(seq1=l1s, seq2=l2p, max_edit_distance=max_edit_distance)
             if alignment_result.consensus is None:
                 return False
             else:
@@ -69,3 +82,91 @@ class FlankingGapFilling(GapFilling):
             max_overlap = cumulative_length - gap_size + gap_size_error
             max_overlap = min(max_overlap, len(self.start_seq), len(self.end_seq))
             self.seq = self.start_seq[:max_overlap] + self.alignment_result.consensus + self.end_seq[max_overlap:]
+
+
+class AssemblyGraph(object):
+    """ A graph on scaffold extremities, where every extremity is adjacent to at most two others (its scaffold mate and, at most, one more by an assembly point)
+
+    Neighbours are stored in an adjacency array (two slots per vertex), so that all linear and circular scaffolds are recovered by a single walk over it.
+    Vertices, that are about to get a third neighbour, are recorded as conflicting, instead.
+    """
+    NO_VERTEX = -1
+
+    def __init__(self):
+        self.names = []
+        self.indexes = {}
+        self.adjacency = []
+        self.conflicts = set()
+
+    def get_index(self, vertex):
+        index = self.indexes.get(vertex)
+        if index is None:
+            index = len(self.names)
+            self.indexes[vertex] = index
+            self.names.append(vertex)
+            self.adjacency.extend((self.NO_VERTEX, self.NO_VERTEX))
+        return index
+
+    def add_edge(self, u, v):
+        u_index, v_index = self.get_index(vertex=u), self.get_index(vertex=v)
+        if u_index == v_index:
+            self.conflicts.add(u_index)
+            return
+        if v_index == self.adjacency[2 * u_index] or v_index == self.adjacency[2 * u_index + 1]:
+            return
+        self.link(u_index, v_index)
+        self.link(v_index, u_index)
+
+    def add_edges_from(self, edges):
+        for u, v in edges:
+            self.add_edge(u=u, v=v)
+
+    def link(self, u_index, v_index):
+        slot = 2 * u_index
+        if self.adjacency[slot] == self.NO_VERTEX:
+            self.adjacency[slot] = v_index
+        elif self.adjacency[slot + 1] == self.NO_VERTEX:
+            self.adjacency[slot + 1] = v_index
+        else:
+            self.conflicts.add(u_index)
+
+    def get_conflicting_vertices(self):
+        """ Vertices, that have more than two neighbours, in the order they were added to the graph """
+        return [self.names[index] for index in sorted(self.conflicts)]
+
+    def walk(self, first, second):
+        """ Walks from the `first` vertex through the `second` one, until a dead end, or until the walk returns to the `first` vertex
+
+        :return: (a list of visited vertex indexes, whether the walk returned to the `first` vertex) tuple
+        """
+        adjacency = self.adjacency
+        path = [first]
+        previous, current = first, second
+        while current != self.NO_VERTEX and current != first:
+            path.append(current)
+            neighbour = adjacency[2 * current]
+            previous, current = current, (adjacency[2 * current + 1] if neighbour == previous else neighbour)
+        return path, current == first
+
+    def iter_paths(self):
+        """ Walks every connected component (in the order of their first added vertices) once
+
+        Linear paths start at the end, that was added to the graph first.
+        Cycles start at their first added vertex and go through its first added neighbour, so that they are cut by the edge to its other neighbour.
+        Conflicting graphs must not be walked.
+
+        :return: an iterator over ([vertex, ...], "l" | "c") tuples
+        """
+        visited = bytearray(len(self.names))
+        adjacency = self.adjacency
+        for start in range(len(self.names)):
+            if visited[start]:
+                continue
+            path, is_cycle = self.walk(first=start, second=adjacency[2 * start])
+            if not is_cycle and adjacency[2 * start + 1] != self.NO_VERTEX:
+                path = self.walk(first=start, second=adjacency[2 * start + 1])[0][:0:-1] + path
+            if not is_cycle and path[-1] < path[0]:
+                path.reverse()
+            for index in path:
+                visited[index] = 1
+            yield [self.names[index] for index in path], "c" if is_cycle else "l"
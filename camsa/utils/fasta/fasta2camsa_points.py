@@ -15,6 +15,11 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
 import camsa
+import camsa.core.io as camsa_io
+from camsa.core.data_structures import AssemblyPoint
+from camsa.utils.shared import get_script_logger, HotPathLogger
+
+logger = logging.getLogger("CAMSA.utils.fasta2camsa_points")
 
 
 class CoordsEntry(object):
@@ -220,7 +225,7 @@ def filter_fully_covered_contigs(contigs):
     return result_chain
 
 
-if __name__ == "__main__":
+def get_parser():
     full_description = camsa.full_description_template.format(
         names=camsa.CAMSA_AUTHORS,
         affiliations=camsa.AFFILIATIONS,
@@ -277,19 +282,16 @@ if __name__ == "__main__":
                         help="Logging level for the converter.\nDEFAULT: {info}".format(info=logging.INFO))
     parser.add_argument("--c-logging-formatter-entry",
                         help="Format string for python logger.")
-    args = parser.parse_args()
-    start_time = datetime.datetime.now()
+    return parser
 
-    logger = logging.getLogger("CAMSA.utils.fasta2camsa_points")
-    ch = logging.StreamHandler()
-    ch.setLevel(args.c_logging_level)
-    logger.setLevel(args.c_logging_level)
-    logger.addHandler(ch)
-    logger.info(full_description)
-    logger.info(parser.format_values())
-    ch.setFormatter(logging.Formatter(args.c_logging_formatter_entry))
-    logger.info("Starting the converting process")
 
+def convert(args, write=True):
+    """ Obtains assembly points from the scaffolds, specified in the parsed arguments, by aligning contigs to them
+
+    :param write: whether to write the obtained assembly points for every scaffolds file into the output directory
+    :return: a list of assembly points
+    """
+    result = []
     args.output_dir = os.path.expanduser(args.output_dir)
     args.output_dir = os.path.abspath(args.output_dir)
     args.tmp_dir = os.path.join(args.output_dir, "fasta2camsa") if args.tmp_dir is None else os.path.abspath(os.path.expanduser(args.tmp_dir))
@@ -324,12 +326,12 @@ if __name__ == "__main__":
                         "".format(contigs_file=args.contigs, scaffolds_file=scaffolds_file))
             logger.debug("Results will be stored in \"{prefix}.delta\"."
                          "".format(prefix=prefix))
-            result = run_nucmer(contigs_file_name=args.contigs, reference_file_name=scaffolds_file,
-                                nucmer_executable_path=args.nucmer,
-                                output_dir=args.tmp_dir,
-                                logs_dir=args.logs_dir,
-                                cli_arguments=args.nucmer_cli_arguments)
-            if result != 0 and args.ensure_all:
+            exitcode = run_nucmer(contigs_file_name=args.contigs, reference_file_name=scaffolds_file,
+                                  nucmer_executable_path=args.nucmer,
+                                  output_dir=args.tmp_dir,
+                                  logs_dir=args.logs_dir,
+                                  cli_arguments=args.nucmer_cli_arguments)
+            if exitcode != 0 and args.ensure_all:
                 exit_program()
 
         ##################################################################################################
@@ -353,17 +355,17 @@ if __name__ == "__main__":
             delta_file_name = os.path.join(args.tmp_dir, original_name_prefix + ".delta")
             logger.info("Running delta-filter util for \"{delta_file}\" file.".format(delta_file=delta_file_name))
             logger.debug("Results will be stored in \"{prefix}.filtered.delta\"".format(prefix=prefix))
-            result = run_delta_filter(delta_file_name=delta_file_name, output_dir=args.tmp_dir, logs_dir=args.logs_dir,
-                                      delta_filter_executable_path=args.delta_filter,
-                                      cli_arguments=args.delta_filter_cli_arguments)
-            if result != 0 and args.ensure_all:
+            exitcode = run_delta_filter(delta_file_name=delta_file_name, output_dir=args.tmp_dir, logs_dir=args.logs_dir,
+                                        delta_filter_executable_path=args.delta_filter,
+                                        cli_arguments=args.delta_filter_cli_arguments)
+            if exitcode != 0 and args.ensure_all:
                 exit_program()
 
             delta_file_name = os.path.join(args.tmp_dir, original_name_prefix + ".filtered.delta")
             logger.info("Running show-coords util for \"{delta_file}\" file.".format(delta_file=delta_file_name))
             logger.debug("Results will be stored in \"{prefix}.coords\"".format(prefix=original_name_prefix))
-            result = run_show_coords(delta_file_name=delta_file_name, output_dir=args.tmp_dir, logs_dir=args.logs_dir, show_coords_executable_path=args.show_coords, cli_arguments=args.show_coords_cli_arguments)
-            if result != 0 and args.ensure_all:
+            exitcode = run_show_coords(delta_file_name=delta_file_name, output_dir=args.tmp_dir, logs_dir=args.logs_dir, show_coords_executable_path=args.show_coords, cli_arguments=args.show_coords_cli_arguments)
+            if exitcode != 0 and args.ensure_all:
                 exit_program()
 
         ##################################################################################################
@@ -381,21 +383,55 @@ if __name__ == "__main__":
             parser = CoordsParser(source=source, lower_frag_cover=args.c_cov_threshold, collapse_consecutive=args.collapse_consecutive_alignments)
             chains = parser.parse_data()
 
+            prefix_assembly_points = []
+            hot_logger = HotPathLogger(logger=logger, records="alignments")
+            for scaffold, contigs_chain in chains.items():
+                hot_logger.tick(len(contigs_chain))
+                hot_logger.debug("Converting {cnt} alignments on \"{scaffold}\"", cnt=len(contigs_chain), scaffold=scaffold)
+                if not args.c_keep_fully_covered_contigs:
+                    contigs_chain = filter_fully_covered_contigs(contigs=contigs_chain)
+                assembly_points = get_assembly_points_from_aligned_contigs(coords_entries=contigs_chain,
+                                                                           strategy=args.coords_to_pairs_strategy)
+                for left, right in assembly_points:
+                    prefix_assembly_points.append(AssemblyPoint(seq1=left.fragment_name, seq1_or=left.fragment_orientation,
+                                                                seq2=right.fragment_name, seq2_or=right.fragment_orientation,
+                                                                gap_size=min(right.scaffold_start, right.scaffold_end) - max(left.scaffold_end, left.scaffold_start),
+                                                                cw="?", sources=[prefix]))
+            hot_logger.finish()
+        if write:
             result_file = os.path.join(args.output_dir, prefix + ".camsa.points")
             with open(result_file, "wt") as destination:
                 logger.info("Writing coords data in terms of CAMSA assembly points in \"{camsa_input_file}\"".format(camsa_input_file=result_file))
                 writer = csv.writer(destination, delimiter="\t")
                 writer.writerow(['origin', 'seq1', 'seq1_or', 'seq2', 'seq2_or', 'gap_size', 'cw'])
-                for scaffold, contigs_chain in chains.items():
-                    if not args.c_keep_fully_covered_contigs:
-                        contigs_chain = filter_fully_covered_contigs(contigs=contigs_chain)
-                    assembly_points = get_assembly_points_from_aligned_contigs(coords_entries=contigs_chain,
-                                                                               strategy=args.coords_to_pairs_strategy)
-                    for left, right in assembly_points:
-                        writer.writerow([prefix,
-                                         left.fragment_name, left.fragment_orientation,
-                                         right.fragment_name, right.fragment_orientation,
-                                         min(right.scaffold_start, right.scaffold_end) - max(left.scaffold_end, left.scaffold_start),
-                                         "?"])
-            logger.info("Finished converting data for \"{prefix}\"".format(prefix=prefix))
+                for ap in prefix_assembly_points:
+                    writer.writerow([prefix, ap.seq1, ap.seq1_or, ap.seq2, ap.seq2_or, ap.gap_size, ap.cw])
+        result.extend(prefix_assembly_points)
+        logger.info("Finished converting data for \"{prefix}\"".format(prefix=prefix))
+    return result
+
+
+def main(argv=None, hand_off=None):
+    """ Runs the converter with the supplied command line arguments
+
+    :param hand_off: (optional) a list, to which a pair of the obtained assembly points and their CAMSA-out formatting is appended
+        (i.e., to be passed to the analysis in the same process), instead of writing the assembly points into the output directory
+    :return: a list of assembly points
+    """
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    start_time = datetime.datetime.now()
+
+    get_script_logger(name=logger.name, args=args, description=parser.description)
+    logger.info(parser.format_values())
+    logger.info("Starting the converting process")
+
+    result = convert(args=args, write=hand_off is None)
+    if hand_off is not None:
+        hand_off.append((result, camsa_io.INPUT_OUTPUT_SETUP))
     logger.info("Elapsed time: {el_time}".format(el_time=str(datetime.datetime.now() - start_time)))
+    return result
+
+
+if __name__ == "__main__":
+    main()
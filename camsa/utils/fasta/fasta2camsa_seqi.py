@@ -7,7 +7,6 @@ import os
 import sys
 
 import configargparse
-from Bio import SeqIO
 
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -16,6 +15,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
 import camsa
 from camsa.core.data_structures import Sequence
 from camsa.core.io import write_seqi
+from camsa.utils.fasta.io import open_fasta
 
 if __name__ == "__main__":
     full_description = camsa.full_description_template.format(
@@ -44,6 +44,7 @@ if __name__ == "__main__":
     parser.add_argument("--o-delimiter", type=str, default="\t",
                         help="A single character string, used as a delimiter in the output (t)/(c)sv file.\nDEFAULT: \\t")
     args = parser.parse_args()
+
     start_time = datetime.datetime.now()
 
     logger = logging.getLogger("CAMSA.utils.fasta2camsa_seqi")
@@ -63,11 +64,13 @@ if __name__ == "__main__":
         except (ValueError, TypeError, AttributeError):
             seq_group_id = None
         logger.info("Processing file: \"{file_name}\"".format(file_name=f))
+        fasta = open_fasta(source=f)
         cnt = 0
-        for record in SeqIO.parse(f, "fasta"):
-            seq = Sequence(name=record.id, parent_seq_id=record.id, start=0, end=len(record.seq), strand="+", annotation=record.description, seq_group_id=seq_group_id)
-            entries[record.id] = seq
+        for name in fasta.names():
+            seq = Sequence(name=name, parent_seq_id=name, start=0, end=fasta.get_length(name), strand="+", annotation=fasta.get_title(name), seq_group_id=seq_group_id)
+            entries[name] = seq
             cnt += 1
+        fasta.close()
         logger.info("Processed {cnt} fasta records".format(cnt=cnt))
     sequences = sorted(entries.values(), key=lambda seq: seq.name)
     write_seqi(sequences=sequences, destination=args.output, output_setup=args.o_format, delimiter=args.o_delimiter)
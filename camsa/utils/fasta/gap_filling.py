@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import copy
+import multiprocessing
+
+from camsa.utils.fasta.data_structures import FlankingGapFilling
+
+
+class Gap(object):
+    """ A gap between two consecutive scaffolds in a merged assembly, together with candidate sequences to fill it with
+
+    :param candidates: a list of `GapFilling` objects (i.e., `IntraGapFilling` and `FlankingGapFilling`)
+    """
+
+    def __init__(self, gap_id, gap_size, gap_size_error, candidates):
+        self.gap_id = gap_id
+        self.gap_size = gap_size
+        self.gap_size_error = gap_size_error
+        self.candidates = candidates
+        self.filling = None
+
+    @property
+    def score(self):
+        return None if self.filling is None else self.filling.score
+
+
+def evaluate_candidate(candidate, gap_size, gap_size_error):
+    """ Checks if the candidate can fill the gap, and if so, prepares its sequence and scores it
+
+    The candidate itself is not modified, all the evaluation results are set on its (shallow) copy.
+
+    :return: the scored copy of the candidate, or None, if it is not suitable
+    """
+    candidate = copy.copy(candidate)
+    if not candidate.suitable_to_fill_the_gap(gap_size, gap_size_error):
+        return None
+    if isinstance(candidate, FlankingGapFilling):
+        candidate.prepare_seq(gap_size, gap_size_error)
+    candidate.compute_score(gap_size, gap_size_error)
+    return candidate
+
+
+def evaluate_flanking_candidate(task):
+    gap_index, candidate_index, candidate, gap_size, gap_size_error = task
+    return gap_index, candidate_index, evaluate_candidate(candidate=candidate, gap_size=gap_size, gap_size_error=gap_size_error)
+
+
+def fill_gaps(gaps, processes=1, chunksize=8):
+    """ Finds the best (highest scoring) filling for every gap of a merged assembly
+
+    Candidates, that are scored by their sequences alone, are evaluated right away,
+    while flanking candidates, that may require alignments of overlapping flanks, are dispatched to a pool of processes.
+    Ties are resolved in favor of the candidate, that comes first in the gap candidates list.
+    Candidates are never modified (in either mode), fillings are evaluated copies of them.
+
+    :param gaps: a list of `Gap` objects
+    :param processes: a number of processes for flanking candidates evaluation (1 to evaluate them in the current process, None for all CPUs)
+    :return: the list of gaps, with the `filling` attribute set to the evaluated copy of the best suitable candidate (or None, if there are no suitable ones)
+    """
+    best = {}
+
+    def update(gap_index, candidate_index, candidate):
+        if candidate is None:
+            return
+        current = best.get(gap_index)
+        if current is None or (candidate.score, -candidate_index) > (current[1].score, -current[0]):
+            best[gap_index] = (candidate_index, candidate)
+
+    flanking_tasks = []
+    for gap_index, gap in enumerate(gaps):
+        for candidate_index, candidate in enumerate(gap.candidates):
+            if isinstance(candidate, FlankingGapFilling):
+                flanking_tasks.append((gap_index, candidate_index, candidate, gap.gap_size, gap.gap_size_error))
+            else:
+                update(gap_index, candidate_index, evaluate_candidate(candidate=candidate, gap_size=gap.gap_size, gap_size_error=gap.gap_size_error))
+
+    if processes == 1 or len(flanking_tasks) <= 1:
+        evaluated = map(evaluate_flanking_candidate, flanking_tasks)
+        for gap_index, candidate_index, candidate in evaluated:
+            update(gap_index, candidate_index, candidate)
+    else:
+        pool = multiprocessing.Pool(processes=processes)
+        try:
+            for gap_index, candidate_index, candidate in pool.imap_unordered(evaluate_flanking_candidate, flanking_tasks, chunksize):
+                update(gap_index, candidate_index, candidate)
+        finally:
+            pool.close()
+            pool.join()
+
+    for gap_index, gap in enumerate(gaps):
+        gap.filling = best[gap_index][1] if gap_index in best else None
+    return gaps
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+import gzip
+import logging
+import mmap
+import os
+import zlib
+from collections import OrderedDict
+
+import six
+
+from camsa.utils.fasta import bgzf
+from camsa.utils.fasta.seq import DEFAULT_LINE_WIDTH, format_fasta_record, get_subsequence, reverse_complement
+
+REPEATS_CHUNK_SIZE = 1 << 16
+FAI_EXTENSION = ".fai"
+TITLE_WINDOW = 256
+
+logger = logging.getLogger("CAMSA.utils.fasta.io")
+
+
+class WrappedFastaWriter(object):
+    """ Writes FASTA records piece by piece (i.e., fragments and gap runs of a scaffold), wrapping sequences into fixed-width lines
+
+    The pieces are never concatenated, so writing a record takes time and memory linear in the size of its largest piece.
+    The output is the same, as Biopython produces for the whole record (60 letters per line by default).
+    """
+
+    def __init__(self, destination, line_width=DEFAULT_LINE_WIDTH):
+        self.destination = destination
+        self.line_width = line_width
+        self.line_fill = 0
+
+    def start_record(self, title):
+        self.end_record()
+        self.destination.write(">" + title + "\n")
+
+    def write(self, piece):
+        """ Appends a piece of sequence to the current record """
+        width = self.line_width
+        length = len(piece)
+        position = 0
+        if self.line_fill > 0:
+            position = min(width - self.line_fill, length)
+            self.destination.write(piece[:position])
+            self.line_fill += position
+            if self.line_fill < width:
+                return
+            self.destination.write("\n")
+            self.line_fill = 0
+        full_lines_end = position + (length - position) // width * width
+        if full_lines_end > position:
+            self.destination.write("\n".join(piece[index:index + width] for index in range(position, full_lines_end, width)))
+            self.destination.write("\n")
+        if full_lines_end < length:
+            self.destination.write(piece[full_lines_end:])
+            self.line_fill = length - full_lines_end
+
+    def write_repeated(self, unit, count):
+        """ Appends `count` repeats of the `unit` string (i.e., a gap run) to the current record, without building the whole run """
+        if count <= 0 or len(unit) == 0:
+            return
+        chunk_count = max(REPEATS_CHUNK_SIZE // len(unit), 1)
+        chunk = unit * min(chunk_count, count)
+        while count >= chunk_count:
+            self.write(chunk)
+            count -= chunk_count
+        if count > 0:
+            self.write(unit * count)
+
+    def end_record(self):
+        if self.line_fill > 0:
+            self.destination.write("\n")
+            self.line_fill = 0
+
+    def write_record(self, title, pieces):
+        if len(pieces) == 1:
+            self.end_record()
+            self.destination.write(format_fasta_record(title=title, seq=pieces[0], line_width=self.line_width))
+            return
+        self.start_record(title=title)
+        for piece in pieces:
+            self.write(piece)
+        self.end_record()
+
+
+def get_record_title(record_id, description):
+    """ A FASTA title line (without ">") for the record, as Biopython composes it """
+    if description and description.split(None, 1)[0] == record_id:
+        return description
+    if description:
+        return record_id + " " + description
+    return record_id
+
+
+class FaiEntry(object):
+    """ A single record of a .fai (samtools faidx compatible) index """
+    __slots__ = ("name", "length", "offset", "line_bases", "line_width")
+
+    def __init__(self, name, length, offset, line_bases, line_width):
+        self.name = name
+        self.length = length
+        self.offset = offset
+        self.line_bases = line_bases
+        self.line_width = line_width
+
+    def get_byte_offset(self, position):
+        if self.line_bases == 0:
+            return self.offset
+        return self.offset + (position // self.line_bases) * self.line_width + position % self.line_bases
+
+
+def build_fai(file_name):
+    """ Builds a .fai index for the FASTA (or BGZF compressed FASTA) file in a single streaming pass
+
+    Offsets of BGZF compressed files are the ones in the uncompressed data (as samtools has them).
+
+    :return: an OrderedDict of `FaiEntry` objects by record names (in the order of records in the file)
+    :raises ValueError: if the file can not be indexed (i.e., sequence lines of a record have different lengths, or record names are not unique)
+    """
+    entries = OrderedDict()
+    entry = None
+    short_line_seen = False
+    offset = 0
+
+    def finish(entry):
+        if entry is None:
+            return
+        if entry.name in entries:
+            raise ValueError("Duplicate record name \"{name}\" in \"{file_name}\"".format(name=entry.name, file_name=file_name))
+        entries[entry.name] = entry
+
+    opener = gzip.open if bgzf.is_bgzf(file_name) else open
+    with opener(file_name, "rb") as source:
+        for line in source:
+            line_length = len(line)
+            offset += line_length
+            if line.startswith(b">"):
+                finish(entry)
+                title = line[1:].decode("ascii").strip()
+                if len(title) == 0:
+                    raise ValueError("A record without a name in \"{file_name}\"".format(file_name=file_name))
+                entry = FaiEntry(name=title.split(None, 1)[0], length=0, offset=offset, line_bases=0, line_width=0)
+                short_line_seen = False
+                continue
+            bases = line.rstrip(b"\r\n")
+            if entry is None:
+                if len(bases.strip()) > 0:
+                    raise ValueError("Data before the first record in \"{file_name}\"".format(file_name=file_name))
+                continue
+            if len(bases) == 0:
+                # only trailing blank lines are allowed in a record
+                short_line_seen = True
+                continue
+            if short_line_seen or b" " in bases or b"\t" in bases or (entry.line_bases > 0 and len(bases) > entry.line_bases):
+                raise ValueError("Irregular sequence lines in record \"{name}\" of \"{file_name}\"".format(name=entry.name, file_name=file_name))
+            if entry.line_bases == 0:
+                entry.line_bases = len(bases)
+                entry.line_width = line_length if line.endswith(b"\n") else line_length + 1
+            if len(bases) < entry.line_bases or not line.endswith(b"\n"):
+                # only the last sequence line of a record can be shorter
+                short_line_seen = True
+            elif line_length != entry.line_width:
+                raise ValueError("Irregular line endings in record \"{name}\" of \"{file_name}\"".format(name=entry.name, file_name=file_name))
+            entry.length += len(bases)
+        finish(entry)
+    return entries
+
+
+def write_fai(entries, file_name):
+    with open(file_name, "wt") as destination:
+        for entry in entries.values():
+            destination.write("\t".join(map(str, [entry.name, entry.length, entry.offset, entry.line_bases, entry.line_width])) + "\n")
+
+
+def read_fai(file_name):
+    entries = OrderedDict()
+    with open(file_name, "rt") as source:
+        for line in source:
+            data = line.rstrip("\n").split("\t")
+            if len(data) < 5:
+                continue
+            entries[data[0]] = FaiEntry(name=data[0], length=int(data[1]), offset=int(data[2]), line_bases=int(data[3]), line_width=int(data[4]))
+    return entries
+
+
+def load_fai(file_name):
+    """ Reads the .fai index, cached next to the FASTA file, or builds (and tries to cache) it, if it is missing or outdated """
+    index_file_name = file_name + FAI_EXTENSION
+    if os.path.exists(index_file_name) and os.path.getmtime(index_file_name) >= os.path.getmtime(file_name):
+        return read_fai(file_name=index_file_name)
+    entries = build_fai(file_name=file_name)
+    try:
+        write_fai(entries=entries, file_name=index_file_name)
+    except (IOError, OSError) as exc:
+        logger.warning("Could not cache FASTA index \"{index}\": {error}".format(index=index_file_name, error=exc))
+    return entries
+
+
+class MappedFile(object):
+    """ Byte ranges of an uncompressed file through a memory mapping """
+
+    def __init__(self, file_name):
+        self.source = open(file_name, "rb")
+        self.data = mmap.mmap(self.source.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(file_name) > 0 else b""
+
+    def read(self, start, end):
+        return self.data[start:end]
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.source.close()
+
+
+class IndexedFasta(object):
+    """ Random access to records of a FASTA file by (name, start, end, strand), through a .fai index
+
+    Plain files are memory mapped, while BGZF compressed files are read through a .gzi index of their blocks,
+    so that only blocks, overlapping the requested subsequence, are decompressed (by `threads` threads, if there are several of them).
+    Neither the whole file, nor whole records are loaded into memory, unless requested.
+    """
+
+    def __init__(self, file_name, entries=None, threads=1):
+        self.file_name = file_name
+        self.entries = load_fai(file_name=file_name) if entries is None else entries
+        if bgzf.is_bgzf(file_name):
+            self.data = bgzf.BgzfReader(file_name=file_name, index=bgzf.load_gzi(file_name=file_name, logger=logger), threads=threads)
+        else:
+            self.data = MappedFile(file_name=file_name)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def names(self):
+        return list(self.entries.keys())
+
+    def get_length(self, name):
+        return self.entries[name].length
+
+    def get_title(self, name):
+        entry = self.entries[name]
+        window = TITLE_WINDOW
+        while True:
+            start = max(entry.offset - window, 0)
+            header = self.data.read(start, entry.offset)
+            header_start = header.rfind(b"\n", 0, len(header) - 1) + 1
+            if header_start > 0 or start == 0:
+                return header[header_start + 1:].decode("ascii").rstrip()
+            window *= 2
+
+    def fetch(self, name, start=0, end=None, strand="+"):
+        """ Obtains a subsequence of the record, with start/end following python slicing semantics
+
+        :param strand: "+" for the subsequence as is, "-" for its reverse complement
+        """
+        entry = self.entries[name]
+        start, end, _ = slice(start, end).indices(entry.length)
+        if end <= start:
+            seq = ""
+        else:
+            chunk = self.data.read(entry.get_byte_offset(start), entry.get_byte_offset(end - 1) + 1)
+            seq = chunk.replace(b"\n", b"").replace(b"\r", b"")
+            if strand != "+":
+                seq = reverse_complement(seq)
+            seq = seq.decode("ascii")
+        return seq
+
+    def close(self):
+        self.data.close()
+
+
+class InMemoryFasta(object):
+    """ The same interface, as `IndexedFasta` has, for FASTA data, that can not be indexed (i.e., streams, or irregular files) """
+
+    def __init__(self, source):
+        from Bio.SeqIO.FastaIO import SimpleFastaParser
+        self.titles = OrderedDict()
+        self.seqs = {}
+        for title, seq in SimpleFastaParser(source):
+            name = title.split(None, 1)[0]
+            self.titles[name] = title
+            self.seqs[name] = seq
+
+    def __contains__(self, name):
+        return name in self.seqs
+
+    def __len__(self):
+        return len(self.seqs)
+
+    def names(self):
+        return list(self.titles.keys())
+
+    def get_length(self, name):
+        return len(self.seqs[name])
+
+    def get_title(self, name):
+        return self.titles[name]
+
+    def fetch(self, name, start=0, end=None, strand="+"):
+        return get_subsequence(self.seqs[name], start=start, end=end, strand=strand)
+
+    def close(self):
+        pass
+
+
+def open_fasta(source, threads=1):
+    """ Opens FASTA data for random access: memory mapped (or BGZF block-wise decompressed) with a (cached) .fai index, if possible,
+    or loaded into memory otherwise (i.e., streams, plain gzip compressed or irregular files)
+
+    :param source: a path to a FASTA file, or a file-like object
+    :param threads: a number of threads to decompress BGZF blocks with
+    :return: an `IndexedFasta` or an `InMemoryFasta` object
+    """
+    file_name = source if isinstance(source, six.string_types) else getattr(source, "name", None)
+    if isinstance(file_name, six.string_types) and os.path.isfile(file_name):
+        if bgzf.is_gzip(file_name) and not bgzf.is_bgzf(file_name):
+            logger.info("FASTA file \"{file_name}\" is gzip, but not BGZF, compressed. Loading it into memory "
+                        "(recompress it with bgzip for random access)".format(file_name=file_name))
+            with gzip.open(file_name, "rt") as stream:
+                return InMemoryFasta(source=stream)
+        try:
+            return IndexedFasta(file_name=file_name, threads=threads)
+        except (ValueError, UnicodeDecodeError, zlib.error) as exc:
+            logger.warning("FASTA file \"{file_name}\" can not be indexed ({error}). Loading it into memory".format(file_name=file_name, error=exc))
+            if bgzf.is_gzip(file_name):
+                with gzip.open(file_name, "rt") as stream:
+                    return InMemoryFasta(source=stream)
+    if isinstance(source, six.string_types):
+        with open(source, "rt") as stream:
+            return InMemoryFasta(source=stream)
+    return InMemoryFasta(source=source)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+""" Byte-level sequence kernel: reverse complement, oriented slicing and FASTA record formatting
+
+Sequences are processed as `bytes` (`bytearray` and `memoryview` objects are accepted as well), so that a reverse complement is
+a single C-level `bytes.translate` call plus a reversing slice. Text sequences are supported by encoding them into ASCII and back.
+Complements follow the IUPAC rules, that Biopython uses for DNA (case is preserved, unknown letters are kept as is, "U" is complemented to "A").
+"""
+import six
+
+DEFAULT_LINE_WIDTH = 60
+
+if six.PY2:
+    from string import maketrans
+else:
+    maketrans = bytes.maketrans
+
+COMPLEMENT_TABLE = maketrans(b"ACGTUBDHKMRVYacgtubdhkmrvy", b"TGCAAVHDMKYBRtgcaavhdmkybr")
+
+
+def to_bytes(seq):
+    """ A `bytes` object for text/bytes/bytearray/memoryview sequences (no copy is made for `bytes`) """
+    if isinstance(seq, six.binary_type):
+        return seq
+    if isinstance(seq, six.text_type):
+        return seq.encode("ascii")
+    return bytes(seq)
+
+
+def reverse_complement(seq):
+    """ A reverse complement of the sequence
+
+    :return: a `str` for text sequences, `bytes` otherwise
+    """
+    if isinstance(seq, six.text_type):
+        return seq.encode("ascii").translate(COMPLEMENT_TABLE)[::-1].decode("ascii")
+    return to_bytes(seq).translate(COMPLEMENT_TABLE)[::-1]
+
+
+def get_subsequence(seq, start=0, end=None, strand="+"):
+    """ A subsequence (with start/end following python slicing semantics), reverse complemented unless the strand is "+"
+
+    `memoryview` sequences are sliced without copying, and only the resulting subsequence is copied.
+    """
+    piece = seq[start:end]
+    if strand != "+":
+        return reverse_complement(piece)
+    return piece.tobytes() if isinstance(piece, memoryview) else piece
+
+
+def format_fasta_record(title, seq, line_width=DEFAULT_LINE_WIDTH):
+    """ A complete FASTA record (with sequence lines wrapped to the `line_width`) built with a single join
+
+    :return: a `str` for text sequences, `bytes` otherwise (in which case the title is encoded into ASCII)
+    """
+    if isinstance(seq, six.text_type):
+        lines = [">" + title]
+        new_line = "\n"
+    else:
+        seq = to_bytes(seq)
+        lines = [b">" + to_bytes(title)]
+        new_line = b"\n"
+    lines.extend(seq[index:index + line_width] for index in range(0, len(seq), line_width))
+    lines.append(seq[:0])
+    return new_line.join(lines)
@@ -7,7 +7,6 @@ from collections import defaultdict
 
 import configargparse
 import logging
-from bg.grimm import GRIMMReader
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
@@ -15,70 +14,80 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
 import camsa
 from camsa.core.data_structures import AssemblyPoint
 import camsa.core.io as camsa_io
+from camsa.utils.grimm.io import iter_chromosomes
+from camsa.utils.shared import get_script_logger
 
 
-def get_assembly_points(genomes):
+def get_chromosome_assembly_points(genome, chr_type, blocks, bad_blocks=None):
+    """ Obtains assembly points between consecutive blocks of a single chromosome, with bad blocks skipped on the fly
+
+    :param bad_blocks: (optional) a set of names of blocks to be excluded
+    :return: a list of assembly points
+    """
+    if bad_blocks is not None and len(bad_blocks) > 0:
+        blocks = [block for block in blocks if block[1] not in bad_blocks]
     result = []
-    for genome, chromosomes in genomes.items():
-        for chr_type, blocks in chromosomes:
-            left_blocks, right_blocks = blocks[:-1], blocks[1:]
-            for l_block, r_block in zip(left_blocks, right_blocks):
-                l_block_sign, l_block_name = l_block
-                r_block_sign, r_block_name = r_block
-                ap = AssemblyPoint(seq1=l_block_name, seq2=r_block_name, seq1_or=l_block_sign, seq2_or=r_block_sign, sources=[genome])
-                result.append(ap)
-            if chr_type == "@":
-                first_block_sign, first_block_name = blocks[0]
-                last_block_sign, last_block_name = blocks[-1]
-                ap = AssemblyPoint(seq1=last_block_name, seq1_or=last_block_sign, seq2=first_block_name, seq2_or=first_block_sign, sources=[genome])
-                result.append(ap)
+    if len(blocks) == 0:
+        return result
+    for (l_block_sign, l_block_name), (r_block_sign, r_block_name) in zip(blocks[:-1], blocks[1:]):
+        result.append(AssemblyPoint(seq1=l_block_name, seq2=r_block_name, seq1_or=l_block_sign, seq2_or=r_block_sign, sources=[genome]))
+    if chr_type == "@":
+        first_block_sign, first_block_name = blocks[0]
+        last_block_sign, last_block_name = blocks[-1]
+        result.append(AssemblyPoint(seq1=last_block_name, seq1_or=last_block_sign, seq2=first_block_name, seq2_or=first_block_sign, sources=[genome]))
     return result
 
 
-def get_blocks_cnt(genomes):
-    block_counter = defaultdict(lambda: defaultdict(int))
+def iter_assembly_points(genomes, bad_blocks=None):
+    """ Streams assembly points one chromosome at a time
+
+    :param genomes: a dict of lists of (chromosome type, blocks) pairs by genome names
+    :param bad_blocks: (optional) a set of names of blocks to be excluded
+    :return: an iterator over lists of assembly points (one list per chromosome)
+    """
     for genome, chromosomes in genomes.items():
-        for _, blocks in chromosomes:
-            for block_sign, block_name in blocks:
-                block_counter[block_name][genome] += 1
-    return block_counter
-
-
-def remove_bad_blocks(genomes, bad_blocks):
-    for genome_name in list(genomes.keys()):
-        new_chromosomes = []
-        for chr_type, old_blocks in genomes[genome_name]:
-            new_blocks = []
-            for block_sign, block_name in old_blocks:
-                if block_name in bad_blocks:
-                    continue
-                new_blocks.append((block_sign, block_name))
-            if len(new_blocks) != 0:
-                new_chromosomes.append((chr_type, new_blocks))
-        genomes[genome_name] = new_chromosomes
-
-
-def remove_duplications(genomes):
-    blocks_cnt = get_blocks_cnt(genomes=genomes)
+        for chr_type, blocks in chromosomes:
+            yield get_chromosome_assembly_points(genome=genome, chr_type=chr_type, blocks=blocks, bad_blocks=bad_blocks)
+
+
+def get_blocks_occurrences(genomes):
+    """ Builds a block x genome occurrence table
+
+    :return: a list of genome names, and a dict of lists of occurrences counts (in the order of genome names) by block names
+    """
+    genomes_names = list(genomes.keys())
+    genomes_cnt = len(genomes_names)
+    occurrences = {}
+    for genome_index, genome_name in enumerate(genomes_names):
+        for _, blocks in genomes[genome_name]:
+            for _, block_name in blocks:
+                block_occurrences = occurrences.get(block_name)
+                if block_occurrences is None:
+                    block_occurrences = occurrences[block_name] = [0] * genomes_cnt
+                block_occurrences[genome_index] += 1
+    return genomes_names, occurrences
+
+
+def get_bad_blocks(genomes, filter_duplications=False, filter_indels=False):
+    """ Determines blocks, that violate any of the requested filters, from a single block x genome occurrence table
+
+    Both filters are decided per block on its (unfiltered) occurrences, so applying them together is the same as applying them one after another.
+
+    :param filter_duplications: whether blocks, that are present more than once in any of the genomes, are bad
+    :param filter_indels: whether blocks, that are absent from any of the genomes, are bad
+    :return: a set of bad block names
+    """
+    if not filter_duplications and not filter_indels:
+        return set()
+    _, occurrences = get_blocks_occurrences(genomes=genomes)
     bad_blocks = set()
-    for block_name, block_cnt in blocks_cnt.items():
-        cnt_per_genomes = block_cnt.values()
-        if any(map(lambda x: x > 1, cnt_per_genomes)):
+    for block_name, block_occurrences in occurrences.items():
+        if (filter_duplications and max(block_occurrences) > 1) or (filter_indels and min(block_occurrences) == 0):
             bad_blocks.add(block_name)
-    remove_bad_blocks(genomes=genomes, bad_blocks=bad_blocks)
+    return bad_blocks
 
 
-def remove_indels(genomes):
-    blocks_cnt = get_blocks_cnt(genomes=genomes)
-    bad_blocks = set()
-    all_genomes = set(genomes.keys())
-    for block_name, block_cnt in blocks_cnt.items():
-        blocks_genomes = set(block_cnt.keys())
-        if len(all_genomes - blocks_genomes) != 0:
-            bad_blocks.add(block_name)
-    remove_bad_blocks(genomes=genomes, bad_blocks=bad_blocks)
-
-if __name__ == "__main__":
+def get_parser():
     full_description = camsa.full_description_template.format(
         names=camsa.CAMSA_AUTHORS,
         affiliations=camsa.AFFILIATIONS,
@@ -99,68 +108,104 @@ if __name__ == "__main__":
     parser.add_argument("--trimmer-char", default=".", type=str, help="A character, which first occurrence in the genome name indicates a position for trimming.\nDEFAULT: .")
     parser.add_argument("--good-genomes", type=str, default="", help="A coma separated list of genome names, to be processed and conversed.\nDEFAULT: \"\" (i.e., all genomes are good)")
     parser.add_argument("--bad-genomes", type=str, default="", help="A coma separated list of genome names, to be excluded from processing and conversion.\nDEFAULT: \"\" (i.e., no genomes are bad)")
-    parser.add_argument("--filter-duplications", dest="filter_duplications", default=False, action="store_true", help="")
-    parser.add_argument("--filter-indels", dest="filter_indels", default=False, action="store_true", help="")
+    parser.add_argument("--filter-duplications", dest="filter_duplications", default=False, action="store_true",
+                        help="A flag to indicate, that blocks, present more than once in any of the genomes, are excluded from all the genomes\nDEFAULT: false")
+    parser.add_argument("--filter-indels", dest="filter_indels", default=False, action="store_true",
+                        help="A flag to indicate, that blocks, absent from any of the genomes, are excluded from all the genomes\n"
+                             "(earlier versions of the converter accepted the flag, but ignored it)\nDEFAULT: false")
     parser.add_argument("--c-logging-level", type=int,
                         choices=[logging.NOTSET, logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL],
                         help="Logging level for the converter.\nDEFAULT: {info}".format(info=logging.INFO))
     parser.add_argument("--c-logging-formatter-entry",
                         help="Format string for python logger.")
+    return parser
 
-    args = parser.parse_args()
 
-    start_time = datetime.datetime.now()
+def get_genomes_names(genomes_names, args):
+    genomes_names = genomes_names.split(",")
+    if args.trim_names:
+        genomes_names = [genome_name.split(args.trimmer_char, 1)[0] for genome_name in genomes_names]
+    return set(genomes_names)
 
-    logger = logging.getLogger("CAMSA.utils.grimm2camsa_points")
-    ch = logging.StreamHandler()
-    ch.setLevel(args.c_logging_level)
-    logger.setLevel(args.c_logging_level)
-    logger.addHandler(ch)
-    logger.info(full_description)
-    logger.info(parser.format_values())
-    ch.setFormatter(logging.Formatter(args.c_logging_formatter_entry))
-    logger.info("Starting the converting process")
+
+def read_genomes(args, logger):
+    """ Reads GRIMM formatted genomes, specified in the parsed arguments, skipping genomes excluded by good/bad genomes lists right away
+
+    :return: a dict of lists of (chromosome type, blocks) pairs by genome names
+    """
+    good_genomes = get_genomes_names(genomes_names=args.good_genomes, args=args) if args.good_genomes != "" else None
+    bad_genomes = get_genomes_names(genomes_names=args.bad_genomes, args=args) if args.bad_genomes != "" else set()
+
+    def process_genome_name(genome_name):
+        if args.trim_names:
+            genome_name = genome_name.split(args.trimmer_char, 1)[0]
+        if (good_genomes is not None and genome_name not in good_genomes) or genome_name in bad_genomes:
+            return None
+        return genome_name
 
     genomes = defaultdict(list)
     for file_name in args.grimm:
         logger.info("Processing file \"{file_name}\"".format(file_name=file_name))
         with open(file_name, "rt") as source:
-            current_genome = None
-            for line in source:
-                line = line.strip()
-                if len(line) == 0 or GRIMMReader.is_comment_string(data_string=line):
-                    continue
-                if GRIMMReader.is_genome_declaration_string(data_string=line):
-                    current_genome = GRIMMReader.parse_genome_declaration_string(data_string=line).name
-                    if args.trim_names:
-                        current_genome = current_genome.split(args.trimmer_char, 1)[0]
-                elif current_genome is not None:
-                    current_chromosome = []
-                    chr_type, blocks = GRIMMReader.parse_data_string(data_string=line)
-                    genomes[current_genome].append((chr_type, blocks))
-    if args.good_genomes != "":
-        good_genomes = args.good_genomes.split(",")
-        if args.trim_names:
-            good_genomes = [genome_name.split(args.trimmer_char, 1)[0] for genome_name in good_genomes]
-        for genome_name in list(genomes.keys()):
-            if genome_name not in good_genomes:
-                del genomes[genome_name]
-    if args.bad_genomes != "":
-        bad_genomes = args.bad_genomes.split(",")
-        if args.trim_names:
-            bad_genomes = [genome_name.split(args.trimmer_char, 1)[0] for genome_name in bad_genomes]
-        for genome_name in list(genomes.keys()):
-            if genome_name in bad_genomes:
-                del genomes[genome_name]
-    if args.filter_duplications:
-        remove_duplications(genomes=genomes)
-    result = get_assembly_points(genomes=genomes)
-    logger.info("Writing output to file \"{file_name}\"".format(file_name=args.output))
-    camsa_io.write_assembly_points(assembly_points=result, destination=args.output, output_setup=args.o_format, delimiter=args.o_delimiter)
-    logger.info("Elapsed time: {el_time}".format(el_time=str(datetime.datetime.now() - start_time)))
+            for genome_name, chr_type, blocks in iter_chromosomes(source=source, process_genome_name=process_genome_name):
+                genomes[genome_name].append((chr_type, blocks))
+    return genomes
+
+
+def iter_converted(args, logger):
+    """ Obtains assembly points from the GRIMM formatted genomes, specified in the parsed arguments, one chromosome at a time
+
+    All the requested filters (good/bad genomes, duplications, indels) are applied within a single pass over the read chromosomes.
 
+    :return: an iterator over lists of assembly points (one list per chromosome)
+    """
+    genomes = read_genomes(args=args, logger=logger)
+    bad_blocks = get_bad_blocks(genomes=genomes, filter_duplications=args.filter_duplications, filter_indels=args.filter_indels)
+    if len(bad_blocks) > 0:
+        logger.info("Filtering out {cnt} duplicated/indel blocks".format(cnt=len(bad_blocks)))
+    return iter_assembly_points(genomes=genomes, bad_blocks=bad_blocks)
 
 
+def convert(args, logger):
+    """ Obtains assembly points from the GRIMM formatted genomes, specified in the parsed arguments
 
+    :return: a list of assembly points
+    """
+    return [ap for chromosome_aps in iter_converted(args=args, logger=logger) for ap in chromosome_aps]
 
 
+def main(argv=None, hand_off=None):
+    """ Runs the converter with the supplied command line arguments
+
+    :param hand_off: (optional) a list, to which a pair of the obtained assembly points and their CAMSA-out formatting is appended
+        (i.e., to be passed to the analysis in the same process), instead of writing the assembly points to the output stream
+        (handed off assembly points are still written to the output stream, if it was explicitly specified, i.e., is not stdout)
+    :return: a list of assembly points, if they were handed off, None otherwise (assembly points are written one chromosome at a time)
+    """
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    start_time = datetime.datetime.now()
+
+    logger = get_script_logger(name="CAMSA.utils.grimm2camsa_points", args=args, description=parser.description)
+    logger.info(parser.format_values())
+    logger.info("Starting the converting process")
+
+    if hand_off is not None:
+        result = convert(args=args, logger=logger)
+        hand_off.append((result, args.o_format))
+        if args.output is not sys.stdout:
+            logger.info("Writing output to file \"{file_name}\"".format(file_name=args.output))
+            camsa_io.write_assembly_points(assembly_points=result, destination=args.output, output_setup=args.o_format, delimiter=args.o_delimiter)
+    else:
+        result = None
+        logger.info("Writing output to file \"{file_name}\"".format(file_name=args.output))
+        writer = camsa_io.AssemblyPointsWriter(destination=args.output, output_setup=args.o_format, delimiter=args.o_delimiter)
+        for chromosome_aps in iter_converted(args=args, logger=logger):
+            writer.write(assembly_points=chromosome_aps)
+    logger.info("Elapsed time: {el_time}".format(el_time=str(datetime.datetime.now() - start_time)))
+    return result
+
+
+if __name__ == "__main__":
+    main()
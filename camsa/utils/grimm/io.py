@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+""" Streaming tokenizer for GRIMM formatted genomes
+
+Follows the same rules, as `bg.grimm.GRIMMReader` does (comment strings, genome declarations and gene order data strings),
+but produces plain tuples, instead of re-tokenizing every line into `bg` objects.
+"""
+
+COMMENT_PREFIX = "#"
+GENOME_DECLARATION_PREFIX = ">"
+LINEAR_CHROMOSOME = "$"
+CIRCULAR_CHROMOSOME = "@"
+
+
+def parse_data_string(data_string):
+    """ Retrieves chromosome type and an oriented sequence of blocks from a GRIMM gene order data string
+
+    Everything after the first chromosome termination sign is ignored.
+
+    :param data_string: a stripped GRIMM gene order data string
+    :return: ("$" | "@", [("+" | "-", block name), ...]) tuple
+    :raises ValueError: if there is no termination sign, no data before it, or an empty block name
+    """
+    linear_terminator_index = data_string.find(LINEAR_CHROMOSOME)
+    circular_terminator_index = data_string.find(CIRCULAR_CHROMOSOME)
+    if linear_terminator_index < 0 and circular_terminator_index < 0:
+        raise ValueError("Invalid data string. No chromosome termination sign ($|@) found.")
+    if linear_terminator_index == 0 or circular_terminator_index == 0:
+        raise ValueError("Invalid data string. No data found before chromosome was terminated.")
+    if linear_terminator_index < 0 or 0 < circular_terminator_index < linear_terminator_index:
+        chr_type, terminator_index = CIRCULAR_CHROMOSOME, circular_terminator_index
+    else:
+        chr_type, terminator_index = LINEAR_CHROMOSOME, linear_terminator_index
+    blocks = []
+    append = blocks.append
+    for block in data_string[:terminator_index].split():
+        sign = block[0]
+        if sign == "-" or sign == "+":
+            if len(block) == 1:
+                raise ValueError("Empty block name definition")
+            append((sign, block[1:]))
+        else:
+            append(("+", block))
+    return chr_type, blocks
+
+
+def iter_chromosomes(source, process_genome_name=None):
+    """ Streams chromosomes of GRIMM formatted genomes
+
+    Data strings, that precede the first genome declaration, are ignored.
+
+    :param source: an iterable over lines of GRIMM formatted data
+    :param process_genome_name: (optional) a function, that maps every declared genome name to the one to be reported,
+        or to None, in which case data strings of the genome are skipped without parsing
+    :return: an iterator over (genome name, chromosome type, [(sign, block name), ...]) tuples
+    """
+    current_genome = None
+    for line in source:
+        line = line.strip()
+        if len(line) == 0 or line[0] == COMMENT_PREFIX:
+            continue
+        if line[0] == GENOME_DECLARATION_PREFIX and len(line) > 1:
+            current_genome = line[1:]
+            if process_genome_name is not None:
+                current_genome = process_genome_name(current_genome)
+        elif current_genome is not None:
+            chr_type, blocks = parse_data_string(data_string=line)
+            yield current_genome, chr_type, blocks
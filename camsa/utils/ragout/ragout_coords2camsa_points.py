@@ -15,6 +15,7 @@ import camsa
 import camsa.utils.ragout.io as ragout_io
 from camsa.core.data_structures import AssemblyPoint
 import camsa.core.io as camsa_io
+from camsa.utils.shared import get_script_logger
 from camsa.utils.ragout.shared import filter_indels, filter_duplications
 from camsa.utils.ragout.shared import filter_blocks_by_good_genomes, filter_blocks_by_bad_genomes, get_all_genomes_from_blocks
 
@@ -27,7 +28,7 @@ def get_assembly_points(seq_of_blocks):
     return result
 
 
-if __name__ == "__main__":
+def get_parser():
     full_description = camsa.full_description_template.format(
         names=camsa.CAMSA_AUTHORS,
         affiliations=camsa.AFFILIATIONS,
@@ -63,20 +64,14 @@ if __name__ == "__main__":
                         help="Logging level for the converter.\nDEFAULT: {info}".format(info=logging.INFO))
     parser.add_argument("--c-logging-formatter-entry",
                         help="Format string for python logger.")
-    args = parser.parse_args()
+    return parser
 
-    start_time = datetime.datetime.now()
 
-    logger = logging.getLogger("CAMSA.utils.ragout_coords2camsa_points")
-    ch = logging.StreamHandler()
-    ch.setLevel(args.c_logging_level)
-    logger.setLevel(args.c_logging_level)
-    logger.addHandler(ch)
-    logger.info(full_description)
-    logger.info(parser.format_values())
-    ch.setFormatter(logging.Formatter(args.c_logging_formatter_entry))
-    logger.info("Starting the converting process")
+def convert(args, logger):
+    """ Obtains assembly points from the Ragout coords file, specified in the parsed arguments
 
+    :return: a list of assembly points
+    """
     sequences_by_ids, blocks_by_ids = ragout_io.read_from_file(path=args.ragout_coords, silent_fail=False, delimiter="\t")
     all_genomes = get_all_genomes_from_blocks(blocks_as_ids=blocks_by_ids)
     if args.good_genomes != "":
@@ -119,6 +114,35 @@ if __name__ == "__main__":
             seq_of_blocks = blocks_by_seq_ids[seq_id]
             seq_aps = get_assembly_points(seq_of_blocks=seq_of_blocks)
             aps.extend(seq_aps)
-    logger.info("Writing output to file \"{file_name}\"".format(file_name=args.output))
-    camsa_io.write_assembly_points(assembly_points=aps, destination=args.output, output_setup=args.o_format, delimiter=args.o_delimiter)
+    return aps
+
+
+def main(argv=None, hand_off=None):
+    """ Runs the converter with the supplied command line arguments
+
+    :param hand_off: (optional) a list, to which a pair of the obtained assembly points and their CAMSA-out formatting is appended
+        (i.e., to be passed to the analysis in the same process), instead of writing the assembly points to the output stream
+        (handed off assembly points are still written to the output stream, if it was explicitly specified, i.e., is not stdout)
+    :return: a list of assembly points
+    """
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    start_time = datetime.datetime.now()
+
+    logger = get_script_logger(name="CAMSA.utils.ragout_coords2camsa_points", args=args, description=parser.description)
+    logger.info(parser.format_values())
+    logger.info("Starting the converting process")
+
+    aps = convert(args=args, logger=logger)
+    if hand_off is not None:
+        hand_off.append((aps, args.o_format))
+    if hand_off is None or args.output is not sys.stdout:
+        logger.info("Writing output to file \"{file_name}\"".format(file_name=args.output))
+        camsa_io.write_assembly_points(assembly_points=aps, destination=args.output, output_setup=args.o_format, delimiter=args.o_delimiter)
     logger.info("Elapsed time: {el_time}".format(el_time=str(datetime.datetime.now() - start_time)))
+    return aps
+
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,13 @@ import sys
 from collections import defaultdict
 
 import configargparse
-from Bio import SeqIO
-from Bio.SeqRecord import SeqRecord
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
 import camsa
 import camsa.utils.ragout.io as ragout_io
+from camsa.utils.fasta.io import WrappedFastaWriter, open_fasta, get_record_title
 from camsa.utils.ragout.shared import filter_indels, filter_duplications
 from camsa.utils.ragout.shared import filter_blocks_by_good_genomes, filter_blocks_by_bad_genomes, get_all_genomes_from_blocks
 
@@ -40,6 +39,8 @@ if __name__ == "__main__":
     parser.add_argument("--good-genomes", type=str, default="", help="A coma separated list of genome names, to be processed and conversed.\nDEFAULT: \"\" (i.e., all genomes are good)")
     parser.add_argument("--bad-genomes", type=str, default="", help="A coma separated list of genome names, to be excluded from processing and conversion.\nDEFAULT: \"\" (i.e., no genomes are bad)")
     parser.add_argument("fasta", nargs="+")
+    parser.add_argument("--c-threads", type=int, default=4,
+                        help="A number of threads, that decompress blocks of BGZF compressed fasta files in parallel\nDEFAULT: 4")
     parser.add_argument("-o", "--output", type=configargparse.FileType("wt"), default=sys.stdout)
     parser.add_argument("--o-genomes", dest="ref_genomes", type=str, default="a string of coma separated names of genomes, who will")
     parser.add_argument("--c-logging-level", dest="c_logging_level", default=logging.INFO, type=int,
@@ -118,23 +119,20 @@ if __name__ == "__main__":
         blocks_by_seq_ids[block.parent_seq.seq_name].append(block)
 
     processed = set()
+    writer = WrappedFastaWriter(destination=args.output)
     for f in args.fasta:
         logger.info("Processing fasta file: \"{file_name}\"".format(file_name=f))
-        cnt = 0
-        for record in SeqIO.parse(f, "fasta"):
-            seq_id = record.id
+        fasta = open_fasta(source=f, threads=args.c_threads)
+        for seq_id in fasta.names():
             if seq_id not in blocks_by_seq_ids:
                 continue
             current_blocks = blocks_by_seq_ids[seq_id]
             current_blocks = [block for block in current_blocks if block.name not in processed]
             for block in current_blocks:
-                if block.strand == "+":
-                    out_seq = record.seq[block.start: block.end]
-                else:
-                    out_seq = record.seq[block.start: block.end].reverse_complement()
-                out_record = SeqRecord(seq=out_seq, id=str(block.name), description=block.annotation_name)
-                SeqIO.write(sequences=out_record, handle=args.output, format="fasta")
+                out_seq = fasta.fetch(name=seq_id, start=block.start, end=block.end, strand="+" if block.strand == "+" else "-")
+                writer.write_record(title=get_record_title(record_id=str(block.name), description=block.annotation_name), pieces=[out_seq])
                 processed.add(block.name)
+        fasta.close()
 
     logger.info("All done!")
     end_time = datetime.datetime.now()
@@ -1,7 +1,77 @@
 # -*- coding: utf-8 -*-
+import logging
+import timeit
 
 
 def get_time_string(start, end):
     hours, rem = divmod(end - start, 3600)
     minutes, seconds = divmod(rem, 60)
     return "{:0>2}:{:0>2}:{:05.2f}".format(int(hours), int(minutes), seconds)
+
+
+def get_script_logger(name, args, description=None):
+    """ Sets up a stderr logger for a CAMSA script
+
+    Handlers are set up only once, so that a script can be run several times in the same process (i.e., as stages of the `camsa` pipeline).
+
+    :param args: parsed arguments with "c_logging_level" and "c_logging_formatter_entry" values
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(args.c_logging_level)
+    if len(logger.handlers) == 0:
+        ch = logging.StreamHandler()
+        logger.addHandler(ch)
+    for handler in logger.handlers:
+        handler.setLevel(args.c_logging_level)
+        handler.setFormatter(logging.Formatter(args.c_logging_formatter_entry))
+    if description is not None:
+        logger.info(description)
+    return logger
+
+
+class HotPathLogger(object):
+    """ Logging for tight per-record loops of CAMSA utils
+
+    Debug messages are formatted only if the debug level is enabled for the wrapped logger (checked once, at creation),
+    and instead of a message per record, the number of processed records and the throughput (records/s) are reported periodically.
+
+    In the tightest loops, the `is_debug` attribute shall be checked before even calling `debug`.
+    """
+
+    def __init__(self, logger, records="records", report_every=1000000, level=logging.INFO):
+        """
+        :param logger: a `logging.Logger` object messages are passed to
+        :param records: a name of processed records, used in progress messages
+        :param report_every: a number of processed records between consecutive progress messages
+        :param level: a logging level of progress messages
+        """
+        self.logger = logger
+        self.is_debug = logger.isEnabledFor(logging.DEBUG)
+        self.records = records
+        self.report_every = report_every
+        self.level = level
+        self.cnt = 0
+        self.next_report_cnt = report_every
+        self.start = timeit.default_timer()
+
+    def debug(self, template, **kwargs):
+        if self.is_debug:
+            self.logger.debug(template.format(**kwargs))
+
+    def tick(self, cnt=1):
+        """ Accounts for processed records, reporting the progress, if another `report_every` of them were processed """
+        self.cnt += cnt
+        if self.cnt >= self.next_report_cnt:
+            self.next_report_cnt = self.cnt + self.report_every
+            self.report()
+
+    def report(self, message="Processed"):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        elapsed = timeit.default_timer() - self.start
+        rate = self.cnt / elapsed if elapsed > 0 else 0.0
+        self.logger.log(self.level, "{message} {cnt} {records} in {time} ({rate:.0f} {records}/s)"
+                                    "".format(message=message, cnt=self.cnt, records=self.records, time=get_time_string(start=0, end=elapsed), rate=rate))
+
+    def finish(self):
+        self.report(message="Finished processing")
@@ -18,13 +18,14 @@ setup(
     packages=['', 'camsa', 'camsa.core', 'camsa.utils', 'camsa.utils.camsa', 'camsa.utils.fasta', 'camsa.utils.agp', 'camsa.utils.ragout', 'camsa.utils.grimm', 'camsa.utils.agouti'],
     include_package_data=True,
     install_requires=['six>=1.10.0', 'networkx>=2.1', 'Jinja2>=2.8', 'enum-compat', 'blist>=1.3.6', 'ConfigArgParse>=0.10.0',
-                      'biopython>=1.67', 'bg>=1.8.1', 'more_itertools'],
-    scripts=["camsa/run_camsa.py",
+                      'biopython>=1.67'],
+    scripts=["camsa/run_camsa.py", "camsa/run_camsa_service.py", "camsa/run_camsa_shards.py",
              "camsa/utils/ragout/ragout_coords2fasta.py", "camsa/utils/ragout/ragout_coords_coverage.py", "camsa/utils/ragout/ragout_coords2camsa_seqi.py", "camsa/utils/ragout/ragout_coords2camsa_points.py",
              "camsa/utils/grimm/grimm2camsa_points.py",
              "camsa/utils/fasta/fasta2camsa_points.py", "camsa/utils/fasta/fasta2camsa_seqi.py", "camsa/utils/fasta/camsa_points2fasta.py",
              "camsa/utils/agp/agp2camsa_points.py",
              "camsa/utils/agouti/agouti2camsa_points.py"],
+    entry_points={"console_scripts": ["camsa=camsa.cli:main"]},
     classifiers=[
         'Development Status :: 4 - Beta',
         'License :: OSI Approved :: MIT License',
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+import camsa
+from camsa import run_camsa, run_camsa_shards
+from camsa.core import io as camsa_io
+from camsa.core.distributed import shard_points, iter_points
+from camsa.core.out_of_core import DisjointSets
+from tests.core.test_out_of_core import read_report
+
+EXAMPLE_DIR = os.path.join(camsa.root_dir, "examples", "gage", "exp1")
+QUIET = ["--c-logging-level", "40"]
+
+
+class ShardedAnalysisTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.points = sorted(glob.glob(os.path.join(EXAMPLE_DIR, "*.camsa.points")))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def run_single(self):
+        self.assertEqual(0, run_camsa.main(argv=self.points + ["-o", self.path("single")] + QUIET))
+        return read_report(output_dir=self.path("single"))
+
+    def test_local_run_matches_single_run(self):
+        expected = self.run_single()
+        self.assertEqual(0, run_camsa_shards.main(argv=["local"] + self.points + ["-o", self.path("sharded"), "--s-shards", "3"] + QUIET))
+        self.assertEqual(expected, read_report(output_dir=self.path("sharded")))
+
+    def test_shard_and_reduce_commands_match_single_run(self):
+        expected = self.run_single()
+        self.assertEqual(0, run_camsa_shards.main(argv=["shard"] + self.points + ["-o", self.path("shards"), "--s-shards", "2"] + QUIET))
+        shards_dirs = []
+        for file_name in sorted(glob.glob(self.path("shards", "*.camsa.points"))):
+            shard_dir = file_name[:-len(".camsa.points")]
+            self.assertEqual(0, run_camsa.main(argv=[file_name, "-o", shard_dir] + QUIET))
+            shards_dirs.append(shard_dir)
+        self.assertEqual(0, run_camsa_shards.main(argv=["reduce"] + shards_dirs + ["-o", self.path("reduced")] + QUIET))
+        self.assertEqual(expected, read_report(output_dir=self.path("reduced")))
+
+    def test_shards_are_self_contained(self):
+        file_names, counts = shard_points(points=self.points, shards_cnt=4, output_dir=self.path("shards"))
+        all_points = list(iter_points(points=self.points))
+        self.assertEqual(len(all_points), sum(counts))
+        shards_by_seqs = {}
+        for shard_id, file_name in enumerate(file_names):
+            with open(file_name, "rt") as source:
+                shard = list(camsa_io.iter_pairs(source=source))
+            self.assertEqual(counts[shard_id], len(shard))
+            for ap in shard:
+                for seq in (ap.seq1, ap.seq2):
+                    self.assertEqual(shard_id, shards_by_seqs.setdefault(seq, shard_id))
+        disjoint_sets = DisjointSets()
+        for ap in all_points:
+            disjoint_sets.union(ap.seq1, ap.seq2)
+        for ap in all_points:
+            self.assertEqual(disjoint_sets.get_component(ap.seq1) % 4, shards_by_seqs[ap.seq1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import glob
+import os
+import random
+import re
+import shutil
+import tempfile
+import unittest
+
+import camsa
+from camsa import run_camsa
+from camsa.core import out_of_core
+
+EXAMPLE_DIR = os.path.join(camsa.root_dir, "examples", "gage", "exp1")
+ORIGINAL_ID_PATTERN = re.compile(r"\bor_\d+\b")
+
+
+def read_report(output_dir):
+    """ Rows of all the assembly points files of the report, with ids of original assembly points replaced by their content
+
+    Original assembly points are numbered differently by the in-memory and out-of-core analyses, and files are filled in a different order,
+    so rows are sorted, and lists of ids in them are sorted as well.
+
+    :return: a dict of (header, sorted rows) pairs by paths of the files, relative to the output directory
+    """
+    originals = {}
+    with open(os.path.join(output_dir, "comparative", "original.camsa.points"), "rt") as source:
+        header = source.readline().rstrip("\n").split("\t")
+        for line in source:
+            row = line.rstrip("\n").split("\t")
+            originals[row[header.index("self_id")]] = "|".join(value for field, value in zip(header, row) if field != "self_id")
+    result = {}
+    for dir_name in ["comparative", "merged"]:
+        for root, _, files in os.walk(os.path.join(output_dir, dir_name)):
+            for name in files:
+                file_name = os.path.join(root, name)
+                with open(file_name, "rt") as source:
+                    lines = source.read().splitlines()
+                rows = []
+                for line in lines[1:]:
+                    line = ORIGINAL_ID_PATTERN.sub(lambda match: originals[match.group(0)], line)
+                    rows.append("\t".join(",".join(sorted(value.split(","))) for value in line.split("\t")))
+                result[os.path.relpath(file_name, output_dir)] = (lines[0], sorted(rows))
+    return result
+
+
+class OutOfCoreAnalysisTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.points = sorted(glob.glob(os.path.join(EXAMPLE_DIR, "*.camsa.points")))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_camsa(self, output_dir, extra_args):
+        output_dir = os.path.join(self.directory, output_dir)
+        self.assertEqual(0, run_camsa.main(argv=self.points + ["-o", output_dir, "--c-logging-level", "40"] + extra_args))
+        return output_dir
+
+    def test_matches_in_memory_analysis(self):
+        expected = read_report(output_dir=self.run_camsa(output_dir="in_memory", extra_args=[]))
+        self.assertGreater(len(expected["merged/merged.camsa.points"][1]), 0)
+        for strategy in ["maximal-matching", "greedy"]:
+            if strategy != "maximal-matching":
+                expected = read_report(output_dir=self.run_camsa(output_dir="in_memory_" + strategy, extra_args=["--c-merging-strategy", strategy]))
+            # a limit of a few records makes for many sorted runs and buckets
+            result = read_report(output_dir=self.run_camsa(output_dir="out_of_core_" + strategy,
+                                                           extra_args=["--c-memory-limit", "0.005", "--c-merging-strategy", strategy]))
+            self.assertEqual(sorted(expected.keys()), sorted(result.keys()))
+            for file_name in expected:
+                self.assertEqual(expected[file_name], result[file_name], file_name)
+
+    def test_matches_in_memory_analysis_with_few_open_subgroups_files(self):
+        expected = read_report(output_dir=self.run_camsa(output_dir="in_memory", extra_args=[]))
+        original_limit = out_of_core.MAX_OPEN_SUBGROUPS_FILES
+        out_of_core.MAX_OPEN_SUBGROUPS_FILES = 2
+        try:
+            result = read_report(output_dir=self.run_camsa(output_dir="out_of_core", extra_args=["--c-memory-limit", "0.005"]))
+        finally:
+            out_of_core.MAX_OPEN_SUBGROUPS_FILES = original_limit
+        self.assertEqual(expected, result)
+
+    def test_no_temporary_files_are_left(self):
+        output_dir = self.run_camsa(output_dir="out_of_core", extra_args=["--c-memory-limit", "0.005"])
+        self.assertEqual([], [name for name in os.listdir(output_dir) if name.startswith("camsa_tmp_")])
+
+
+class SortedRunsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_k_way_merge_of_sorted_runs(self):
+        rnd = random.Random(1)
+        records = []
+        for serial in range(500):
+            seq1, seq2 = sorted(rnd.sample(["ctg{cnt}".format(cnt=cnt) for cnt in range(20)], 2))
+            records.append((seq1, seq2, rnd.choice("+-?"), rnd.choice("+-?"), rnd.choice("abc"), serial, rnd.choice([1.0, 0.75, 0.1]),
+                            rnd.choice(["?", 10.0, -5.5]), rnd.random() < 0.5))
+        for buffer_size in [1, 7, 500, 1000]:
+            runs = out_of_core.spill_sorted_runs(records=iter(records), buffer_size=buffer_size, tmp_dir=self.directory)
+            self.assertEqual((len(records) + buffer_size - 1) // buffer_size, len(runs))
+            result = [(key, list(group)) for key, group in out_of_core.iter_collapsed_records(runs=runs)]
+            expected = {}
+            for record in records:
+                expected.setdefault(record[:4], []).append(record)
+            self.assertEqual(sorted(expected), [key for key, _ in result])
+            for key, group in result:
+                self.assertEqual(sorted(expected[key]), group)
+            for run in runs:
+                os.remove(run)
+
+
+class DisjointSetsTestCase(unittest.TestCase):
+    def test_components(self):
+        rnd = random.Random(1)
+        items = list(range(200))
+        edges = [tuple(rnd.sample(items, 2)) for _ in range(150)]
+        disjoint_sets = out_of_core.DisjointSets()
+        for item1, item2 in edges:
+            disjoint_sets.union(item1, item2)
+        # a reference by repeated relabeling
+        labels = {item: item for item in items}
+        changed = True
+        while changed:
+            changed = False
+            for item1, item2 in edges:
+                label = min(labels[item1], labels[item2])
+                if labels[item1] != label or labels[item2] != label:
+                    labels[item1] = labels[item2] = label
+                    changed = True
+        connected = [item for item in items if item in disjoint_sets.indexes]
+        for item1 in connected:
+            for item2 in connected:
+                self.assertEqual(labels[item1] == labels[item2], disjoint_sets.get_component(item1) == disjoint_sets.get_component(item2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from six.moves.urllib.error import HTTPError
+from six.moves.urllib.request import urlopen
+
+import camsa
+from camsa.core import service
+from camsa.core.data_structures import UNORIENTED_ID_PREFIX
+from camsa.core.state import AnalysisState, merged_assembly_to_dicts
+
+EXAMPLE_DIR = os.path.join(camsa.root_dir, "examples", "gage", "exp1")
+
+
+class DatasetsCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.points = []
+        for source in ["sga", "sspace", "soap2"]:
+            file_name = os.path.join(self.directory, source + ".camsa.points")
+            shutil.copy(os.path.join(EXAMPLE_DIR, source + ".camsa.points"), file_name)
+            self.points.append(file_name)
+        self.loads = []
+        self.original_loader = service.AnalysisState.from_points_files
+
+        def from_points_files(points, **kwargs):
+            self.loads.append(tuple(points))
+            time.sleep(0.05)
+            return AnalysisState.from_points_files(points=points, **kwargs)
+
+        service.AnalysisState = type("AnalysisState", (object,), {"from_points_files": staticmethod(from_points_files)})
+
+    def tearDown(self):
+        service.AnalysisState = AnalysisState
+        shutil.rmtree(self.directory)
+
+    def test_dataset_is_loaded_once(self):
+        cache = service.DatasetsCache()
+        state = cache.get(points=self.points)
+        self.assertIs(state, cache.get(points=list(reversed(self.points))))
+        self.assertEqual(1, len(self.loads))
+        self.assertEqual(["sga", "soap2", "sspace"], [os.path.basename(path).split(".")[0] for path in self.loads[0]])
+
+    def test_concurrent_queries_share_a_single_loading(self):
+        cache = service.DatasetsCache()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(points=self.points))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(self.loads))
+        self.assertEqual(4, len(results))
+        self.assertTrue(all(state is results[0] for state in results))
+
+    def test_modified_file_is_reloaded(self):
+        cache = service.DatasetsCache()
+        state = cache.get(points=self.points)
+        modification_time = os.path.getmtime(self.points[0]) + 10
+        os.utime(self.points[0], (modification_time, modification_time))
+        self.assertIsNot(state, cache.get(points=self.points))
+        self.assertEqual(2, len(self.loads))
+        self.assertEqual(1, len(cache.loaded_datasets()))
+
+    def test_least_recently_used_dataset_is_evicted(self):
+        cache = service.DatasetsCache(capacity=2)
+        first = cache.get(points=self.points[:1])
+        cache.get(points=self.points[1:2])
+        cache.get(points=self.points[:1])
+        cache.get(points=self.points[2:])
+        self.assertEqual(3, len(self.loads))
+        self.assertEqual([self.points[:1], self.points[2:]], [dataset["points"] for dataset in cache.loaded_datasets()])
+        self.assertIs(first, cache.get(points=self.points[:1]))
+        self.assertEqual(3, len(self.loads))
+
+    def test_idle_dataset_is_evicted(self):
+        cache = service.DatasetsCache(idle_timeout=60)
+        cache.get(points=self.points)
+        cache.evict_idle(now=time.time() + 120)
+        self.assertEqual([], cache.loaded_datasets())
+
+    def test_loading_error_is_not_cached(self):
+        cache = service.DatasetsCache()
+        with open(self.points[0], "at") as destination:
+            destination.write("broken\tline\n")
+        self.assertRaises(Exception, cache.get, points=self.points)
+        self.assertEqual({}, cache.loading)
+        self.assertEqual([], cache.loaded_datasets())
+
+
+class ServiceTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.points = ",".join(os.path.join(EXAMPLE_DIR, source + ".camsa.points") for source in ["sga", "sspace", "soap2"])
+        cls.server = service.CAMSAServer(("127.0.0.1", 0), cache=service.DatasetsCache())
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def query(self, path):
+        url = "http://127.0.0.1:{port}{path}".format(port=self.server.server_address[1], path=path)
+        try:
+            response = urlopen(url)
+            status = response.getcode()
+        except HTTPError as exc:
+            response = exc
+            status = exc.code
+        try:
+            return status, json.loads(response.read().decode("utf-8"))
+        finally:
+            response.close()
+
+    def test_merge(self):
+        status, result = self.query("/merge?points={points}".format(points=self.points))
+        self.assertEqual(200, status)
+        state = AnalysisState.from_points_files(points=self.points.split(","))
+        self.assertEqual(merged_assembly_to_dicts(merged_assembly=state.get_merged_assembly()), result["aps"])
+
+    def test_merge_of_sources_subset(self):
+        status, result = self.query("/merge?points={points}&sources=sga,sspace".format(points=self.points))
+        self.assertEqual(200, status)
+        self.assertGreater(len(result["aps"]), 0)
+        subset_state = AnalysisState.from_points_files(points=self.points.split(",")[:2])
+        self.assertEqual(sorted((ap["seq1"], ap["seq2"], ap["cw"], ap["sources"])
+                                for ap in merged_assembly_to_dicts(merged_assembly=subset_state.get_merged_assembly())),
+                         sorted((ap["seq1"], ap["seq2"], ap["cw"], ap["sources"]) for ap in result["aps"]))
+        for ap in result["aps"]:
+            self.assertNotIn("soap2", ap["sources"])
+
+    def test_conflicts(self):
+        state = self.server.cache.get(points=self.points.split(","))
+        seq = state.merged_assembly_points_by_ids[0].seq1
+        status, result = self.query("/conflicts?points={points}&seq={seq}".format(points=self.points, seq=seq))
+        self.assertEqual(200, status)
+        self.assertEqual(len(state.get_conflicts_for_seq(seq=seq)), len(result["aps"]))
+        self.assertIn("out_conflicted", result["aps"][0])
+
+    def test_subgroups(self):
+        status, result = self.query("/subgroups?points={points}&oriented=0&sources=sga".format(points=self.points))
+        self.assertEqual(200, status)
+        self.assertEqual([["sga"]], [subgroup["sources"] for subgroup in result["subgroups"]])
+        self.assertTrue(all(ap_id.startswith(UNORIENTED_ID_PREFIX) for ap_id in result["subgroups"][0]["aps"]))
+
+    def test_datasets(self):
+        self.query("/merge?points={points}".format(points=self.points))
+        status, result = self.query("/datasets")
+        self.assertEqual(200, status)
+        self.assertIn(sorted(self.points.split(",")), [dataset["points"] for dataset in result["datasets"]])
+
+    def test_errors(self):
+        self.assertEqual(404, self.query("/unknown")[0])
+        self.assertEqual(400, self.query("/merge")[0])
+        self.assertEqual(404, self.query("/merge?points=missing.camsa.points")[0])
+        status, result = self.query("/merge?points={points}&sources=unknown".format(points=self.points))
+        self.assertEqual(400, status)
+        self.assertIn("unknown", result["error"])
+        self.assertEqual(400, self.query("/merge?points={points}&min_cw=high".format(points=self.points))[0])
+        self.assertEqual(400, self.query("/conflicts?points={points}".format(points=self.points))[0])
+
+    def test_internal_error(self):
+        def failing_handler(cache, query):
+            raise RuntimeError("failure")
+
+        original_handler = service.HANDLERS["/datasets"]
+        service.HANDLERS["/datasets"] = failing_handler
+        original_level = self.server.logger.level
+        self.server.logger.setLevel(50)
+        try:
+            status, result = self.query("/datasets")
+        finally:
+            service.HANDLERS["/datasets"] = original_handler
+            self.server.logger.setLevel(original_level)
+        self.assertEqual(500, status)
+        self.assertIn("failure", result["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+import camsa
+from camsa.core.state import AnalysisState, merged_assembly_to_dicts
+
+EXAMPLE_DIR = os.path.join(camsa.root_dir, "examples", "gage", "exp1")
+SOURCES = ["gam-ngs", "metassembler", "scaffmatch", "sga", "soap2", "sspace"]
+
+
+def get_points(sources):
+    return [os.path.join(EXAMPLE_DIR, source + ".camsa.points") for source in sources]
+
+
+def get_merged_entries(merged_assembly):
+    return sorted((entry["seq1"], entry["seq1_or"], entry["seq2"], entry["seq2_or"], entry["cw"], tuple(entry["sources"]))
+                  for entry in merged_assembly_to_dicts(merged_assembly=merged_assembly))
+
+
+def get_subgroups_entries(subgroups):
+    return sorted((tuple(sorted(group.name)), tuple(sorted((ap.seq1, ap.seq1_or, ap.seq2, ap.seq2_or) for ap in group.aps)))
+                  for group in subgroups)
+
+
+class AnalysisStateTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.state = AnalysisState.from_points_files(points=get_points(sources=SOURCES))
+
+    def test_sources(self):
+        self.assertEqual(SOURCES, self.state.sources)
+
+    def test_merged_assembly_of_all_sources(self):
+        merged_assembly = self.state.get_merged_assembly()
+        self.assertGreater(len(merged_assembly), 0)
+        self.assertEqual(get_merged_entries(merged_assembly), get_merged_entries(self.state.get_merged_assembly(sources=SOURCES)))
+
+    def test_merged_assembly_of_sources_subsets(self):
+        for sources in [["sga", "sspace"], ["soap2"], ["gam-ngs", "metassembler", "scaffmatch"]]:
+            subset_state = AnalysisState.from_points_files(points=get_points(sources=sources))
+            for min_cw in [0.0, 1.5]:
+                expected = get_merged_entries(subset_state.get_merged_assembly(min_cw=min_cw))
+                result = get_merged_entries(self.state.get_merged_assembly(sources=sources, min_cw=min_cw))
+                self.assertEqual(expected, result)
+                for _, _, _, _, _, ap_sources in result:
+                    self.assertTrue(set(ap_sources).issubset(sources))
+
+    def test_queries_do_not_alter_the_state(self):
+        before = [(ap.cw, tuple(ap.sources), ap.participates_in_merged) for ap in self.state.merged_assembly_points_by_ids]
+        self.state.get_merged_assembly(sources=["sga", "sspace"])
+        self.state.get_subgroups(sources=["sga"])
+        after = [(ap.cw, tuple(ap.sources), ap.participates_in_merged) for ap in self.state.merged_assembly_points_by_ids]
+        self.assertEqual(before, after)
+
+    def test_subgroups_of_sources_subsets(self):
+        for oriented in [True, False]:
+            subset_state = AnalysisState.from_points_files(points=get_points(sources=["sga", "sspace", "soap2"]))
+            self.assertEqual(get_subgroups_entries(subset_state.get_subgroups(oriented=oriented)),
+                             get_subgroups_entries(self.state.get_subgroups(oriented=oriented, sources=["sga", "sspace", "soap2"])))
+
+    def test_conflicts_for_seq(self):
+        seq = self.state.merged_assembly_points_by_ids[0].seq1
+        result = self.state.get_conflicts_for_seq(seq=seq)
+        self.assertGreater(len(result), 0)
+        for ap, conflicts in result:
+            self.assertIn(seq, (ap.seq1, ap.seq2))
+            self.assertEqual({"in_conflicted", "in_semi_conflicted", "out_conflicted", "out_semi_conflicted"}, set(conflicts.keys()))
+        for ap, _ in self.state.get_conflicts_for_seq(seq=seq, sources=["sga"]):
+            self.assertIn("sga", ap.sources)
+
+
+if __name__ == "__main__":
+    unittest.main()
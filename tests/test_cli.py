@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+import camsa
+from camsa import cli
+
+AGP_FILE = os.path.join(camsa.root_dir, "examples", "utils", "agp", "data", "scaffold_from_contig_wgs.agp")
+POINTS_FILE = os.path.join(camsa.root_dir, "examples", "gage", "exp1", "sga.camsa.points")
+QUIET = ["--c-logging-level", "40"]
+
+
+class PipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def read(self, name):
+        with open(self.path(name), "rt") as source:
+            return source.read()
+
+    def test_split_pipeline(self):
+        self.assertEqual([["convert", "agp", "a.agp"], ["run", "b.points"]], cli.split_pipeline(["convert", "agp", "a.agp", "+", "run", "b.points"]))
+        self.assertRaises(cli.PipelineError, cli.split_pipeline, ["convert", "unknown", "a"])
+        self.assertRaises(cli.PipelineError, cli.split_pipeline, ["run", "a", "+", "run", "b"])
+        self.assertRaises(cli.PipelineError, cli.split_pipeline, ["run", "a", "+"])
+
+    def test_handed_off_points_are_written_to_explicit_output(self):
+        self.assertEqual(0, cli.main(["convert", "agp", AGP_FILE, "--origin", "agp", "-o", self.path("standalone.points")] + QUIET))
+        status = cli.main(["convert", "agp", AGP_FILE, "--origin", "agp", "-o", self.path("handed_off.points")] + QUIET +
+                          ["+", "run", POINTS_FILE, "-o", self.path("analysis")] + QUIET)
+        self.assertEqual(0, status)
+        self.assertGreater(len(self.read("standalone.points").splitlines()), 1)
+        self.assertEqual(self.read("standalone.points"), self.read("handed_off.points"))
+        self.assertIn("agp\t", self.read(os.path.join("analysis", "comparative", "original.camsa.points")))
+
+    def test_out_of_core_analysis_does_not_stop_the_pipeline(self):
+        status = cli.main(["run", POINTS_FILE, "-o", self.path("analysis"), "--c-memory-limit", "1"] + QUIET +
+                          ["+", "convert", "agp", AGP_FILE, "-o", self.path("converted.points")] + QUIET)
+        self.assertEqual(0, status)
+        self.assertTrue(os.path.exists(self.path(os.path.join("analysis", "merged", "merged.camsa.points"))))
+        self.assertGreater(len(self.read("converted.points").splitlines()), 1)
+
+    def test_failed_analysis_stops_the_pipeline(self):
+        status = cli.main(["convert", "agp", AGP_FILE] + QUIET +
+                          ["+", "run", POINTS_FILE, "-o", self.path("analysis"), "--c-memory-limit", "1", "--c-logging-level", "50"] +
+                          ["+", "convert", "agp", AGP_FILE, "-o", self.path("converted.points")] + QUIET)
+        self.assertEqual(1, status)
+        self.assertFalse(os.path.exists(self.path("converted.points")))
+
+
+if __name__ == "__main__":
+    unittest.main()
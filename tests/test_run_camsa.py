@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+import camsa
+from camsa import run_camsa
+from camsa.core.incremental import AnalysisStateSnapshot, STATE_FILE_NAME, INPUT_CONFIG_FILE_NAME
+
+EXAMPLE_DIR = os.path.join(camsa.root_dir, "examples", "gage", "exp1")
+QUIET = ["--c-logging-level", "40"]
+
+
+def get_points(source):
+    return os.path.join(EXAMPLE_DIR, source + ".camsa.points")
+
+
+def read(file_name):
+    with open(file_name, "rb") as source:
+        return source.read()
+
+
+class IncrementalReportInputTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def run_camsa(self, sources, output_dir, previous_state=None):
+        argv = [get_points(source) for source in sources] + ["-o", self.path(output_dir)] + QUIET
+        if previous_state is not None:
+            argv += ["--i-previous-state", self.path(previous_state)]
+        self.assertEqual(0, run_camsa.main(argv=argv))
+
+    def get_input_files(self, output_dir):
+        return sorted(name for name in os.listdir(self.path(output_dir, "input")) if name != INPUT_CONFIG_FILE_NAME)
+
+    def test_previous_input_files_are_carried_over(self):
+        self.run_camsa(sources=["sga", "soap2"], output_dir="first")
+        self.run_camsa(sources=["sspace"], output_dir="second", previous_state="first")
+        self.run_camsa(sources=["metassembler"], output_dir="third", previous_state="second")
+        expected = ["metassembler.camsa.points", "sga.camsa.points", "soap2.camsa.points", "sspace.camsa.points"]
+        self.assertEqual(expected, self.get_input_files(output_dir="third"))
+        for name in expected:
+            self.assertEqual(read(os.path.join(EXAMPLE_DIR, name)), read(self.path("third", "input", name)))
+        self.assertEqual(expected, sorted(AnalysisStateSnapshot.load(file_name=self.path("third", STATE_FILE_NAME)).input_files))
+
+    def test_in_place_update_with_a_same_named_file(self):
+        self.run_camsa(sources=["sga"], output_dir="analysis")
+        self.run_camsa(sources=["sga"], output_dir="analysis", previous_state="analysis")
+        self.assertEqual(["previous.sga.camsa.points", "sga.camsa.points"], self.get_input_files(output_dir="analysis"))
+        self.assertEqual(read(get_points("sga")), read(self.path("analysis", "input", "previous.sga.camsa.points")))
+
+    def test_missing_previous_input_files_are_written_from_the_state(self):
+        self.run_camsa(sources=["sga", "soap2"], output_dir="first")
+        shutil.rmtree(self.path("first", "input"))
+        self.run_camsa(sources=["sspace"], output_dir="second", previous_state="first")
+        self.assertEqual(["sga.camsa.points", "soap2.camsa.points", "sspace.camsa.points"], self.get_input_files(output_dir="second"))
+        for source in ["sga", "soap2"]:
+            expected_cnt = len(read(get_points(source)).splitlines())
+            self.assertEqual(expected_cnt, len(read(self.path("second", "input", source + ".camsa.points")).splitlines()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import glob
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+import camsa
+from camsa.utils.agp import agp2camsa_points
+
+EXAMPLES = sorted(glob.glob(os.path.join(camsa.root_dir, "examples", "utils", "agp", "data", "*.agp")))
+
+
+def get_reference_assembly_points(file_names, origin):
+    """ Assembly points, obtained (as before streaming) by grouping components of every object across all the files """
+    objects = OrderedDict()
+    for file_name in file_names:
+        with open(file_name, "rt") as source:
+            for line in source:
+                line = line.strip()
+                if line.startswith("#") or len(line) == 0:
+                    continue
+                data = line.split("\t", 8)
+                if agp2camsa_points.Component.is_scaffold_component(data[4]):
+                    component = agp2camsa_points.ScaffoldComponent.from_agp_data(data=data)
+                else:
+                    component = agp2camsa_points.GapComponent.from_agp_data(data=data)
+                objects.setdefault(component.object_id, []).append(component)
+    extra_data = type("ExtraData", (object,), {"origin": origin})
+    result = []
+    for components in objects.values():
+        components = sorted(components, key=lambda component: (component.object_beg, component.object_end))
+        result.extend(agp2camsa_points.object_as_camsa_points(object_as_components=components, extra_data=extra_data))
+    return result
+
+
+def as_tuples(assembly_points):
+    return [(ap.seq1, ap.seq1_or, ap.seq2, ap.seq2_or, ap.gap_size, ap.sources) for ap in assembly_points]
+
+
+class ConvertTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.logger = logging.getLogger("CAMSA.tests.agp2camsa_points")
+        self.logger.setLevel(logging.ERROR)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def convert(self, file_names):
+        args = agp2camsa_points.get_parser().parse_args(file_names + ["--origin", "test"])
+        try:
+            return agp2camsa_points.convert(args=args, logger=self.logger)
+        finally:
+            for source in args.agp:
+                source.close()
+
+    def write_agp(self, name, lines):
+        file_name = os.path.join(self.directory, name)
+        with open(file_name, "wt") as destination:
+            destination.write("\n".join("\t".join(str(value) for value in line) for line in lines) + "\n")
+        return file_name
+
+    def test_example_files_one_by_one(self):
+        for file_name in EXAMPLES:
+            self.assertEqual(as_tuples(get_reference_assembly_points(file_names=[file_name], origin="test")),
+                             as_tuples(self.convert(file_names=[file_name])))
+
+    def test_example_files_together(self):
+        # chrY is described in more than one of the example files, so its components have to be grouped across them
+        result = self.convert(file_names=EXAMPLES)
+        self.assertEqual(as_tuples(get_reference_assembly_points(file_names=EXAMPLES, origin="test")), as_tuples(result))
+        self.assertNotIn(("AADB02037551.1", "+", "AADB02037552.1", "+", 50000, ["test"]), as_tuples(result))
+
+    def test_object_continued_in_the_next_file(self):
+        first = self.write_agp("first.agp", [["obj1", 1, 100, 1, "W", "ctg1", 1, 100, "+"],
+                                             ["obj1", 101, 110, 2, "N", 10, "scaffold", "yes", "paired-ends"],
+                                             ["obj1", 111, 210, 3, "W", "ctg2", 1, 100, "-"]])
+        second = self.write_agp("second.agp", [["obj1", 211, 310, 4, "W", "ctg3", 1, 100, "+"],
+                                               ["obj2", 1, 100, 1, "W", "ctg4", 1, 100, "+"],
+                                               ["obj2", 101, 200, 2, "W", "ctg5", 1, 100, "?"]])
+        self.assertEqual([("ctg1", "+", "ctg2", "-", 10, ["test"]),
+                          ("ctg2", "-", "ctg3", "+", 1, ["test"]),
+                          ("ctg4", "+", "ctg5", "?", 1, ["test"])],
+                         as_tuples(self.convert(file_names=[first, second])))
+
+    def test_object_repeated_in_a_later_file(self):
+        first = self.write_agp("first.agp", [["obj1", 1, 100, 1, "W", "ctg1", 1, 100, "+"],
+                                             ["obj2", 1, 100, 1, "W", "ctg3", 1, 100, "+"],
+                                             ["obj2", 101, 200, 2, "W", "ctg4", 1, 100, "+"]])
+        second = self.write_agp("second.agp", [["obj1", 101, 200, 2, "W", "ctg2", 1, 100, "-"]])
+        self.assertEqual([("ctg1", "+", "ctg2", "-", 1, ["test"]),
+                          ("ctg3", "+", "ctg4", "+", 1, ["test"])],
+                         as_tuples(self.convert(file_names=[first, second])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+
+from camsa.utils.fasta import algo
+
+
+def full_matrix_bounded_alignment(seq1, seq2, max_edit_distance=-1):
+    """ The quadratic time and memory implementation, that `bounded_alignment` used to have
+
+    :return: (edit distance, consensus, aligned seq1, aligned seq2), with None for the last three, if the distance exceeds `max_edit_distance`
+    """
+    if max_edit_distance == -1:
+        max_edit_distance = max(len(seq1), len(seq2))
+    i_range = len(seq1) + 1
+    j_range = len(seq2) + 1
+    M = [[0] * j_range for _ in range(i_range)]
+    Mbt = [["s" for _ in range(j_range)] for _ in range(i_range)]
+    for j in range(1, j_range):
+        M[0][j] = j
+        Mbt[0][j] = "l"
+    for i in range(1, i_range):
+        M[i][0] = i
+        Mbt[i][0] = "u"
+    for i in range(1, i_range):
+        for j in range(1, j_range):
+            if abs(i - j) > max_edit_distance:
+                continue
+            options = [(M[i - 1][j - 1] + algo.substitute_score(seq1[i - 1], seq2[j - 1]), "d")]
+            if abs(i - j) < max_edit_distance:
+                options.append((M[i - 1][j] + 1, "u"))
+                options.append((M[i][j - 1] + 1, "l"))
+            elif i > j:
+                options.append((M[i - 1][j] + 1, "u"))
+            else:
+                options.append((M[i][j - 1] + 1, "l"))
+            M[i][j], Mbt[i][j] = min(options, key=lambda entry: entry[0])
+    if M[-1][-1] > max_edit_distance:
+        return M[-1][-1], None, None, None
+    aligned_seqs = algo.get_alignments(iseq=seq1, jseq=seq2, backtracking=Mbt, end_cell=(i_range - 1, j_range - 1))
+    return M[-1][-1], algo.get_consensus_sequences(aligned_seqs=aligned_seqs), aligned_seqs[0], aligned_seqs[1]
+
+
+def get_edited_seq(rnd, seq, edits_cnt):
+    seq = list(seq)
+    for _ in range(edits_cnt):
+        position = rnd.randrange(len(seq) + 1)
+        operation = rnd.choice(["substitution", "deletion", "insertion", "N"])
+        if operation == "insertion" or len(seq) == 0 or position == len(seq):
+            seq.insert(position, rnd.choice("ACGT"))
+        elif operation == "deletion":
+            del seq[position]
+        else:
+            seq[position] = rnd.choice("ACGT") if operation == "substitution" else "N"
+    return "".join(seq)
+
+
+class BoundedAlignmentTestCase(unittest.TestCase):
+    def assert_same_as_full_matrix(self, seq1, seq2, max_edit_distance):
+        edit_distance, consensus, al_seq1, al_seq2 = full_matrix_bounded_alignment(seq1=seq1, seq2=seq2, max_edit_distance=max_edit_distance)
+        result = algo.bounded_alignment(seq1=seq1, seq2=seq2, max_edit_distance=max_edit_distance)
+        message = "seq1={seq1} seq2={seq2} max_edit_distance={med}".format(seq1=seq1, seq2=seq2, med=max_edit_distance)
+        self.assertEqual((consensus, al_seq1, al_seq2), (result.consensus, result.al_seq1, result.al_seq2), message)
+        if consensus is not None:
+            self.assertEqual(edit_distance, result.edit_distance, message)
+        else:
+            # a rejected alignment may report a lower bound of the banded distance
+            self.assertTrue(max_edit_distance < result.edit_distance <= edit_distance or max_edit_distance == -1, message)
+
+    def test_random_similar_and_unrelated_sequences(self):
+        rnd = random.Random(1)
+        for _ in range(1500):
+            seq1 = "".join(rnd.choice("ACGTN") for _ in range(rnd.randint(0, 40)))
+            if rnd.random() < 0.7:
+                seq2 = get_edited_seq(rnd=rnd, seq=seq1, edits_cnt=rnd.randint(0, 8))
+            else:
+                seq2 = "".join(rnd.choice("ACGT") for _ in range(rnd.randint(0, 40)))
+            max_edit_distance = rnd.choice([-1, 0, 1, 2, 3, 5, 8, 12, 2.5, 4.5])
+            self.assert_same_as_full_matrix(seq1=seq1, seq2=seq2, max_edit_distance=max_edit_distance)
+
+    def test_longer_flanks(self):
+        rnd = random.Random(2)
+        for _ in range(20):
+            seq1 = "".join(rnd.choice("ACGT") for _ in range(rnd.randint(150, 250)))
+            seq2 = get_edited_seq(rnd=rnd, seq=seq1, edits_cnt=rnd.randint(0, 15))
+            self.assert_same_as_full_matrix(seq1=seq1, seq2=seq2, max_edit_distance=rnd.choice([5, 10, 20]))
+
+
+class MayBeWithinEditDistanceTestCase(unittest.TestCase):
+    def assert_not_ruled_out(self, seq1, seq2, max_edit_distance):
+        edit_distance = full_matrix_bounded_alignment(seq1=seq1, seq2=seq2)[0]
+        if edit_distance > max_edit_distance:
+            return False
+        for q in [None, 1, 2, 3, 5]:
+            message = "seq1={seq1} seq2={seq2} max_edit_distance={med} q={q}".format(seq1=seq1, seq2=seq2, med=max_edit_distance, q=q)
+            self.assertTrue(algo.may_be_within_edit_distance(seq1=seq1, seq2=seq2, max_edit_distance=max_edit_distance, q=q), message)
+        return True
+
+    def test_never_rules_out_sequences_within_the_distance(self):
+        rnd = random.Random(3)
+        checked_cnt = 0
+        for _ in range(1000):
+            seq1 = "".join(rnd.choice("ACGT") for _ in range(rnd.randint(0, 60)))
+            seq2 = get_edited_seq(rnd=rnd, seq=seq1, edits_cnt=rnd.randint(0, 6))
+            if self.assert_not_ruled_out(seq1=seq1, seq2=seq2, max_edit_distance=rnd.randint(1, 8)):
+                checked_cnt += 1
+        self.assertTrue(checked_cnt > 500)
+
+    def test_never_rules_out_sequences_within_the_distance_with_wildcards(self):
+        rnd = random.Random(4)
+        for _ in range(1000):
+            seq1 = "".join(rnd.choice("ACGTACGTN") for _ in range(rnd.randint(0, 60)))
+            seq2 = list(get_edited_seq(rnd=rnd, seq=seq1, edits_cnt=rnd.randint(0, 6)))
+            for _ in range(rnd.randint(0, 4)):
+                if len(seq2) > 0:
+                    # a wildcard matches any letter, so it never increases the distance
+                    seq2[rnd.randrange(len(seq2))] = "N"
+            self.assert_not_ruled_out(seq1=seq1, seq2="".join(seq2), max_edit_distance=rnd.randint(1, 8))
+
+    def test_wildcard_runs(self):
+        self.assert_not_ruled_out(seq1="ACGT" * 10, seq2="N" * 40, max_edit_distance=1)
+        self.assert_not_ruled_out(seq1="ACGTAC" + "N" * 20 + "GTACGT", seq2="ACGTACGTACGTACGTACGTACGTACGTACGTAC", max_edit_distance=2)
+        self.assert_not_ruled_out(seq1="N" * 30, seq2="N" * 31, max_edit_distance=1)
+
+    def test_rules_out_unrelated_sequences(self):
+        rnd = random.Random(5)
+        seq1 = "".join(rnd.choice("ACGT") for _ in range(200))
+        seq2 = "".join(rnd.choice("ACGT") for _ in range(200))
+        self.assertFalse(algo.may_be_within_edit_distance(seq1=seq1, seq2=seq2, max_edit_distance=5))
+        self.assertFalse(algo.may_be_within_edit_distance(seq1=seq1, seq2=seq1[:190], max_edit_distance=5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from Bio import bgzf as bio_bgzf
+
+from camsa.utils.fasta import bgzf
+
+
+def get_random_data(rnd, length):
+    """ Compressible (sequence like) data, as Biopython can not put poorly compressible data into a BGZF block """
+    return "".join(rnd.choice("ACGTN\n") for _ in range(length)).encode("ascii")
+
+
+class BgzfTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.rnd = random.Random(9)
+        self.data = get_random_data(rnd=self.rnd, length=5 * bgzf.MAX_BLOCK_DATA_SIZE + 1234)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write(self, name, pieces):
+        """ Writes the pieces with `BgzfWriter`
+
+        :return: a path to the file, the writer's index, and virtual offsets of the pieces starts
+        """
+        file_name = self.path(name)
+        virtual_offsets = []
+        with bgzf.BgzfWriter(destination=file_name) as writer:
+            for piece in pieces:
+                virtual_offsets.append(writer.tell())
+                writer.write(piece)
+        return file_name, writer.index, virtual_offsets
+
+    def write_with_biopython(self, name, pieces):
+        file_name = self.path(name)
+        virtual_offsets = []
+        writer = bio_bgzf.BgzfWriter(file_name, "wb")
+        for piece in pieces:
+            virtual_offsets.append(writer.tell())
+            writer.write(piece)
+        writer.close()
+        return file_name, virtual_offsets
+
+    def split(self, data, pieces_cnt=40):
+        positions = sorted(self.rnd.randint(0, len(data)) for _ in range(pieces_cnt - 1))
+        return [data[start:end] for start, end in zip([0] + positions, positions + [len(data)])]
+
+    def get_random_ranges(self, length, ranges_cnt=300):
+        ranges = [(0, length), (0, 0), (length, length), (bgzf.MAX_BLOCK_DATA_SIZE - 1, bgzf.MAX_BLOCK_DATA_SIZE + 1),
+                  (bgzf.MAX_BLOCK_DATA_SIZE, 3 * bgzf.MAX_BLOCK_DATA_SIZE), (length - 1, length + 10), (10, 5)]
+        for _ in range(ranges_cnt):
+            start = self.rnd.randint(0, length)
+            ranges.append((start, start + self.rnd.choice([1, self.rnd.randint(0, 100), self.rnd.randint(0, 4 * bgzf.MAX_BLOCK_DATA_SIZE)])))
+        return ranges
+
+    def assert_random_access(self, file_name, data, index=None, pieces=None, virtual_offsets=None):
+        cache_size = bgzf.BLOCK_CACHE_SIZE
+        for threads in [1, 4]:
+            reader = bgzf.BgzfReader(file_name=file_name, index=index, threads=threads)
+            try:
+                # with (almost) no cache every multi-block read is decompressed by the threads again
+                bgzf.BLOCK_CACHE_SIZE = 1 if threads > 1 else cache_size
+                for start, end in self.get_random_ranges(length=len(data)):
+                    self.assertEqual(data[start:end], reader.read(start, end), "[{start}, {end}), {threads} threads".format(start=start, end=end, threads=threads))
+                for position in range(0, len(data), 997):
+                    size = self.rnd.randint(0, 3 * bgzf.MAX_BLOCK_DATA_SIZE)
+                    self.assertEqual(data[position:position + size], reader.read_virtual(reader.get_virtual_offset(position), size))
+                if pieces is not None:
+                    for piece, virtual_offset in zip(pieces, virtual_offsets):
+                        self.assertEqual(piece, reader.read_virtual(virtual_offset, len(piece)))
+            finally:
+                bgzf.BLOCK_CACHE_SIZE = cache_size
+                reader.close()
+
+    def test_round_trip(self):
+        pieces = self.split(data=self.data)
+        file_name, index, virtual_offsets = self.write(name="data.gz", pieces=pieces)
+        self.assertTrue(bgzf.is_gzip(file_name))
+        self.assertTrue(bgzf.is_bgzf(file_name))
+        with gzip.open(file_name, "rb") as source:
+            self.assertEqual(self.data, source.read())
+        self.assertEqual(index, bgzf.build_gzi(file_name=file_name))
+        self.assertEqual(len(self.data) // bgzf.MAX_BLOCK_DATA_SIZE, len(index))
+        self.assert_random_access(file_name=file_name, data=self.data, index=index, pieces=pieces, virtual_offsets=virtual_offsets)
+
+    def test_read_by_biopython(self):
+        pieces = self.split(data=self.data)
+        file_name, _, virtual_offsets = self.write(name="data.gz", pieces=pieces)
+        reader = bio_bgzf.BgzfReader(file_name, "rb")
+        try:
+            self.assertEqual(self.data, reader.read(len(self.data) + 1))
+            for piece, virtual_offset in zip(pieces, virtual_offsets):
+                reader.seek(virtual_offset)
+                self.assertEqual(piece, reader.read(len(piece)))
+        finally:
+            reader.close()
+
+    def test_read_biopython_files(self):
+        pieces = self.split(data=self.data)
+        file_name, virtual_offsets = self.write_with_biopython(name="data.gz", pieces=pieces)
+        self.assertTrue(bgzf.is_bgzf(file_name))
+        index = bgzf.build_gzi(file_name=file_name)
+        self.assertTrue(len(index) >= len(self.data) // 65536)
+        with open(file_name, "rb") as source:
+            compressed = source.read()
+        self.assertTrue(all(bgzf.get_block_size(compressed, offset) is not None for offset, _ in index))
+        self.assertEqual(sorted(set(index)), index)
+        self.assert_random_access(file_name=file_name, data=self.data, pieces=pieces, virtual_offsets=virtual_offsets)
+
+    def test_gzi(self):
+        file_name, index, _ = self.write(name="data.gz", pieces=[self.data])
+        bgzf.write_gzi(index=index, file_name=self.path("data.gz.gzi"))
+        self.assertEqual(8 + 16 * len(index), os.path.getsize(self.path("data.gz.gzi")))
+        self.assertEqual(index, bgzf.read_gzi(file_name=self.path("data.gz.gzi")))
+        self.assertEqual(index, bgzf.load_gzi(file_name=file_name))
+        self.assert_random_access(file_name=file_name, data=self.data)
+
+    def test_gzi_is_built_and_cached(self):
+        file_name, index, _ = self.write(name="data.gz", pieces=[self.data])
+        index_file_name = file_name + bgzf.GZI_EXTENSION
+        self.assertFalse(os.path.exists(index_file_name))
+        self.assertEqual(index, bgzf.load_gzi(file_name=file_name))
+        self.assertEqual(index, bgzf.read_gzi(file_name=index_file_name))
+        # a stale index is rebuilt
+        data = self.data[:2 * bgzf.MAX_BLOCK_DATA_SIZE + 10]
+        file_name, index, _ = self.write(name="data.gz", pieces=[data])
+        gzi_mtime = os.path.getmtime(file_name) - 10
+        os.utime(index_file_name, (gzi_mtime, gzi_mtime))
+        self.assertEqual(index, bgzf.load_gzi(file_name=file_name))
+        self.assertEqual(index, bgzf.read_gzi(file_name=index_file_name))
+        self.assert_random_access(file_name=file_name, data=data)
+
+    def test_empty_and_small_files(self):
+        for data in [b"", b"A", b"ACGT\n" * 10, self.data[:bgzf.MAX_BLOCK_DATA_SIZE]]:
+            file_name, index, _ = self.write(name="data.gz", pieces=[data])
+            self.assertEqual(index, bgzf.build_gzi(file_name=file_name))
+            with gzip.open(file_name, "rb") as source:
+                self.assertEqual(data, source.read())
+            reader = bgzf.BgzfReader(file_name=file_name, index=index)
+            try:
+                self.assertEqual(data, reader.read(0, len(data)))
+                self.assertEqual(b"", reader.read(len(data), len(data) + 10))
+            finally:
+                reader.close()
+            os.remove(file_name)
+
+    def test_non_bgzf_files(self):
+        with gzip.open(self.path("data.gz"), "wb") as destination:
+            destination.write(self.data[:1000])
+        self.assertTrue(bgzf.is_gzip(self.path("data.gz")))
+        self.assertFalse(bgzf.is_bgzf(self.path("data.gz")))
+        with self.assertRaises(ValueError):
+            bgzf.build_gzi(file_name=self.path("data.gz"))
+        with self.assertRaises(ValueError):
+            bgzf.decompress_block(bgzf.compress_block(b"ACGT")[:-8] + b"\x00" * 8)
+
+    def test_invalid_virtual_offsets(self):
+        file_name, index, _ = self.write(name="data.gz", pieces=[self.data])
+        reader = bgzf.BgzfReader(file_name=file_name, index=index)
+        try:
+            with self.assertRaises(ValueError):
+                reader.read_virtual(bgzf.make_virtual_offset(index[0][0] + 1, 0), 10)
+        finally:
+            reader.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from camsa.utils.fasta import fasta2camsa_points
+
+COORDS_HEADER = ["/scaffolds.fasta /contigs.fasta", "NUCMER", "", "    [S1]     [E1]  |     [S2]     [E2]  |  [LEN 1]  [LEN 2]  |  [% IDY]  |  [LEN R]  [LEN Q]  |  [COV R]  [COV Q]  | [TAGS]",
+                 "=" * 80]
+
+
+def get_coords_line(scaffold, contig, scaffold_start, scaffold_end, contig_start, contig_end):
+    length = abs(scaffold_end - scaffold_start) + 1
+    return "{s1} {e1} | {s2} {e2} | {length} {length} | 100.00 | 10000 {length} | 10.00 100.00 | {scaffold} {contig}" \
+           "".format(s1=scaffold_start, e1=scaffold_end, s2=contig_start, e2=contig_end, length=length, scaffold=scaffold, contig=contig)
+
+
+class ConvertWithStubbedAlignersTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.directory, "output")
+        self.contigs = os.path.join(self.directory, "contigs.fasta")
+        self.scaffolds = [os.path.join(self.directory, name + ".fasta") for name in ["first", "second"]]
+        for file_name in [self.contigs] + self.scaffolds:
+            with open(file_name, "wt") as destination:
+                destination.write(">seq\nACGT\n")
+        self.coords = {
+            "first": [get_coords_line("scaf1", "ctg1", 1, 1000, 1, 1000), get_coords_line("scaf1", "ctg2", 1101, 2100, 1000, 1)],
+            "second": [get_coords_line("scaf2", "ctg3", 1, 500, 500, 1), get_coords_line("scaf2", "ctg1", 551, 1550, 1, 1000),
+                       get_coords_line("scaf2", "ctg4", 1601, 1700, 1, 100)],
+        }
+        self.calls = []
+        self.original_runners = (fasta2camsa_points.run_nucmer, fasta2camsa_points.run_delta_filter, fasta2camsa_points.run_show_coords)
+
+        def run_nucmer(contigs_file_name, reference_file_name, nucmer_executable_path, cli_arguments, output_dir, logs_dir, **kwargs):
+            self.calls.append("nucmer")
+            open(os.path.join(output_dir, fasta2camsa_points.get_file_prefix(reference_file_name) + ".delta"), "wt").close()
+            return 0
+
+        def run_delta_filter(delta_file_name, output_dir, logs_dir, delta_filter_executable_path, cli_arguments, **kwargs):
+            self.calls.append("delta-filter")
+            open(os.path.join(output_dir, fasta2camsa_points.get_file_prefix(delta_file_name) + ".filtered.delta"), "wt").close()
+            return 0
+
+        def run_show_coords(delta_file_name, output_dir, logs_dir, show_coords_executable_path, cli_arguments, **kwargs):
+            self.calls.append("show-coords")
+            prefix = fasta2camsa_points.get_file_prefix(delta_file_name)[:-len(".filtered")]
+            with open(os.path.join(output_dir, prefix + ".coords"), "wt") as destination:
+                destination.write("\n".join(COORDS_HEADER + self.coords[prefix]) + "\n")
+            return 0
+
+        fasta2camsa_points.run_nucmer = run_nucmer
+        fasta2camsa_points.run_delta_filter = run_delta_filter
+        fasta2camsa_points.run_show_coords = run_show_coords
+
+    def tearDown(self):
+        fasta2camsa_points.run_nucmer, fasta2camsa_points.run_delta_filter, fasta2camsa_points.run_show_coords = self.original_runners
+        shutil.rmtree(self.directory)
+
+    def get_args(self):
+        return fasta2camsa_points.get_parser().parse_args([self.contigs] + self.scaffolds + ["-o", self.output_dir, "--c-logging-level", "40"])
+
+    def test_convert_collects_assembly_points_of_all_scaffolds_files(self):
+        result = fasta2camsa_points.convert(args=self.get_args())
+        self.assertEqual(["nucmer", "delta-filter", "show-coords"] * 2, self.calls)
+        self.assertEqual([("ctg1", "+", "ctg2", "-", 101, ["first"]),
+                          ("ctg3", "-", "ctg1", "+", 51, ["second"]),
+                          ("ctg1", "+", "ctg4", "+", 51, ["second"])],
+                         [(ap.seq1, ap.seq1_or, ap.seq2, ap.seq2_or, ap.gap_size, ap.sources) for ap in result])
+        for prefix, ap_cnt in [("first", 1), ("second", 2)]:
+            with open(os.path.join(self.output_dir, prefix + ".camsa.points"), "rt") as source:
+                self.assertEqual(ap_cnt + 1, len(source.readlines()))
+
+    def test_convert_without_writing(self):
+        result = fasta2camsa_points.convert(args=self.get_args(), write=False)
+        self.assertEqual(3, len(result))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "first.camsa.points")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+
+from camsa.utils.fasta.algo import bounded_alignment
+from camsa.utils.fasta.data_structures import IntraGapFilling, FlankingGapFilling
+from camsa.utils.fasta.gap_filling import Gap, fill_gaps
+
+
+def get_random_seq(rnd, length, alphabet="ACGT"):
+    return "".join(rnd.choice(alphabet) for _ in range(length))
+
+
+def get_gaps(seed=1, gaps_cnt=40):
+    rnd = random.Random(seed)
+    gaps = []
+    for gap_id in range(gaps_cnt):
+        gap_size = rnd.randint(50, 150)
+        gap_size_error = rnd.randint(0, 20)
+        candidates = []
+        for _ in range(rnd.randint(0, 4)):
+            candidates.append(IntraGapFilling(seq=get_random_seq(rnd=rnd, length=gap_size + rnd.randint(-30, 30), alphabet="ACGTN")))
+        for _ in range(rnd.randint(0, 4)):
+            overlap = rnd.randint(0, 2 * gap_size_error + 5)
+            seq1 = get_random_seq(rnd=rnd, length=rnd.randint(20, gap_size))
+            shared = seq1[-overlap:] if overlap > 0 else ""
+            if len(shared) > 0 and rnd.random() < 0.5:
+                position = rnd.randrange(len(shared))
+                shared = shared[:position] + rnd.choice("ACGTN") + shared[position + 1:]
+            seq2 = shared + get_random_seq(rnd=rnd, length=max(gap_size - len(seq1) + rnd.randint(-10, 10), 1))
+            candidates.append(FlankingGapFilling(seq1=seq1, seq2=seq2, seq=None))
+        rnd.shuffle(candidates)
+        gaps.append(Gap(gap_id=gap_id, gap_size=gap_size, gap_size_error=gap_size_error, candidates=candidates))
+    return gaps
+
+
+def get_fillings(gaps):
+    result = []
+    for gap in gaps:
+        if gap.filling is None:
+            result.append((gap.gap_id, None, None, None))
+        else:
+            result.append((gap.gap_id, type(gap.filling).__name__, gap.filling.seq, gap.filling.score))
+    return result
+
+
+class FillGapsTestCase(unittest.TestCase):
+    def test_serial_and_pool_evaluations_are_identical(self):
+        serial = fill_gaps(gaps=get_gaps(), processes=1)
+        pooled = fill_gaps(gaps=get_gaps(), processes=2, chunksize=3)
+        self.assertEqual(get_fillings(serial), get_fillings(pooled))
+        self.assertTrue(any(filling[1] == "FlankingGapFilling" for filling in get_fillings(serial)))
+        self.assertTrue(any(filling[1] is None for filling in get_fillings(serial)))
+
+    def test_candidates_are_not_modified(self):
+        for processes in [1, 2]:
+            gaps = fill_gaps(gaps=get_gaps(), processes=processes)
+            for gap in gaps:
+                for candidate in gap.candidates:
+                    self.assertIsNone(candidate.score)
+                    self.assertIsNot(candidate, gap.filling)
+                    if isinstance(candidate, FlankingGapFilling):
+                        self.assertIsNone(candidate.seq)
+                        self.assertIsNone(candidate.alignment_result)
+
+
+class PlainAlignmentFlankingGapFilling(FlankingGapFilling):
+    """ The overlap check, that `FlankingGapFilling` used to have: a plain `bounded_alignment` for every overlap, without any shortcuts """
+
+    def suitable_to_fill_the_gap(self, gap_size, gap_size_error, fill_remainder=True):
+        if gap_size == "?":
+            return False
+        min_gap_size = gap_size - gap_size_error
+        max_gap_size = gap_size + gap_size_error
+        cumulative_length = len(self.start_seq) + len(self.end_seq)
+        if cumulative_length < min_gap_size:
+            return False
+        if cumulative_length > gap_size + 2 * gap_size_error:
+            return False
+        if cumulative_length > max_gap_size:
+            min_overlap = cumulative_length - gap_size - gap_size_error
+            max_overlap = cumulative_length - gap_size + gap_size_error
+            max_overlap = int(min(max_overlap, len(self.start_seq), len(self.end_seq)))
+            l1s = self.start_seq[-max_overlap:]
+            l2p = self.end_seq[:max_overlap]
+            alignment_result = bounded_alignment(seq1=l1s, seq2=l2p, max_edit_distance=max_overlap - min_overlap)
+            if alignment_result.consensus is None:
+                return False
+            else:
+                self.alignment_result = alignment_result
+                return True
+        if cumulative_length < max_gap_size:
+            return True
+
+
+class FlankingGapFillingTestCase(unittest.TestCase):
+    def assert_same_as_plain_alignment(self, seq1, seq2, gap_size, gap_size_error):
+        message = "seq1={seq1} seq2={seq2} gap_size={gs} gap_size_error={gse}".format(seq1=seq1, seq2=seq2, gs=gap_size, gse=gap_size_error)
+        filling = FlankingGapFilling(seq1=seq1, seq2=seq2, seq=None)
+        expected = PlainAlignmentFlankingGapFilling(seq1=seq1, seq2=seq2, seq=None)
+        suitable = expected.suitable_to_fill_the_gap(gap_size=gap_size, gap_size_error=gap_size_error)
+        self.assertEqual(suitable, filling.suitable_to_fill_the_gap(gap_size=gap_size, gap_size_error=gap_size_error), message)
+        if not suitable:
+            return False
+        if expected.alignment_result is None:
+            self.assertIsNone(filling.alignment_result, message)
+        else:
+            self.assertEqual(expected.alignment_result.consensus, filling.alignment_result.consensus, message)
+        if gap_size_error != int(gap_size_error):
+            # sequences are only prepared for integer gap sizes errors
+            return True
+        expected.prepare_seq(gap_size=gap_size, gap_size_error=gap_size_error)
+        filling.prepare_seq(gap_size=gap_size, gap_size_error=gap_size_error)
+        self.assertEqual(expected.seq, filling.seq, message)
+        return True
+
+    def test_random_overlaps(self):
+        rnd = random.Random(6)
+        suitable_cnt = 0
+        for _ in range(2000):
+            gap_size_error = rnd.choice([0, 1, 2, 3, 5, 8, 12])
+            # for gap sizes in [cumulative length - 2 * error, cumulative length - error) the flanks must overlap by about 2 * error
+            shift = rnd.randint(1, max(gap_size_error, 1))
+            overlap = 2 * gap_size_error + shift
+            seq1 = get_random_seq(rnd=rnd, length=rnd.randint(max(overlap - 3, 0), overlap + 30), alphabet="ACGT" * 5 + "N")
+            shared = list(seq1[len(seq1) - overlap:])
+            for _ in range(rnd.randint(0, gap_size_error + 2) if len(shared) > 0 else 0):
+                position = rnd.randrange(len(shared))
+                shared[position] = rnd.choice(["", "A", "C", "G", "T", "N", shared[position] + rnd.choice("ACGT")])
+            if rnd.random() < 0.3:
+                shared = list(get_random_seq(rnd=rnd, length=overlap))
+            seq2 = "".join(shared) + get_random_seq(rnd=rnd, length=rnd.randint(0, 30))
+            cumulative_length = len(seq1) + len(seq2)
+            if rnd.random() < 0.8:
+                gap_size = cumulative_length - gap_size_error - shift
+            else:
+                gap_size = cumulative_length - overlap + rnd.randint(-5, 5)
+            if self.assert_same_as_plain_alignment(seq1=seq1, seq2=seq2, gap_size=gap_size, gap_size_error=gap_size_error):
+                suitable_cnt += 1
+        self.assertTrue(200 < suitable_cnt < 1800)
+
+    def test_edge_cases(self):
+        for seq1, seq2, gap_size, gap_size_error in [("ACGTACGT", "ACGTACGT", 8, 0),
+                                                     ("ACGTACGT", "ACGTACGT", 8, 4),
+                                                     ("ACGTACGT", "ACGTACGT", 12, 4),
+                                                     ("ACGTACGT", "TTTTACGT", 12, 2),
+                                                     ("ACGTNNGT", "ACGTACGTAA", 14, 3),
+                                                     ("AC", "GTACGTACGT", 8, 3),
+                                                     ("AC", "ACGTACGTAC", 6, 3),
+                                                     ("A", "ACGTACGTAC", 5, 3),
+                                                     ("ACGTACGT", "CCCCCCCC", 8, 1),
+                                                     ("ACGTACGT", "CCCCCCCC", 8, 1.5),
+                                                     ("ACGTACGT", "CCCCCCCC", "?", 1)]:
+            self.assert_same_as_plain_alignment(seq1=seq1, seq2=seq2, gap_size=gap_size, gap_size_error=gap_size_error)
+
+
+if __name__ == "__main__":
+    unittest.main()
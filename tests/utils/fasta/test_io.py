@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+import six
+from Bio import SeqIO
+from Bio.Seq import Seq, reverse_complement
+from Bio.SeqRecord import SeqRecord
+
+from camsa.utils.fasta import bgzf
+from camsa.utils.fasta.io import WrappedFastaWriter, IndexedFasta, InMemoryFasta, FAI_EXTENSION, build_fai, load_fai, get_record_title, open_fasta
+
+
+def get_random_seq(rnd, length, alphabet="ACGTNacgtRY"):
+    return "".join(rnd.choice(alphabet) for _ in range(length))
+
+
+def get_records(rnd, records_cnt=12):
+    """ Random (name, title, sequence) triples, with empty, short, line-long and multi-line sequences and titles with descriptions """
+    records = []
+    for record_index in range(records_cnt):
+        name = "seq_{index}".format(index=record_index)
+        title = name if rnd.random() < 0.5 else name + " " + " ".join(get_random_seq(rnd, rnd.randint(1, 10), "abcxyz|=;") for _ in range(rnd.randint(1, 3)))
+        length = rnd.choice([0, 1, rnd.randint(2, 100), rnd.randint(100, 2000), 60, 120])
+        records.append((name, title, get_random_seq(rnd, length)))
+    return records
+
+
+def format_records(records, line_width, new_line="\n"):
+    """ FASTA text of the records, and the expected .fai entries (name, length, offset, line bases, line width) for it """
+    chunks = []
+    fai = []
+    offset = 0
+    for name, title, seq in records:
+        header = ">" + title + new_line
+        chunks.append(header)
+        offset += len(header)
+        lines = [seq[index:index + line_width] + new_line for index in range(0, len(seq), line_width)]
+        line_bases = line_width if len(seq) > line_width else len(seq)
+        fai.append((name, len(seq), offset, line_bases, line_bases + len(new_line) if len(seq) > 0 else 0))
+        chunks.extend(lines)
+        offset += sum(len(line) for line in lines)
+    return "".join(chunks), fai
+
+
+def get_fai(entries):
+    return [(entry.name, entry.length, entry.offset, entry.line_bases, entry.line_width) for entry in entries.values()]
+
+
+def get_random_range(rnd, length):
+    start = rnd.randint(-5, length + 5)
+    end = rnd.choice([None, rnd.randint(-5, length + 5), start + rnd.randint(0, 200)])
+    return start, end
+
+
+class FastaFilesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.rnd = random.Random(7)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text, compression=None):
+        file_name = os.path.join(self.directory, name)
+        if compression == "bgzf":
+            with bgzf.BgzfWriter(destination=file_name) as destination:
+                destination.write(text.encode("ascii"))
+        elif compression == "gzip":
+            with gzip.open(file_name, "wb") as destination:
+                destination.write(text.encode("ascii"))
+        else:
+            with open(file_name, "wb") as destination:
+                destination.write(text.encode("ascii"))
+        return file_name
+
+    def read_with_biopython(self, file_name):
+        if bgzf.is_gzip(file_name):
+            with gzip.open(file_name, "rt") as source:
+                return list(SeqIO.parse(source, "fasta"))
+        return list(SeqIO.parse(file_name, "fasta"))
+
+    def assert_same_as_biopython(self, fasta, file_name):
+        records = self.read_with_biopython(file_name=file_name)
+        self.assertEqual([record.id for record in records], fasta.names())
+        self.assertEqual(len(records), len(fasta))
+        for record in records:
+            seq = str(record.seq)
+            self.assertIn(record.id, fasta)
+            self.assertEqual(record.description, fasta.get_title(record.id))
+            self.assertEqual(len(seq), fasta.get_length(record.id))
+            self.assertEqual(seq, fasta.fetch(record.id))
+            for _ in range(20):
+                start, end = get_random_range(rnd=self.rnd, length=len(seq))
+                self.assertEqual(seq[start:end], fasta.fetch(record.id, start=start, end=end))
+                self.assertEqual(reverse_complement(seq[start:end]), fasta.fetch(record.id, start=start, end=end, strand="-"))
+
+
+class IndexedFastaTestCase(FastaFilesTestCase):
+    def test_build_fai(self):
+        for line_width, new_line, compression in [(60, "\n", None), (7, "\n", None), (60, "\r\n", None), (1, "\n", None),
+                                                  (60, "\n", "bgzf"), (13, "\r\n", "bgzf")]:
+            records = get_records(rnd=self.rnd)
+            text, expected = format_records(records=records, line_width=line_width, new_line=new_line)
+            file_name = self.write(name="records.fasta", text=text, compression=compression)
+            self.assertEqual(expected, get_fai(build_fai(file_name=file_name)))
+            biopython_lengths = [len(record.seq) for record in self.read_with_biopython(file_name=file_name)]
+            self.assertEqual(biopython_lengths, [entry[1] for entry in expected])
+
+    def test_fetch_and_titles_match_biopython(self):
+        for line_width, new_line, compression, threads in [(60, "\n", None, 1), (11, "\n", None, 1), (60, "\r\n", None, 1), (1, "\r\n", None, 1),
+                                                           (60, "\n", "bgzf", 1), (17, "\r\n", "bgzf", 3)]:
+            records = get_records(rnd=self.rnd)
+            if compression == "bgzf":
+                # records spanning several BGZF blocks
+                records.insert(3, ("long", "long", get_random_seq(self.rnd, 3 * bgzf.MAX_BLOCK_DATA_SIZE)))
+            text, _ = format_records(records=records, line_width=line_width, new_line=new_line)
+            file_name = self.write(name="records.fasta", text=text, compression=compression)
+            fasta = IndexedFasta(file_name=file_name, threads=threads)
+            try:
+                self.assert_same_as_biopython(fasta=fasta, file_name=file_name)
+            finally:
+                fasta.close()
+            os.remove(file_name + FAI_EXTENSION)
+
+    def test_long_titles(self):
+        records = [("first", "first " + "d" * 1000, "ACGT" * 50), ("second", "second " + "e" * 5000, "")]
+        file_name = self.write(name="records.fasta", text=format_records(records=records, line_width=60)[0])
+        fasta = IndexedFasta(file_name=file_name)
+        try:
+            self.assert_same_as_biopython(fasta=fasta, file_name=file_name)
+        finally:
+            fasta.close()
+
+    def test_empty_records_and_files(self):
+        file_name = self.write(name="records.fasta", text=">first\n>second desc\nACGT\nAC\n>third\n")
+        self.assertEqual([("first", 0, 7, 0, 0), ("second", 6, 20, 4, 5), ("third", 0, 35, 0, 0)], get_fai(build_fai(file_name=file_name)))
+        fasta = open_fasta(source=file_name)
+        try:
+            self.assertIsInstance(fasta, IndexedFasta)
+            self.assert_same_as_biopython(fasta=fasta, file_name=file_name)
+        finally:
+            fasta.close()
+        empty_file_name = self.write(name="empty.fasta", text="")
+        fasta = open_fasta(source=empty_file_name)
+        try:
+            self.assertEqual(0, len(fasta))
+        finally:
+            fasta.close()
+
+    def test_stale_fai_is_rebuilt(self):
+        file_name = self.write(name="records.fasta", text=">first\nACGT\n")
+        self.assertEqual([("first", 4, 7, 4, 5)], get_fai(load_fai(file_name=file_name)))
+        self.assertTrue(os.path.exists(file_name + FAI_EXTENSION))
+        self.write(name="records.fasta", text=">renamed description\nACGTACGT\nAC\n>second\nTT\n")
+        fai_mtime = os.path.getmtime(file_name) - 10
+        os.utime(file_name + FAI_EXTENSION, (fai_mtime, fai_mtime))
+        fasta = open_fasta(source=file_name)
+        try:
+            self.assertIsInstance(fasta, IndexedFasta)
+            self.assert_same_as_biopython(fasta=fasta, file_name=file_name)
+        finally:
+            fasta.close()
+        self.assertEqual(get_fai(build_fai(file_name=file_name)), get_fai(load_fai(file_name=file_name)))
+
+    def test_invalid_files_can_not_be_indexed(self):
+        for text in [">first\nACGT\nAC\nACGT\n", ">first\nACG\nACGT\n", ">first\nACGT\n\nACGT\n", ">first\nACGT\n>first\nACGT\n",
+                     "ACGT\n>first\nACGT\n", ">\nACGT\n", ">first\nACGT\r\nACGT\nA\n"]:
+            file_name = self.write(name="records.fasta", text=text)
+            with self.assertRaises(ValueError):
+                build_fai(file_name=file_name)
+
+
+class OpenFastaTestCase(FastaFilesTestCase):
+    def setUp(self):
+        super(OpenFastaTestCase, self).setUp()
+        self.records = get_records(rnd=self.rnd)
+        self.text = format_records(records=self.records, line_width=60)[0]
+
+    def assert_opened_as(self, source, fasta_class, file_name):
+        fasta = open_fasta(source=source)
+        try:
+            self.assertIsInstance(fasta, fasta_class)
+            self.assert_same_as_biopython(fasta=fasta, file_name=file_name)
+        finally:
+            fasta.close()
+
+    def test_indexed_files(self):
+        file_name = self.write(name="records.fasta", text=self.text)
+        self.assert_opened_as(source=file_name, fasta_class=IndexedFasta, file_name=file_name)
+        with open(file_name, "rt") as source:
+            self.assert_opened_as(source=source, fasta_class=IndexedFasta, file_name=file_name)
+        file_name = self.write(name="records.fasta.gz", text=self.text, compression="bgzf")
+        self.assert_opened_as(source=file_name, fasta_class=IndexedFasta, file_name=file_name)
+
+    def test_plain_gzip_files_are_loaded_into_memory(self):
+        file_name = self.write(name="records.fasta.gz", text=self.text, compression="gzip")
+        self.assert_opened_as(source=file_name, fasta_class=InMemoryFasta, file_name=file_name)
+
+    def test_irregular_files_are_loaded_into_memory(self):
+        text = ">first desc\nACGT\nAC\nACGTACGT\n\n>second\nAC GT\n>third\n\nACGT\n"
+        for compression in [None, "bgzf"]:
+            file_name = self.write(name="records.fasta", text=text, compression=compression)
+            self.assert_opened_as(source=file_name, fasta_class=InMemoryFasta, file_name=file_name)
+
+    def test_streams_are_loaded_into_memory(self):
+        file_name = self.write(name="records.fasta", text=self.text)
+        self.assert_opened_as(source=six.StringIO(self.text), fasta_class=InMemoryFasta, file_name=file_name)
+        # a pipe (i.e., stdin) can neither be indexed, nor be read twice
+        read_fd, write_fd = os.pipe()
+
+        def feed():
+            with os.fdopen(write_fd, "wt") as destination:
+                destination.write(self.text)
+
+        feeder = threading.Thread(target=feed)
+        feeder.start()
+        try:
+            with os.fdopen(read_fd, "rt") as source:
+                self.assert_opened_as(source=source, fasta_class=InMemoryFasta, file_name=file_name)
+        finally:
+            feeder.join()
+
+
+class WrappedFastaWriterTestCase(unittest.TestCase):
+    def get_biopython_output(self, records):
+        destination = six.StringIO()
+        SeqIO.write(records, destination, "fasta")
+        return destination.getvalue()
+
+    def test_same_as_biopython(self):
+        rnd = random.Random(8)
+        records = []
+        destination = six.StringIO()
+        writer = WrappedFastaWriter(destination=destination)
+        for record_index in range(60):
+            seq_pieces = []
+            write_pieces = []
+            for _ in range(rnd.choice([0, 1, 1, 2, rnd.randint(3, 20)])):
+                if rnd.random() < 0.3:
+                    unit, count = rnd.choice(["N", "n", "NNA"]), rnd.choice([0, 1, 59, 60, 61, rnd.randint(0, 500), 70000])
+                    seq_pieces.append(unit * count)
+                    write_pieces.append((unit, count))
+                else:
+                    piece = get_random_seq(rnd, rnd.choice([0, 1, 59, 60, 61, rnd.randint(0, 300)]))
+                    seq_pieces.append(piece)
+                    write_pieces.append(piece)
+            name = "seq_{index}".format(index=record_index)
+            description = rnd.choice(["", name, name + " some description", "other description"])
+            records.append(SeqRecord(Seq("".join(seq_pieces)), id=name, description=description))
+            title = get_record_title(record_id=name, description=description)
+            if all(isinstance(piece, str) for piece in write_pieces) and rnd.random() < 0.5:
+                writer.write_record(title=title, pieces=write_pieces)
+                continue
+            writer.start_record(title=title)
+            for piece in write_pieces:
+                if isinstance(piece, tuple):
+                    writer.write_repeated(unit=piece[0], count=piece[1])
+                else:
+                    writer.write(piece)
+        writer.end_record()
+        self.assertEqual(self.get_biopython_output(records=records), destination.getvalue())
+
+    def test_custom_line_width(self):
+        destination = six.StringIO()
+        writer = WrappedFastaWriter(destination=destination, line_width=4)
+        writer.start_record(title="first")
+        writer.write("ACG")
+        writer.write_repeated(unit="N", count=6)
+        writer.write("T")
+        writer.write_record(title="second", pieces=["ACGTA"])
+        writer.end_record()
+        self.assertEqual(">first\nACGN\nNNNN\nNT\n>second\nACGT\nA\n", destination.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from collections import defaultdict
+
+from camsa.utils.grimm import grimm2camsa_points
+
+GRIMM = """# example genomes
+>g1.chr
+1 -2 3 4 $
+5 6 @
+>g2.chr
+1 2 -3 $
+4 5 5 6 $
+>g3.chr
+-1 2 7 3 4 $
+6 5 $
+"""
+
+
+def remove_bad_blocks(genomes, bad_blocks):
+    for genome_name in list(genomes.keys()):
+        genomes[genome_name] = [(chr_type, [block for block in blocks if block[1] not in bad_blocks]) for chr_type, blocks in genomes[genome_name]]
+        genomes[genome_name] = [(chr_type, blocks) for chr_type, blocks in genomes[genome_name] if len(blocks) > 0]
+
+
+def filter_sequentially(genomes, filter_duplications, filter_indels):
+    """ Applies the filters one after another, each on the result of the previous one, recounting blocks every time """
+    genomes = {genome_name: list(chromosomes) for genome_name, chromosomes in genomes.items()}
+    if filter_duplications:
+        counts = defaultdict(lambda: defaultdict(int))
+        for genome_name, chromosomes in genomes.items():
+            for _, blocks in chromosomes:
+                for _, block_name in blocks:
+                    counts[block_name][genome_name] += 1
+        remove_bad_blocks(genomes=genomes, bad_blocks={block_name for block_name, cnt in counts.items() if max(cnt.values()) > 1})
+    if filter_indels:
+        present = defaultdict(set)
+        for genome_name, chromosomes in genomes.items():
+            for _, blocks in chromosomes:
+                for _, block_name in blocks:
+                    present[block_name].add(genome_name)
+        remove_bad_blocks(genomes=genomes, bad_blocks={block_name for block_name, names in present.items() if len(names) != len(genomes)})
+    return genomes
+
+
+def as_tuples(assembly_points):
+    return [(ap.sources[0], ap.seq1, ap.seq1_or, ap.seq2, ap.seq2_or) for ap in assembly_points]
+
+
+class FiltersTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.logger = logging.getLogger("CAMSA.tests.grimm2camsa_points")
+        self.logger.setLevel(logging.ERROR)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def convert(self, data, flags):
+        file_name = os.path.join(self.directory, "genomes.grimm")
+        with open(file_name, "wt") as destination:
+            destination.write(data)
+        args = grimm2camsa_points.get_parser().parse_args([file_name] + flags)
+        return as_tuples(grimm2camsa_points.convert(args=args, logger=self.logger))
+
+    def test_no_filters(self):
+        result = self.convert(data=GRIMM, flags=[])
+        self.assertIn(("g2", "5", "+", "5", "+"), result)
+        self.assertIn(("g3", "2", "+", "7", "+"), result)
+        self.assertIn(("g1", "6", "+", "5", "+"), result)
+
+    def test_filter_duplications(self):
+        # block 5 is duplicated in g2, so it is removed from all the genomes
+        result = self.convert(data=GRIMM, flags=["--filter-duplications"])
+        self.assertEqual([("g1", "1", "+", "2", "-"), ("g1", "2", "-", "3", "+"), ("g1", "3", "+", "4", "+"), ("g1", "6", "+", "6", "+"),
+                          ("g2", "1", "+", "2", "+"), ("g2", "2", "+", "3", "-"), ("g2", "4", "+", "6", "+"),
+                          ("g3", "1", "-", "2", "+"), ("g3", "2", "+", "7", "+"), ("g3", "7", "+", "3", "+"), ("g3", "3", "+", "4", "+")],
+                         result)
+
+    def test_filter_indels(self):
+        # block 7 is absent from g1 and g2, so it is removed from g3
+        result = self.convert(data=GRIMM, flags=["--filter-indels"])
+        self.assertNotIn(("g3", "2", "+", "7", "+"), result)
+        self.assertIn(("g3", "2", "+", "3", "+"), result)
+        self.assertIn(("g2", "5", "+", "5", "+"), result)
+
+    def test_both_filters(self):
+        result = self.convert(data=GRIMM, flags=["--filter-duplications", "--filter-indels"])
+        self.assertEqual([("g1", "1", "+", "2", "-"), ("g1", "2", "-", "3", "+"), ("g1", "3", "+", "4", "+"), ("g1", "6", "+", "6", "+"),
+                          ("g2", "1", "+", "2", "+"), ("g2", "2", "+", "3", "-"), ("g2", "4", "+", "6", "+"),
+                          ("g3", "1", "-", "2", "+"), ("g3", "2", "+", "3", "+"), ("g3", "3", "+", "4", "+")],
+                         result)
+
+    def test_filters_against_sequential_filtering(self):
+        rnd = random.Random(1)
+        for _ in range(50):
+            genomes = {}
+            for genome_name in ["g{cnt}".format(cnt=cnt) for cnt in range(rnd.randint(1, 4))]:
+                genomes[genome_name] = [(rnd.choice("$@"), [(rnd.choice("+-"), str(rnd.randint(1, 12))) for _ in range(rnd.randint(1, 6))])
+                                        for _ in range(rnd.randint(1, 3))]
+            for filter_duplications in [False, True]:
+                for filter_indels in [False, True]:
+                    bad_blocks = grimm2camsa_points.get_bad_blocks(genomes=genomes, filter_duplications=filter_duplications, filter_indels=filter_indels)
+                    expected = filter_sequentially(genomes=genomes, filter_duplications=filter_duplications, filter_indels=filter_indels)
+                    result = [ap for chromosome_aps in grimm2camsa_points.iter_assembly_points(genomes=genomes, bad_blocks=bad_blocks)
+                              for ap in chromosome_aps]
+                    self.assertEqual(as_tuples(ap for chromosome_aps in grimm2camsa_points.iter_assembly_points(genomes=expected)
+                                               for ap in chromosome_aps),
+                                     as_tuples(result))
+
+
+if __name__ == "__main__":
+    unittest.main()